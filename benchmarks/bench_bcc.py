@@ -0,0 +1,134 @@
+"""
+Benchmarks for BCCMixin.parse.
+
+Extraction compares the compiled XPath extractor with the per-field CSS
+selectors it replaced, on the committed fixture and a synthetic calendar,
+with the row cache disabled. Row cache times parse with a cold cache, a warm
+one, and a warm one after some of the entries changed.
+
+    python -m benchmarks.bench_bcc --rows 5000 --changed 0.05
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+from os.path import join
+
+from scrapy.http import HtmlResponse, Request
+
+from benchmarks.synthetic import FILES_DIR, civicplus_calendar
+from city_scrapers.mixins.bcc import BCCMixin
+from city_scrapers.spiders.bisnd_bcc import BisndBCCASpider
+from city_scrapers.utils import PersistentLRUCache
+
+
+def css_parse_entry(spider, item):
+    """Extract an entry's fields with the CSS selectors used before."""
+    start = item.css("span[itemprop='startDate']::text").get()
+    name_parts = item.css("span[itemprop='location'] > span[itemprop='name'] > p")
+    address_parts = item.css(
+        "span[itemprop='address'] > span[itemprop='streetAddress']::text"
+    )
+    name = address = ""
+    if name_parts:
+        name = name_parts[0].css("::text").get()
+        if len(name_parts) > 1:
+            address = ", ".join(name_parts[1:].css("::text").getall())
+    if not address or not name:
+        address = address or address_parts.get()
+    links = [spider.agenda_link]
+    if item.css("a"):
+        links.append(
+            {
+                "href": f"{spider.host}{item.css('a::attr(href)').get()}",
+                "title": item.css("a::text").get(),
+            }
+        )
+    return (
+        item.css("span::text").get(),
+        item.css("p[itemprop='description']::text").get() or "",
+        datetime.strptime(start, "%Y-%m-%dT%H:%M:%S") if start else None,
+        {"name": name, "address": address},
+        links,
+    )
+
+
+def xpath_parse_entry(spider, entry):
+    return spider._parse_row(entry)
+
+
+def response_for(page):
+    url = "https://www.bismarcknd.gov/calendar.aspx"
+    return HtmlResponse(url, body=page.encode(), request=Request(url))
+
+
+def timed(func):
+    started = time.perf_counter()
+    count = func()
+    return time.perf_counter() - started, count
+
+
+def bench_extraction(spider, pages):
+    print("extraction (row cache disabled)")
+    BCCMixin.row_cache = PersistentLRUCache(0)
+    for label, page in pages:
+        for name, extract in [("css", css_parse_entry), ("xpath", xpath_parse_entry)]:
+            response = response_for(page)
+            # Build the document up front so only extraction is timed
+            root = response.selector.root
+            if extract is css_parse_entry:
+                entries = response.css(".calendar > ol > li")
+            else:
+                entries = spider._entries_xpath(root)
+            elapsed, count = timed(
+                lambda: sum(1 for entry in entries if extract(spider, entry))
+            )
+            print(
+                f"  {label:<18} {name:<6} {elapsed * 1000:9.1f} ms  "
+                f"{count / elapsed:8.0f} entries/s"
+            )
+
+
+def bench_row_cache(spider, rows, changed):
+    changed_rows = set(random.Random(1).sample(range(rows), int(rows * changed)))
+    page = civicplus_calendar(rows)
+    changed_page = civicplus_calendar(rows, changed_rows=changed_rows)
+
+    print(f"row cache ({rows} rows, {len(changed_rows)} changed)")
+    BCCMixin.row_cache = None
+    for label, body in [
+        ("cold cache", page),
+        ("warm cache", page),
+        ("changed rows", changed_page),
+    ]:
+        # A new response each time, so every run pays for building the document
+        response = response_for(body)
+        elapsed, count = timed(lambda: sum(1 for _ in spider.parse(response)))
+        print(
+            f"  {label:<13} {elapsed:6.2f} s  {count / elapsed:8.0f} items/s  "
+            f"cache hits {spider.row_cache.hits}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--changed", type=float, default=0.05)
+    args = parser.parse_args()
+
+    spider = BisndBCCASpider()
+    with open(join(FILES_DIR, "bisnd_bcc_a.html"), encoding="utf-8") as f:
+        fixture = f.read()
+    bench_extraction(
+        spider,
+        [
+            ("fixture", fixture),
+            (f"synthetic {args.rows}", civicplus_calendar(args.rows)),
+        ],
+    )
+    bench_row_cache(spider, args.rows, args.changed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Compare BisndBpsSpider.parse, which streams the rows of the meetings table
+and parses each row's cells once into a BpsRow, with the previous parse. That
+one decoded the whole table, filtered it by year, and then built an lxml
+document or a Selector for every cell it looked at.
+
+Rows: the fixture and a page with every row repeated. Archive depth: pages
+with more and more history before the 2-year cutoff, where the number of
+items stays the same.
+
+    python -m benchmarks.bench_bps --copies 10 --history 0 10 100
+"""
+
+import argparse
+import html
+import json
+import re
+import time
+import tracemalloc
+from datetime import datetime
+
+from city_scrapers_core.constants import BOARD, COMMITTEE
+from city_scrapers_core.items import Meeting
+from lxml import html as lhtml
+from scrapy import Selector
+from scrapy.http import HtmlResponse, Request
+
+from benchmarks.synthetic import bps_meetings_page
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+
+
+def cell_text(cell):
+    return "".join(cell.split(">")[1].split("<")[:-1])
+
+
+def full_decode_rows(data):
+    """The previous _parsed_data, splitting rows with several dates."""
+    data = json.loads(data)
+    filtered_meetings = [
+        item for item in data[1:] if int(cell_text(item[0])) >= datetime.now().year - 2
+    ]
+    for item in filtered_meetings:
+        dates = re.findall(r"\b\d+(?![^(]*\))\b", item[2])
+        if len(dates) < 2:
+            yield item
+            continue
+        sel = Selector(text=item[5] if item[5] is not None else "")
+        links = sel.css("p a::attr(href)").getall()
+        link_texts = sel.css("p a::text").getall()
+        for date in dates:
+            new_item = item.copy()
+            new_item[2] = f"<p>{date}</p>"
+            new_item[5] = None
+            for link, link_text in zip(links, link_texts):
+                if date in link_text:
+                    new_item[5] = f'<p><a href="{link}">{link_text}</a></p>'
+                    break
+            yield new_item
+
+
+def per_cell_parse(spider, response):
+    """The previous parse, reading fields straight from the raw cells."""
+    extracted_input = response.css(
+        '.ui-widget-detail input[type="hidden"]::attr(value)'
+    ).extract_first()
+    for item in full_decode_rows(extracted_input):
+        title = lhtml.fromstring(item[3]).text_content().strip()
+        date = " ".join(html.unescape(cell_text(cell)) for cell in item[:3])
+        start = datetime.strptime(date.split(" (")[0], "%Y %B %d")
+        links = []
+        for link in item[3:]:
+            sel = Selector(text=link if link is not None else "")
+            href = sel.css("a::attr(href)").get()
+            link_title = sel.css("a::text").get()
+            if href is not None and link_title is not None:
+                links.append({"href": href, "title": " ".join(link_title.split())})
+        meeting = Meeting(
+            title=title,
+            description="",
+            classification=(
+                COMMITTEE if "committee" in cell_text(item[3]).lower() else BOARD
+            ),
+            start=datetime.combine(start, spider.meeting_time),
+            end=None,
+            all_day=False,
+            time_notes=spider._parse_time_notes(item),
+            location=spider.location,
+            links=links,
+            source=response.url,
+        )
+        meeting["status"] = spider._get_status(meeting)
+        meeting["id"] = spider._get_id(meeting)
+        yield meeting
+
+
+def response_for(spider, page):
+    url = spider.start_urls[0]
+    return HtmlResponse(url, body=page.encode(), request=Request(url))
+
+
+def timed(parse, spider, page, repeat=3):
+    """Return the best time and item count of `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        # A new response each time, so every run pays for building the document
+        response = response_for(spider, page)
+        started = time.perf_counter()
+        count = sum(1 for _ in parse(spider, response))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def allocations(parse, spider, page):
+    """
+    Return the peak traced memory of a run above what the response holds, and
+    the number of memory blocks still allocated for its items. tracemalloc
+    only sees allocations made through Python, not the ones libxml2 makes for
+    its documents.
+    """
+    response = response_for(spider, page)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    baseline, _ = tracemalloc.get_traced_memory()
+    items = list(parse(spider, response))
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(
+        stat.count_diff
+        for stat in tracemalloc.take_snapshot().compare_to(before, "filename")
+        if stat.count_diff > 0
+    )
+    tracemalloc.stop()
+    del items
+    return peak - baseline, blocks
+
+
+def report(label, spider, page, memory=True):
+    print(label)
+    for name, parse in [
+        ("per cell", per_cell_parse),
+        ("row parser", type(spider).parse),
+    ]:
+        total, count = timed(parse, spider, page)
+        line = f"  {name:<11} {total * 1000:8.1f} ms  {count / total:8.0f} items/s"
+        if memory:
+            peak, blocks = allocations(parse, spider, page)
+            line += f"  peak {peak / 2 ** 10:8.1f} KiB  blocks {blocks:7d}"
+        print(f"{line}  items {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--history", type=int, nargs="*", default=[0, 10, 100])
+    args = parser.parse_args()
+
+    # The fixture's newest rows are from 2024, move them up to this year
+    year_shift = datetime.now().year - 2024
+    spider = BisndBpsSpider()
+    report("fixture", spider, bps_meetings_page(1, year_shift))
+    report(
+        f"{args.copies}x fixture", spider, bps_meetings_page(args.copies, year_shift)
+    )
+    for history in args.history:
+        page = bps_meetings_page(1, year_shift, history=history)
+        report(
+            f"fixture with {history} older copies ({len(page) / 2 ** 20:.1f} MiB)",
+            spider,
+            page,
+            memory=False,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark of the job journal kept by JobCheckpointMiddleware, against the
+size of the job. For each size, a run schedules that many requests, finishes
+`--done` of them and appends a frame every `--frame` requests, like a crawl
+killed partway through. A second run then resumes from the journal. Sizes
+are printed per request: journal bytes, time to append frames and time to
+resume, which is the restart overhead.
+
+    python -m benchmarks.bench_checkpoint --sizes 1000 10000 100000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from scrapy import Request, Spider
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.middleware import JobCheckpointMiddleware
+
+
+class BenchSpider(Spider):
+    name = "bench_checkpoint"
+
+
+def start_run(path):
+    crawler = get_crawler(
+        BenchSpider, {"JOB_CHECKPOINT_ENABLED": True, "JOB_CHECKPOINT_DIR": path}
+    )
+    crawler.stats.open_spider(None)
+    # Requests are resumed into a list rather than a scheduler
+    crawler.engine = SimpleNamespace(
+        crawl=[].append,
+        slot=SimpleNamespace(
+            scheduler=SimpleNamespace(df=RFPDupeFilter.from_crawler(crawler))
+        ),
+    )
+    spider = BenchSpider.from_crawler(crawler)
+    middleware = JobCheckpointMiddleware.from_crawler(crawler)
+    middleware.spider_opened(spider)
+    middleware.loop.stop()
+    return middleware, spider
+
+
+def run_job(path, size, done, frame):
+    middleware, spider = start_run(path)
+    requests = [
+        Request(
+            f"https://www.bismarcknd.gov/calendar.aspx?CID={i}&page={i % 7}",
+            meta={"source": f"https://www.bismarcknd.gov/calendar.aspx?CID={i}"},
+        )
+        for i in range(size)
+    ]
+    started = time.perf_counter()
+    for i, request in enumerate(requests):
+        middleware.request_scheduled(request, spider)
+        if i < size * done:
+            response = HtmlResponse(request.url, request=request)
+            for _ in middleware.process_spider_output(response, (), spider):
+                pass
+        if (i + 1) % frame == 0:
+            middleware.sync_soon()
+    middleware.sync_soon()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--done", type=float, default=0.5)
+    parser.add_argument("--frame", type=int, default=100)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            run_seconds = run_job(path, size, args.done, args.frame)
+            journal_bytes = Path(path, f"{BenchSpider.name}.journal").stat().st_size
+            middleware, spider = start_run(path)
+            stats = middleware.stats
+            resumed = stats.get_value("job_checkpoint/resumed_count")
+            resume_seconds = stats.get_value("job_checkpoint/resume_seconds")
+        print(
+            f"{size:>8} requests  journal {journal_bytes / size:6.1f} B/req"
+            f"  run {run_seconds * 1e6 / size:6.1f} us/req"
+            f"  resume {resume_seconds * 1e3:8.1f} ms"
+            f" ({resume_seconds * 1e6 / size:5.1f} us/req, {resumed} pending)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmark of city_scrapers.dates against the calls the spiders made
+before: `datetime.strptime` for BCC, MC and BPS, and `dateutil.parser.parse`
+for MCC. Each format runs on distinct strings with the memo cache cleared
+first ("cold"), and on the strings of a source that repeats itself across
+rows and runs ("warm").
+
+    python -m benchmarks.bench_dates --count 20000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from dateutil import parser as dateutil_parser
+
+from city_scrapers.dates import cache_clear, parse_date, parse_iso_datetime
+
+
+def timed(func, values):
+    started = time.perf_counter()
+    for value in values:
+        func(value)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    start = datetime(2020, 1, 1, 16)
+    days = [start + timedelta(days=i) for i in range(args.count)]
+    formats = [
+        (
+            "BCC iso",
+            [day.strftime("%Y-%m-%dT%H:%M:%S") for day in days],
+            lambda v: datetime.strptime(v, "%Y-%m-%dT%H:%M:%S"),
+            parse_iso_datetime,
+        ),
+        (
+            "MC iso Z",
+            [day.strftime("%Y-%m-%dT%H:%M:%SZ") for day in days],
+            lambda v: datetime.strptime(v, "%Y-%m-%dT%H:%M:%SZ"),
+            parse_iso_datetime,
+        ),
+        (
+            "BPS y month d",
+            [f"{day.year} {day:%B} {day.day}" for day in days],
+            lambda v: datetime.strptime(v, "%Y %B %d"),
+            parse_date,
+        ),
+        (
+            "MCC month d, y",
+            [f"{day:%B} {day.day}, {day.year}" for day in days],
+            lambda v: dateutil_parser.parse(v).date(),
+            parse_date,
+        ),
+    ]
+    for label, values, before, after in formats:
+        # A source repeating the same 500 strings
+        repeated = values[:500] * (len(values) // 500)
+        cache_clear()
+        cold = timed(after, values)
+        warm = timed(after, repeated)
+        print(
+            f"{label:<15} before {timed(before, values) * 1e6 / len(values):7.2f} us"
+            f"  cold {cold * 1e6 / len(values):6.2f} us"
+            f"  warm {warm * 1e6 / len(repeated):6.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
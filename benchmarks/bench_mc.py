@@ -0,0 +1,85 @@
+"""
+Compare MCMixin.parse against decoding the full Events payload up front, as
+the mixin did before it streamed the "value" array.
+
+    python -m benchmarks.bench_mc --events 20000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from city_scrapers_core.items import Meeting
+from scrapy.http import Request, TextResponse
+
+from benchmarks.synthetic import civicclerk_events
+from city_scrapers.spiders.bisnd_mc import BisndMCCCSpider
+
+
+def full_decode_parse(spider, response):
+    """The previous parse: response.json() on the whole body."""
+    items = response.json()
+    for item in items["value"]:
+        meeting = Meeting(
+            title=item["eventName"],
+            description=item["eventDescription"],
+            classification=spider._parse_classification(item["categoryName"]),
+            start=spider._parse_start(item["startDateTime"]),
+            end=None,
+            all_day=False,
+            time_notes="",
+            location=spider._parse_location(item["eventLocation"]),
+            links=spider._parse_links(item),
+            source=response.url,
+        )
+        meeting["status"] = spider._get_status(meeting)
+        meeting["id"] = spider._get_id(meeting)
+        yield meeting
+
+
+def measure(parse, spider, response):
+    """Return (time to first item, total time, peak traced memory, item count)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for item in parse(spider, response):
+        if isinstance(item, Request):
+            continue
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, total, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    body = civicclerk_events(args.events)
+    url = "https://mandannd.api.civicclerk.com/v1/Events"
+    response = TextResponse(url, body=body, encoding="utf-8", request=Request(url))
+    # Decode the body once up front so neither run pays for it
+    response.text
+    spider = BisndMCCCSpider()
+    spider.page_size = args.events + 1
+
+    print(f"{args.events} events, {len(body) / 2 ** 20:.1f} MiB body")
+    for label, parse in [
+        ("full decode", full_decode_parse),
+        ("streaming", type(spider).parse),
+    ]:
+        first, total, peak, count = measure(parse, spider, response)
+        print(
+            f"{label:<12} first item {first * 1000:8.2f} ms  "
+            f"total {total:6.2f} s  peak {peak / 2 ** 20:7.2f} MiB  "
+            f"items {count}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Local mock server standing in for every site the spiders crawl, so that full
+crawls can be benchmarked without leaving the machine:
+
+- www.bismarcknd.gov: calendar.aspx, filtered by the CID and date range in
+  the query string, with one `.calendar` list per calendar ID.
+- mandannd.api.civicclerk.com: the OData `/v1/Events` endpoint, with
+  `$filter` on categoryId and startDateTime, `$orderby`, `$select`, and
+  paging by `$top`/`$skip` or `@odata.nextLink`.
+- www.bismarckschools.org: the meetings table page.
+- www.mortonnd.org: the commission minutes page.
+
+Content comes from `benchmarks.synthetic`, around the current date. Each
+site listens on the address it has in the mock settings profile, on its own
+port of 127.0.0.1 from MOCK_SERVER_PORT up. Latency, bandwidth, the share of
+5xx responses and robots.txt can be set.
+
+    python -m benchmarks.mockserver --latency 0.2 --bandwidth 500000 --errors 0.05
+    PYTHONPATH=. SCRAPY_SETTINGS_MODULE=city_scrapers.settings.mock scrapy crawlall
+"""
+
+import argparse
+import json
+import random
+import re
+from datetime import date, datetime
+from urllib.parse import urlencode, urlparse
+
+from dateutil.relativedelta import relativedelta
+from twisted.internet import reactor
+from twisted.web import resource, server
+
+from benchmarks.synthetic import (
+    ODATA_CONTEXT,
+    bps_meetings_page,
+    civicclerk_event_list,
+    civicplus_entries,
+    civicplus_page,
+    mortonnd_minutes_page,
+)
+from city_scrapers.settings.mock import MOCK_SERVER_HOSTS
+from city_scrapers.spiders.bisnd_bcc import spider_configs as bcc_configs
+from city_scrapers.spiders.bisnd_mc import spider_configs as mc_configs
+
+ROBOTS = {
+    "allow": "User-agent: *\nDisallow:\n",
+    "disallow": "User-agent: *\nDisallow: /\n",
+}
+# Mirrors the fixed page size of the real API when no $top is given
+ODATA_PAGE_SIZE = 100
+
+
+def parse_odata_filter(value):
+    """
+    Read the category IDs and the startDateTime bounds out of an Events
+    `$filter` expression. Returns (category IDs or None, start, end), with
+    None for bounds that aren't given.
+    """
+    category_ids = None
+    match = re.search(r"categoryId\s+in\s+\(([^)]*)\)", value)
+    if match:
+        category_ids = {int(cid) for cid in match.group(1).split(",") if cid.strip()}
+    match = re.search(r"categoryId\s+eq\s+(\d+)", value)
+    if match:
+        category_ids = {int(match.group(1))}
+    bounds = {}
+    for op, bound in re.findall(r"startDateTime\s+(ge|le)\s+([\dT:.\-]+Z?)", value):
+        bounds[op] = bound.rstrip("Z")[:19]
+    return category_ids, bounds.get("ge"), bounds.get("le")
+
+
+def query_events(events, args, url):
+    """
+    Answer an Events query from `events` with the decoded query string
+    `args`. Returns the response as a dict.
+    """
+    category_ids, start, end = parse_odata_filter(args.get("$filter", ""))
+    matches = [
+        event
+        for event in events
+        if (category_ids is None or event["categoryId"] in category_ids)
+        and (start is None or event["startDateTime"][:19] >= start)
+        and (end is None or event["startDateTime"][:19] <= end)
+    ]
+    if args.get("$orderby", "").startswith("startDateTime"):
+        matches.sort(key=lambda event: event["startDateTime"])
+    skip = int(args.get("$skip", 0))
+    top = int(args.get("$top", ODATA_PAGE_SIZE))
+    page = matches[skip : skip + top]
+    if "$select" in args:
+        fields = args["$select"].split(",")
+        page = [{field: event.get(field) for field in fields} for event in page]
+    body = {"@odata.context": ODATA_CONTEXT, "value": page}
+    if "$top" not in args and skip + top < len(matches):
+        body["@odata.nextLink"] = f"{url}?{urlencode({**args, '$skip': skip + top})}"
+    return body
+
+
+def calendar_ids(value, calendars):
+    """Return the calendar IDs a calendar.aspx CID parameter asks for."""
+    if not value or value == "all":
+        return list(calendars)
+    cids = [int(cid) for cid in value.split(",") if cid.strip().isdigit()]
+    return [cid for cid in cids if cid in calendars]
+
+
+class MockSite(resource.Resource):
+    """
+    A mock site, answering requests with the handler `routes` maps their path
+    to, after the configured latency and at the configured bandwidth. A share
+    of requests fail with a 5xx error instead.
+    """
+
+    isLeaf = True
+
+    def __init__(self, options, rng, routes):
+        super().__init__()
+        self.options = options
+        self.rng = rng
+        self.routes = routes
+
+    def render(self, request):
+        path = request.path.decode()
+        args = {
+            key.decode(): values[-1].decode() for key, values in request.args.items()
+        }
+        if path == "/robots.txt":
+            status, content_type, body = self.robots()
+        elif self.rng.random() < self.options.errors:
+            status, content_type, body = (
+                self.rng.choice((500, 502, 503)),
+                "text/plain",
+                b"Server Error",
+            )
+        elif path in self.routes:
+            url = f"http://{request.getHeader('host')}{path}"
+            status, content_type, body = self.routes[path](args, url)
+        else:
+            status, content_type, body = 404, "text/plain", b"Not Found"
+
+        latency = self.options.latency + self.rng.uniform(0, self.options.jitter)
+        state = {"finished": False}
+        request.notifyFinish().addBoth(lambda _: state.update(finished=True))
+        reactor.callLater(
+            latency, self.respond, request, state, status, content_type, body
+        )
+        return server.NOT_DONE_YET
+
+    def robots(self):
+        if self.options.robots == "missing":
+            return 404, "text/plain", b"Not Found"
+        if self.options.robots in ROBOTS:
+            return 200, "text/plain", ROBOTS[self.options.robots].encode()
+        with open(self.options.robots, "rb") as f:
+            return 200, "text/plain", f.read()
+
+    def respond(self, request, state, status, content_type, body):
+        if state["finished"]:
+            return
+        request.setResponseCode(status)
+        request.setHeader("Content-Type", content_type)
+        request.setHeader("Content-Length", str(len(body)))
+        if not self.options.bandwidth:
+            request.write(body)
+            request.finish()
+            return
+        # Send a tenth of a second's worth of bytes at a time
+        chunk = max(1, int(self.options.bandwidth / 10))
+        self.send_chunk(request, state, body, 0, chunk)
+
+    def send_chunk(self, request, state, body, offset, chunk):
+        if state["finished"]:
+            return
+        request.write(body[offset : offset + chunk])
+        if offset + chunk >= len(body):
+            request.finish()
+            return
+        reactor.callLater(
+            0.1, self.send_chunk, request, state, body, offset + chunk, chunk
+        )
+
+
+class BismarckSite:
+    """www.bismarcknd.gov calendar.aspx, for every BCC calendar ID."""
+
+    def __init__(self, options, today):
+        start = today.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.calendars = {
+            config["cid"]: civicplus_entries(
+                options.scale,
+                seed=options.seed + index,
+                start=start,
+                edge_cases=options.edge_cases,
+                first_eid=100000 + index * options.scale,
+            )
+            for index, config in enumerate(bcc_configs)
+        }
+
+    def calendar(self, args, url):
+        date_from = self.parse_date(args.get("startDate"), date.min)
+        date_to = self.parse_date(args.get("enddate"), date.max)
+        calendars = {
+            cid: [
+                entry
+                for day, entry in self.calendars[cid]
+                if date_from <= day.date() <= date_to
+            ]
+            for cid in calendar_ids(args.get("CID"), self.calendars)
+        }
+        return 200, "text/html; charset=utf-8", civicplus_page(calendars).encode()
+
+    @staticmethod
+    def parse_date(value, default):
+        try:
+            return datetime.strptime(value, "%m/%d/%Y").date()
+        except (TypeError, ValueError):
+            return default
+
+    def routes(self):
+        return {"/calendar.aspx": self.calendar}
+
+
+class CivicClerkSite:
+    """mandannd.api.civicclerk.com Events, for every MC category."""
+
+    def __init__(self, options, today):
+        category_ids = [config["category_id"] for config in mc_configs]
+        count = options.scale * len(category_ids)
+        # Spread the events over the 7 months the spiders ask for
+        start = today - relativedelta(months=1)
+        self.events = civicclerk_event_list(
+            count,
+            seed=options.seed,
+            category_ids=category_ids,
+            edge_cases=options.edge_cases,
+            start=start.replace(hour=17, minute=0, second=0, microsecond=0),
+            hours=max(1, 24 * 210 // count),
+        )
+
+    def events_query(self, args, url):
+        body = json.dumps(query_events(self.events, args, url)).encode()
+        return 200, "application/json; charset=utf-8", body
+
+    def routes(self):
+        return {"/v1/Events": self.events_query}
+
+
+class StaticSite:
+    """A site serving one page, built once at startup."""
+
+    def __init__(self, path, page):
+        self.path = path
+        self.page = page.encode()
+
+    def get(self, args, url):
+        return 200, "text/html; charset=utf-8", self.page
+
+    def routes(self):
+        return {self.path: self.get}
+
+
+def build_sites(options, today=None):
+    """Map each mocked host to its routes."""
+    today = today or datetime.now()
+    return {
+        "www.bismarcknd.gov": BismarckSite(options, today).routes(),
+        "mandannd.api.civicclerk.com": CivicClerkSite(options, today).routes(),
+        "www.bismarckschools.org": StaticSite(
+            "/Page/401",
+            bps_meetings_page(
+                max(1, options.scale // 30),
+                today.year - 2024,
+                seed=options.seed,
+                edge_cases=options.edge_cases,
+            ),
+        ).routes(),
+        "www.mortonnd.org": StaticSite(
+            "/",
+            mortonnd_minutes_page(
+                options.scale * 5,
+                today,
+                seed=options.seed,
+                edge_cases=options.edge_cases,
+            ),
+        ).routes(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds before responding"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra latency, in seconds"
+    )
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="bytes per second, 0 for unlimited"
+    )
+    parser.add_argument(
+        "--errors", type=float, default=0.0, help="share of 5xx responses"
+    )
+    parser.add_argument(
+        "--robots",
+        default="allow",
+        help="robots.txt: allow, disallow, missing or the path of a file",
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=40,
+        help="meetings per BCC calendar and MC category",
+    )
+    parser.add_argument(
+        "--edge-cases", type=float, default=0.0, help="share of edge case rows"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    options = parser.parse_args()
+
+    rng = random.Random(options.seed)
+    for host, routes in build_sites(options).items():
+        address = urlparse(MOCK_SERVER_HOSTS[host])
+        site = server.Site(MockSite(options, rng, routes))
+        reactor.listenTCP(address.port, site, interface=address.hostname)
+        print(f"{host} on {MOCK_SERVER_HOSTS[host]}")
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Offline benchmark suite for the parsers of every spider family. Each parser
+runs on its committed fixture and on synthetic inputs scaled from it, and
+the suite records items/s, time to first item and peak traced memory.
+
+    python -m benchmarks.suite run --output results.json
+    python -m benchmarks.suite run --scales 10 --baseline results.json
+    python -m benchmarks.suite compare results.json new-results.json
+
+Outside the repository root, run it as `python path/to/benchmarks/suite.py`.
+Time to first item and items/s leave out building the lxml document of HTML
+responses, which is recorded on its own as `document_seconds`.
+
+`compare` (or `run --baseline`) exits with status 1 when a case is slower or
+uses more memory than the baseline by more than --threshold. Peak memory
+comes from tracemalloc, so it leaves out what libxml2 allocates for lxml
+documents.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from os.path import abspath, dirname, join
+
+from city_scrapers_core.items import Meeting
+from scrapy.http import HtmlResponse, Request, TextResponse
+
+ROOT_DIR = dirname(dirname(abspath(__file__)))
+# Run as a script from anywhere, the repository isn't on the path
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.synthetic import (  # noqa: E402
+    FILES_DIR,
+    bps_meetings_page,
+    civicclerk_events,
+    civicplus_calendar,
+    mortonnd_minutes_page,
+)
+from city_scrapers import dates  # noqa: E402
+from city_scrapers.mixins.bcc import BCCMixin  # noqa: E402
+from city_scrapers.spiders.bisnd_bcc import BisndBCCASpider  # noqa: E402
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider  # noqa: E402
+from city_scrapers.spiders.bisnd_mc import BisndMCCCSpider  # noqa: E402
+from city_scrapers.spiders.bisnd_mcc import BisndMccSpider  # noqa: E402
+from city_scrapers.utils import PersistentLRUCache  # noqa: E402
+
+# Rows in each committed fixture, which synthetic inputs are scaled from
+FIXTURE_ROWS = {"bcc": 33, "mc": 15, "mcc": 160}
+
+
+def read_fixture(name):
+    with open(join(FILES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def bcc_case(scale):
+    spider = BisndBCCASpider()
+    url = f"{spider.host}/calendar.aspx"
+    if scale:
+        body = civicplus_calendar(FIXTURE_ROWS["bcc"] * scale)
+    else:
+        body = read_fixture("bisnd_bcc_a.html")
+    return spider, lambda: HtmlResponse(url, body=body.encode(), request=Request(url))
+
+
+def mc_case(scale):
+    spider = BisndMCCCSpider()
+    url = f"{spider.base_url}/v1/Events"
+    if scale:
+        body = civicclerk_events(FIXTURE_ROWS["mc"] * scale)
+    else:
+        body = read_fixture("bisnd_mc_cc.json")
+    return spider, lambda: TextResponse(
+        url, body=body.encode(), encoding="utf-8", request=Request(url)
+    )
+
+
+def bps_case(scale):
+    spider = BisndBpsSpider()
+    url = spider.start_urls[0]
+    # The fixture's newest rows are from 2024, move them up to this year
+    body = bps_meetings_page(scale or 1, datetime.now().year - 2024)
+    return spider, lambda: HtmlResponse(url, body=body.encode(), request=Request(url))
+
+
+def mcc_case(scale):
+    spider = BisndMccSpider()
+    url = spider.start_urls[0]
+    if scale:
+        # Keep the fixture's dates, so that scales differ only in size
+        body = mortonnd_minutes_page(FIXTURE_ROWS["mcc"] * scale, fixture_dates=True)
+    else:
+        # Move the fixture's dates up so that its meetings aren't too old to keep
+        shift = datetime.now().year - 2024
+        body = re.sub(
+            r"(\w+ \d{1,2},? )(20\d\d)",
+            lambda m: f"{m.group(1)}{int(m.group(2)) + shift}",
+            read_fixture("bisnd_mcc.html"),
+        )
+    return spider, lambda: HtmlResponse(url, body=body.encode(), request=Request(url))
+
+
+FAMILIES = {"bcc": bcc_case, "mc": mc_case, "bps": bps_case, "mcc": mcc_case}
+
+
+def reset_caches():
+    """Start every run cold, as a new crawl process would."""
+    BCCMixin.row_cache = PersistentLRUCache(0)
+    dates.cache_clear()
+
+
+def parse_once(spider, make_response):
+    """
+    Return (document build time, time to first item, total time, item count)
+    for one parse. The lxml document of an HTML response is built before the
+    parse is timed.
+    """
+    reset_caches()
+    response = make_response()
+    started = time.perf_counter()
+    if isinstance(response, HtmlResponse):
+        response.selector
+    document = time.perf_counter() - started
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for item in spider.parse(response):
+        if not isinstance(item, Meeting):
+            continue
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    return document, first, time.perf_counter() - started, count
+
+
+def peak_memory(spider, make_response):
+    reset_caches()
+    response = make_response()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for _ in spider.parse(response):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - baseline
+
+
+def run_case(family, scale, repeat):
+    spider, make_response = FAMILIES[family](scale)
+    # MC would request a next page after a full one
+    spider.page_size = sys.maxsize
+    runs = [parse_once(spider, make_response) for _ in range(repeat)]
+    document = min(run[0] for run in runs)
+    first = min(run[1] or 0 for run in runs)
+    total = min(run[2] for run in runs)
+    items = runs[0][3]
+    return {
+        "items": items,
+        "seconds": total,
+        "items_per_second": items / total if total else 0,
+        "first_item_seconds": first,
+        "document_seconds": document,
+        "peak_bytes": peak_memory(spider, make_response),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(families, scales, repeat):
+    # Spiders log skipped rows, which would be timed along with parsing
+    logging.disable(logging.WARNING)
+    results = {}
+    for family in families:
+        for scale in scales:
+            name = f"{family}/{f'{scale}x' if scale else 'fixture'}"
+            results[name] = result = run_case(family, scale, repeat)
+            print(
+                f"{name:<12} {result['items']:8d} items  "
+                f"{result['items_per_second']:9.0f} items/s  "
+                f"document {result['document_seconds'] * 1000:8.2f} ms  "
+                f"first {result['first_item_seconds'] * 1000:8.2f} ms  "
+                f"peak {result['peak_bytes'] / 2 ** 20:8.2f} MiB",
+                flush=True,
+            )
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+# Metric, and whether a higher value is better
+METRICS = [
+    ("items_per_second", True),
+    ("first_item_seconds", False),
+    ("document_seconds", False),
+    ("peak_bytes", False),
+]
+
+
+def compare(baseline, current, threshold):
+    """Print changes against the baseline and return the regressed cases."""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        changes = []
+        for metric, higher_is_better in METRICS:
+            # Results from before a metric was added don't have it
+            if not base.get(metric):
+                continue
+            change = result[metric] / base[metric] - 1
+            regressed = -change if higher_is_better else change
+            flag = ""
+            if regressed > threshold:
+                flag = " REGRESSION"
+                regressions.append((name, metric))
+            changes.append(f"{metric} {change:+7.1%}{flag}")
+        print(f"{name:<12} " + "  ".join(changes))
+    return regressions
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--families", nargs="+", choices=list(FAMILIES), default=list(FAMILIES)
+    )
+    run_parser.add_argument(
+        "--scales",
+        nargs="+",
+        type=int,
+        default=[0, 10, 100, 1000],
+        help="synthetic input sizes relative to the fixture, 0 for the fixture",
+    )
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--output", help="write results to this JSON file")
+    run_parser.add_argument("--baseline", help="compare results with this file")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    for command_parser in (run_parser, compare_parser):
+        command_parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="relative change that counts as a regression (default 0.2)",
+        )
+    args = parser.parse_args()
+
+    if args.command == "run":
+        current = run(args.families, args.scales, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+        if not args.baseline:
+            return
+        baseline = load(args.baseline)
+    else:
+        baseline, current = load(args.baseline), load(args.current)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Synthetic inputs for benchmarks and stress tests, in the exact shape of each
+source's pages and scaled to arbitrary sizes. Generators are seeded, so the
+same arguments always build the same document.
+
+`edge_cases` is the share of rows that get one of the edge cases the
+spiders handle, picked at random from the generator's `*_EDGE_CASES`.
+"""
+
+import json
+import random
+import re
+from datetime import datetime, timedelta
+from os.path import dirname, join
+
+FILES_DIR = join(dirname(dirname(__file__)), "tests", "files")
+
+BCC_EDGE_CASES = ("no_start", "multi_part_location", "no_location", "cancelled")
+MC_EDGE_CASES = ("multi_part_location", "no_location", "no_files", "cancelled")
+BPS_EDGE_CASES = ("multi_date", "time_note", "missing_cells", "cancelled")
+MCC_EDGE_CASES = ("no_date", "description", "no_links", "cancelled")
+
+ODATA_CONTEXT = "https://mandannd.api.civicclerk.com/v1/$metadata#Events"
+BCC_TITLES = (
+    "Bismarck City Commission Meeting",
+    "Bismarck-Burleigh Commissions Committee",
+    "City Commission Fact Finding Subcommittee",
+    "Human Relations Committee Meeting",
+    "Vision Fund Committee Meeting",
+    "Bismarck Animal Advisory Board",
+)
+BCC_LOCATIONS = (
+    ("<p>Tom Baker Room</p>", "City-County Office Building"),
+    (
+        "<p>4th Floor Mayor&apos;s Conference Room, City/County Building</p>",
+        "221 N 5th St",
+    ),
+    ("Event Location", "221 N 5th Street"),
+)
+BCC_MULTI_PART_LOCATION = (
+    "<p>Tom Baker Meeting Room</p><p>City/County Building</p>"
+    "<p>221 N 5th St</p><p>Bismarck, ND 58501</p>",
+    "221 N. 5th Street",
+)
+BCC_ENTRY = """<li>
+<h3>					 <a id="eventTitle_{eid}" href="/Calendar.aspx?EID={eid}&month={month}&year={year}&day={day}&calType=0" onkeypress="return this.onclick();" onclick="eventDetails({eid}, {day}, {month}, {year}, 0); return false;"><span>{title}</span></a></h3>
+</a></h3>
+<div class="subHeader"><div class="date">{display_date}</div>{display_location}</div>
+<div class="hidden" itemscope itemtype="http://schema.org/Event"><span itemprop="name">{title}</span>{start}<p itemprop="description">{description}</p>
+{location}</div><p></p>
+<a aria-labelledby="eventTitle_{eid} calendarEvent{eid}"id="calendarEvent{eid}" href="/Calendar.aspx?EID={eid}&month={month}&year={year}&day={day}&calType=0" onkeypress="return this.onclick();" onclick="eventDetails({eid}, {day}, {month}, {year}, 0); return false;">More Details</a>
+				</li>"""  # noqa
+BCC_LOCATION = (
+    '<span itemprop="location" itemscope itemtype="http://schema.org/Place">\n'
+    '<span itemprop="name">{name}</span><span class="hidden" itemprop="address" '
+    'itemscope itemtype="http://schema.org/PostalAddress"><span '
+    'itemprop="streetAddress">{street}</span></span></span>'
+)
+
+
+def read_fixture(name):
+    with open(join(FILES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def edge_case(rng, rate, cases):
+    """Return one of `cases` for a share `rate` of calls, None otherwise."""
+    return rng.choice(cases) if rate and rng.random() < rate else None
+
+
+def civicclerk_event_list(
+    count, seed=0, category_ids=(26,), edge_cases=0.0, start=None, hours=24
+):
+    """
+    Build `count` CivicClerk events, one every `hours` from `start`. Every
+    event carries all the fields of the committed fixture, so the payload is
+    as heavy as an unprojected API response.
+    """
+    rng = random.Random(seed)
+    events = json.loads(read_fixture("bisnd_mc_cc.json"))["value"]
+    start = start or datetime(2024, 1, 1, 17)
+    value = []
+    for i in range(count):
+        event = dict(events[i % len(events)])
+        event["id"] = i
+        event["categoryId"] = rng.choice(category_ids)
+        event["startDateTime"] = (start + timedelta(hours=hours * i)).strftime(
+            "%Y-%m-%dT%H:%M:%SZ"
+        )
+        case = edge_case(rng, edge_cases, MC_EDGE_CASES)
+        if case == "multi_part_location":
+            event["eventLocation"] = {
+                **event["eventLocation"],
+                "address1": "205 2nd Ave NW",
+                "address2": "City Commission Room ",
+                "city": "Mandan",
+                "state": "ND",
+                "zipCode": "58554",
+            }
+        elif case == "no_location":
+            event["eventLocation"] = None
+        elif case == "no_files":
+            event["publishedFiles"] = []
+        elif case == "cancelled":
+            event["eventName"] = f"{event['eventName']} - CANCELLED"
+        value.append(event)
+    return value
+
+
+def civicclerk_events(count, seed=0, category_ids=(26,), edge_cases=0.0):
+    """
+    Build a CivicClerk `/v1/Events` response body with `count` events, see
+    `civicclerk_event_list`.
+    """
+    value = civicclerk_event_list(count, seed, category_ids, edge_cases)
+    return json.dumps({"@odata.context": ODATA_CONTEXT, "value": value})
+
+
+def civicplus_entries(
+    rows, seed=0, start=None, changed_rows=(), edge_cases=0.0, first_eid=100000
+):
+    """
+    Build `rows` CivicPlus calendar entries in the markup of the committed
+    BCC fixture, each with its own event ID, four a day from `start`. Returns
+    (start datetime, <li> HTML) pairs. Rows whose index is in `changed_rows`
+    get a different title, to simulate a page where only some entries
+    changed.
+    """
+    rng = random.Random(seed)
+    start = start or datetime(2024, 1, 1)
+    entries = []
+    for i in range(rows):
+        day = start + timedelta(days=i // 4, hours=rng.choice((9, 12, 16, 17)))
+        title = rng.choice(BCC_TITLES)
+        name, street = rng.choice(BCC_LOCATIONS)
+        case = edge_case(rng, edge_cases, BCC_EDGE_CASES)
+        if case == "multi_part_location":
+            name, street = BCC_MULTI_PART_LOCATION
+        elif case == "cancelled":
+            title = f"CANCELLED - {title}"
+        if i in changed_rows:
+            title = f"{title} - Updated"
+        entry = BCC_ENTRY.format(
+            eid=first_eid + i,
+            month=day.month,
+            year=day.year,
+            day=day.day,
+            title=title,
+            display_date=f"{day:%B}&nbsp;{day.day},&nbsp;{day.year},&nbsp;"
+            f"{day.hour % 12 or 12}:{day:%M %p}",
+            display_location=(
+                ""
+                if case == "no_location"
+                else '<div class="eventLocation fr-element fr-view">@ '
+                f'<div class="name">{name}</div></div>'
+            ),
+            start=(
+                ""
+                if case == "no_start"
+                else '<span itemprop="startDate" class="hidden">'
+                f"{day:%Y-%m-%dT%H:%M:%S}</span>"
+            ),
+            description="",
+            location=(
+                ""
+                if case == "no_location"
+                else BCC_LOCATION.format(name=name, street=street)
+            ),
+        )
+        entries.append((day, entry))
+    return entries
+
+
+def civicplus_page(calendars):
+    """
+    Build a CivicPlus calendar.aspx list view around the committed BCC
+    fixture, with one `.calendar` list per calendar ID in `calendars`, a
+    mapping of calendar IDs to their entries' HTML.
+    """
+    page = read_fixture("bisnd_bcc_a.html")
+    list_start = page.index("<ol>", page.index('class="calendar"')) + len("<ol>")
+    list_end = page.index("</ol>", list_start)
+    lists = "</ol></div>\n".join(
+        f'<div id="CID{cid}" class="calendar"><ol>' + "\n".join(entries)
+        for cid, entries in calendars.items()
+    )
+    return (
+        page[: page.index('class="calendar"')].rsplit("<div", 1)[0]
+        + lists
+        + page[list_end:]
+    )
+
+
+def civicplus_calendar(rows, seed=0, cid=52, changed_rows=(), edge_cases=0.0):
+    """
+    Build a CivicPlus calendar.aspx list view for one calendar ID with `rows`
+    entries, see `civicplus_entries`.
+    """
+    entries = civicplus_entries(
+        rows, seed, changed_rows=changed_rows, edge_cases=edge_cases
+    )
+    return civicplus_page({cid: [entry for _, entry in entries]})
+
+
+def bps_cell(text):
+    return f"<p>{text}</p>"
+
+
+def bps_edge_case(row, case, rng):
+    """Return a copy of a BPS table row with an edge case applied."""
+    row = list(row)
+    if case == "multi_date":
+        days = sorted(rng.sample(range(1, 29), 2))
+        row[2] = bps_cell(" & ".join(str(day) for day in days))
+        links = [
+            f'<a href="https://example.com/minutes/{day}" target="_blank" '
+            f'rel="noopener noreferrer">2/{day}/23 Minutes</a>'
+            for day in days
+        ]
+        row[5] = bps_cell("<br>".join(links))
+    elif case == "time_note":
+        row[2] = bps_cell(f"{rng.randint(1, 28)} (7:30 a.m.)")
+    elif case == "missing_cells":
+        row[4:] = [None, '<p class="medium-insert-active"><br></p>', None, None]
+    elif case == "cancelled":
+        row[3] = bps_cell("Special - <b>CANCELLED</b>")
+    return row
+
+
+def bps_meetings_page(copies=1, year_shift=0, history=0, seed=0, edge_cases=0.0):
+    """
+    Build the Bismarck Public Schools meetings page with every row of the
+    committed fixture repeated `copies` times in place, so rows stay newest
+    first. Years are moved forward by `year_shift`, to keep the rows within
+    the spider's cutoff when run against the current date. `history` older
+    copies of the whole table are appended, each one 8 years before the
+    last, to simulate an archive that goes back further.
+    """
+    rng = random.Random(seed)
+    page = read_fixture("bisnd_bps.html")
+    match = re.search(r'<input type="hidden" value="(\[\[&quot;<p[^"]*)"', page)
+    header, *rows = json.loads(match.group(1).replace("&quot;", '"'))
+    table = [header]
+    for shift in range(year_shift, year_shift - 8 * (history + 1), -8):
+        for row in rows:
+            year = re.sub(
+                r"\d{4}", lambda m: str(int(m.group(0)) + shift), row[0] or ""
+            )
+            for _ in range(copies):
+                new_row = [year, *row[1:]]
+                case = edge_case(rng, edge_cases, BPS_EDGE_CASES)
+                table.append(bps_edge_case(new_row, case, rng) if case else new_row)
+    # The page only escapes quotes in the attribute
+    value = json.dumps(table, ensure_ascii=False).replace('"', "&quot;")
+    return page[: match.start(1)] + value + page[match.end(1) :]
+
+
+def mortonnd_minutes_page(
+    rows, start=None, seed=0, edge_cases=0.0, fixture_dates=False
+):
+    """
+    Build the Morton County Commission minutes page with `rows` table rows by
+    cycling through the rows of the committed fixture. Dates count down one
+    day per row from `start` (today by default) and wrap around after a
+    year, so every row is recent enough for the spider to keep. With
+    `fixture_dates`, rows keep the dates of the fixture rows they're copied
+    from instead, moved up to the year of `start`, so that the share of rows
+    the spider keeps is the fixture's at any size.
+    """
+    rng = random.Random(seed)
+    page = read_fixture("bisnd_mcc.html")
+    table_start = page.index("<tbody>", page.index("<main")) + len("<tbody>")
+    table_end = page.index("</tbody>", table_start)
+    header, *templates = [
+        f"<tr>{row.split('</tr>')[0]}</tr>"
+        for row in page[table_start:table_end].split("<tr>")[1:]
+    ]
+    start = start or datetime.now()
+    table = [header]
+    for i in range(rows):
+        row = templates[i % len(templates)]
+        if fixture_dates:
+            # The fixture's newest rows are from 2024
+            date = re.sub(
+                r"(\w+ \d{1,2},? )(20\d\d)",
+                lambda m: f"{m.group(1)}{int(m.group(2)) + start.year - 2024}",
+                re.search(r"<span[^>]*>([^<]*)", row).group(1),
+            )
+        else:
+            day = start - timedelta(days=i % 365)
+            date = f"{day:%B} {day.day}, {day.year}"
+        case = edge_case(rng, edge_cases, MCC_EDGE_CASES)
+        if case == "no_date":
+            date = ""
+        elif case == "description":
+            date = f"{date} LEC Advisory Bd w/ Burleigh Co"
+        elif case == "cancelled":
+            date = f"{date} Cancelled"
+        elif case == "no_links":
+            row = re.sub(r"<a [^>]*>|</a>", "", row)
+        table.append(re.sub(r"(<span[^>]*>)[^<]*", rf"\g<1>{date}", row, 1))
+    return page[:table_start] + "\n".join(table) + page[table_end:]
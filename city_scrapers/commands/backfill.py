@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+from datetime import date, datetime
+from pathlib import Path
+
+from dateutil.relativedelta import relativedelta
+from scrapy.commands import ScrapyCommand
+from scrapy.crawler import Crawler
+from scrapy.exceptions import UsageError
+from scrapy.utils.project import data_path
+
+from city_scrapers.commands.crawlall import Command as CrawlAllCommand
+from city_scrapers.mixins.incremental import IncrementalMixin
+from city_scrapers.utils import write_file
+
+logger = logging.getLogger(__name__)
+
+# Accepted date formats, with the length of the period each one names
+DATE_FORMATS = (
+    ("%Y-%m-%d", relativedelta(days=1)),
+    ("%Y-%m", relativedelta(months=1)),
+    ("%Y", relativedelta(years=1)),
+)
+
+
+def parse_date(value, end=False):
+    """
+    Parse a YYYY, YYYY-MM or YYYY-MM-DD date as the first day of the period
+    it names, or the last one with `end`.
+    """
+    for fmt, period in DATE_FORMATS:
+        try:
+            day = datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+        return day + period - relativedelta(days=1) if end else day
+    raise UsageError(f"Invalid date: {value}, expected YYYY, YYYY-MM or YYYY-MM-DD")
+
+
+def month_chunks(start, end):
+    """Split the days from `start` to `end` into (first, last) days by month"""
+    chunks = []
+    first = start
+    while first <= end:
+        next_month = first.replace(day=1) + relativedelta(months=1)
+        last = min(end, next_month - relativedelta(days=1))
+        chunks.append((first, last))
+        first = next_month
+    return chunks
+
+
+class Command(CrawlAllCommand):
+    """
+    Crawl past meetings of the spiders asking for a date window (the BCC and
+    Mandan spiders), one month at a time. Each spider and month is a chunk,
+    run as its own crawl in a single process with the limits of `crawlall`,
+    oldest month first so that chunks of the same month share consolidated
+    downloads.
+
+    Chunks write their items to `chunks/<spider>/<month>.jl` in the output
+    directory, BACKFILL_DIR by default, and are recorded in its `checkpoint`
+    file once finished, so a backfill that is run again skips them. Finished
+    chunks are then merged into a `<spider>.jl` feed per spider, sorted by
+    start and with duplicate meetings removed. With JOB_CHECKPOINT_ENABLED, as
+    in the archive settings, a chunk that was cut short also resumes from its
+    job journal in `jobs/<month>`.
+    """
+
+    def syntax(self):
+        return "--from DATE [--to DATE] [options] [spider ...]"
+
+    def short_desc(self):
+        return "Crawl past meetings month by month, resuming unfinished backfills"
+
+    def add_options(self, parser):
+        # Chunks write their own feeds, so -o/-O and -a of crawlall are left out
+        ScrapyCommand.add_options(self, parser)
+        self._add_concurrency_options(parser)
+        parser.add_argument(
+            "--from",
+            dest="date_from",
+            required=True,
+            help="first day to crawl, as YYYY, YYYY-MM or YYYY-MM-DD",
+        )
+        parser.add_argument(
+            "--to",
+            dest="date_to",
+            help="last day to crawl, as YYYY, YYYY-MM or YYYY-MM-DD, today if unset",
+        )
+        parser.add_argument(
+            "--output",
+            dest="output",
+            help="directory of the chunks, checkpoint and feeds",
+        )
+
+    def process_options(self, args, opts):
+        ScrapyCommand.process_options(self, args, opts)
+        self._process_concurrency_options(opts)
+
+    def run(self, args, opts):
+        self.date_from = parse_date(opts.date_from)
+        self.date_to = (
+            parse_date(opts.date_to, end=True) if opts.date_to else date.today()
+        )
+        if self.date_from > self.date_to:
+            raise UsageError("--from must not be after --to")
+        self.output = Path(
+            opts.output or data_path(self.settings["BACKFILL_DIR"], createdir=True)
+        )
+        self.output.mkdir(parents=True, exist_ok=True)
+        checkpoint_path = self.output / "checkpoint"
+        self.completed = set()
+        if checkpoint_path.exists():
+            self.completed = set(checkpoint_path.read_text().split())
+        self.chunks = {}
+        self.skipped = 0
+        self.finished = 0
+        with open(checkpoint_path, "a") as self.checkpoint:
+            super().run(args, opts)
+        self._merge()
+
+    def _queue(self, args):
+        spider_loader = self.crawler_process.spider_loader
+        spiders = [
+            (name, host)
+            for name, host in super()._queue(args)
+            if issubclass(spider_loader.load(name), IncrementalMixin)
+        ]
+        if args and len(spiders) < len(args):
+            raise UsageError("Only spiders asking for a date window can be backfilled")
+        queue = []
+        for first, last in month_chunks(self.date_from, self.date_to):
+            for name, host in spiders:
+                key = f"{name}/{first:%Y-%m}"
+                self.chunks[key] = (name, first, last)
+                if key in self.completed:
+                    self.skipped += 1
+                else:
+                    queue.append((key, host))
+        return queue
+
+    def _crawl(self, key):
+        name, first, last = self.chunks[key]
+        settings = self.settings.copy()
+        feed = self._chunk_path(name, first)
+        settings.set("FEEDS", {str(feed): {"format": "jsonlines"}}, "cmdline")
+        settings.set("FEED_URI", None, "cmdline")
+        # Items replayed for one month would be stored under the spider's name,
+        # replacing the state of its regular runs
+        settings.set("UNCHANGED_RESPONSES_ENABLED", False, "cmdline")
+        # Chunks of a spider run side by side, each with its own job journal
+        settings.set(
+            "JOB_CHECKPOINT_DIR",
+            str(self.output.resolve() / "jobs" / f"{first:%Y-%m}"),
+            "cmdline",
+        )
+        settings.set("JOB_CHECKPOINT_ID", f"backfill/{key}", "cmdline")
+        crawler = Crawler(self.crawler_process.spider_loader.load(name), settings)
+        d = self.crawler_process.crawl(
+            crawler, start_date=f"{first:%Y-%m-%d}", end_date=f"{last:%Y-%m-%d}"
+        )
+        return crawler, d
+
+    def _finished(self, _, crawler, key, host):
+        reason = crawler.stats and crawler.stats.get_value("finish_reason")
+        if reason == "finished" and key not in self.failed:
+            self.completed.add(key)
+            self.finished += 1
+            self.checkpoint.write(f"{key}\n")
+            self.checkpoint.flush()
+            os.fsync(self.checkpoint.fileno())
+        super()._finished(_, crawler, key, host)
+
+    def _chunk_path(self, name, first):
+        return self.output / "chunks" / name / f"{first:%Y-%m}.jl"
+
+    def _merge(self):
+        """Write the items of each spider's finished chunks as one feed"""
+        chunks = {}
+        for key, (name, first, _) in self.chunks.items():
+            path = self._chunk_path(name, first)
+            if key in self.completed and path.exists():
+                chunks.setdefault(name, []).append(path)
+        for name, paths in chunks.items():
+            items = {}
+            for path in paths:
+                for line in path.read_text().splitlines():
+                    if line:
+                        item = json.loads(line)
+                        items[item.get("id") or line] = item
+            ordered = sorted(
+                items.values(),
+                key=lambda item: (item.get("start") or "", item.get("id") or ""),
+            )
+            write_file(
+                self.output / f"{name}.jl",
+                "".join(f"{json.dumps(item)}\n" for item in ordered),
+            )
+            logger.info(f"Wrote {len(ordered)} meetings to {name}.jl")
+
+    def _report(self, total):
+        print(
+            f"{self.finished} chunks finished, "
+            f"{self.skipped} already done, {len(self.failed)} failed in {total:.2f}s"
+        )
+        if self.failed:
+            print(f"failed: {', '.join(sorted(self.failed))}")
@@ -0,0 +1,169 @@
+import logging
+import time
+from collections import Counter, deque
+from urllib.parse import urlparse
+
+from scrapy.commands import BaseRunSpiderCommand
+from scrapy.exceptions import UsageError
+
+logger = logging.getLogger(__name__)
+
+
+def spider_host(spidercls):
+    """
+    Return the host a spider class crawls. Mixin spiders expose it via
+    `host` or `base_url`, standalone spiders via `start_urls`.
+    """
+    urls = list(getattr(spidercls, "start_urls", None) or [])
+    for attr in ("host", "base_url"):
+        url = getattr(spidercls, attr, None)
+        if isinstance(url, str):
+            urls.insert(0, url)
+    for url in urls:
+        netloc = urlparse(url).netloc
+        if netloc:
+            return netloc
+    return spidercls.name
+
+
+class Command(BaseRunSpiderCommand):
+    """
+    Run every spider in a single process and reactor. Spiders are started
+    from a queue so that at most CRAWLALL_CONCURRENCY spiders run at once,
+    and at most CRAWLALL_CONCURRENCY_PER_HOST of them hit the same host. These
+    limits count spiders, not requests, which HostLimitMiddleware limits.
+
+    Since spiders share the process, consolidated fetches that let spiders of
+    the same source share one download are enabled by default.
+
+    Like `scrapy crawl`, items can be written with -o/-O and spider arguments
+    given with -a. When more than one spider runs, output URIs need a
+    `%(name)s` placeholder so that spiders don't write to the same file.
+    """
+
+    requires_project = True
+    default_settings = {"BCC_CONSOLIDATED": True, "MC_BATCHED": True}
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run all spiders (or the ones given) in a single process"
+
+    def add_options(self, parser):
+        BaseRunSpiderCommand.add_options(self, parser)
+        self._add_concurrency_options(parser)
+
+    def process_options(self, args, opts):
+        BaseRunSpiderCommand.process_options(self, args, opts)
+        self._process_concurrency_options(opts)
+        self.spargs = opts.spargs
+        uris = (opts.output or []) + (opts.overwrite_output or [])
+        if len(args) != 1 and any("%(name)s" not in uri for uri in uris):
+            raise UsageError(
+                "Output URIs need a %(name)s placeholder when running several spiders",
+                print_help=False,
+            )
+
+    def _add_concurrency_options(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            dest="concurrency",
+            type=int,
+            help="maximum number of spiders running at once",
+        )
+        parser.add_argument(
+            "--concurrency-per-host",
+            dest="concurrency_per_host",
+            type=int,
+            help="maximum number of spiders (not requests) running at once "
+            "against one host",
+        )
+
+    def _process_concurrency_options(self, opts):
+        if opts.concurrency is not None:
+            self.settings.set("CRAWLALL_CONCURRENCY", opts.concurrency, "cmdline")
+        if opts.concurrency_per_host is not None:
+            self.settings.set(
+                "CRAWLALL_CONCURRENCY_PER_HOST", opts.concurrency_per_host, "cmdline"
+            )
+
+    def run(self, args, opts):
+        self.concurrency = self.settings.getint("CRAWLALL_CONCURRENCY", 8)
+        self.concurrency_per_host = self.settings.getint(
+            "CRAWLALL_CONCURRENCY_PER_HOST", 4
+        )
+        if self.concurrency < 1 or self.concurrency_per_host < 1:
+            raise UsageError("Concurrency limits must be at least 1")
+
+        self.pending = deque(self._queue(args))
+        self.running = Counter()
+        self.timings = {}
+        self.failed = []
+
+        self.started_at = time.monotonic()
+        self._start_next()
+        self.crawler_process.start()
+        self._report(time.monotonic() - self.started_at)
+        if self.failed:
+            self.exitcode = 1
+
+    def _queue(self, args):
+        """Return the (name, host) pairs of the crawls to run"""
+        spider_loader = self.crawler_process.spider_loader
+        spider_list = spider_loader.list()
+        unknown = [name for name in args if name not in spider_list]
+        if unknown:
+            raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+        return [
+            (name, spider_host(spider_loader.load(name)))
+            for name in (args or spider_list)
+        ]
+
+    def _crawl(self, name):
+        """Start a queued crawl, returning its crawler and Deferred"""
+        crawler = self.crawler_process.create_crawler(name)
+        return crawler, self.crawler_process.crawl(crawler, **self.spargs)
+
+    def _start_next(self):
+        """Start queued spiders until the global or per-host limits are hit"""
+        deferred = deque()
+        while self.pending and sum(self.running.values()) < self.concurrency:
+            name, host = self.pending.popleft()
+            if self.running[host] >= self.concurrency_per_host:
+                deferred.append((name, host))
+                continue
+            self.running[host] += 1
+            self.timings[name] = time.monotonic()
+            crawler, d = self._crawl(name)
+            d.addErrback(self._failed, name)
+            d.addBoth(self._finished, crawler, name, host)
+        # Keep the original order for spiders that were held back by their host
+        self.pending.extendleft(reversed(deferred))
+
+    def _failed(self, failure, name):
+        logger.error(f"Spider {name} failed: {failure.getErrorMessage()}")
+        self.failed.append(name)
+
+    def _finished(self, _, crawler, name, host):
+        self.timings[name] = time.monotonic() - self.timings[name]
+        # Spiders closed early, like for going over a memory budget, also fail
+        reason = crawler.stats and crawler.stats.get_value("finish_reason")
+        if reason not in (None, "finished") and name not in self.failed:
+            logger.error(f"Spider {name} closed early: {reason}")
+            self.failed.append(name)
+        self.running[host] -= 1
+        self._start_next()
+
+    def _report(self, total):
+        width = max((len(name) for name in self.timings), default=0)
+        lines = [
+            f"{name:<{width}}  {elapsed:8.2f}s"
+            for name, elapsed in sorted(
+                self.timings.items(), key=lambda t: t[1], reverse=True
+            )
+        ]
+        lines.append(f"{'total':<{width}}  {total:8.2f}s")
+        if self.failed:
+            lines.append(f"failed: {', '.join(sorted(self.failed))}")
+        print("\n".join(lines))
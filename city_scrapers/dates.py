@@ -0,0 +1,96 @@
+"""
+Date parsing for the formats the spiders' sources use. Known formats are
+parsed by hand instead of through `datetime.strptime` or dateutil, and
+results are memoized since sources repeat the same strings across rows and
+runs. Anything else falls back to `dateutil.parser.parse`, which isn't
+memoized since it fills the fields missing from partial dates from today.
+"""
+
+import calendar
+from datetime import date, datetime
+from functools import lru_cache
+
+from dateutil import parser
+
+MONTHS = {
+    **{name.lower(): i for i, name in enumerate(calendar.month_name) if name},
+    **{name.lower(): i for i, name in enumerate(calendar.month_abbr) if name},
+    "sept": 9,
+}
+
+
+def parse_iso_datetime(value):
+    """
+    Parse a "YYYY-MM-DDTHH:MM:SS" datetime, optionally followed by "Z", as a
+    naive datetime. Other strings are parsed by dateutil, dropping any
+    timezone.
+    """
+    result = _parse_iso_datetime(value)
+    if result is None:
+        return parser.parse(value, ignoretz=True)
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso_datetime(value):
+    """Parse the datetimes `parse_iso_datetime` knows, None for others"""
+    if (
+        len(value) in (19, 20)
+        and value[4] == value[7] == "-"
+        and value[10] in "T "
+        and value[13] == value[16] == ":"
+        and value[19:] in ("", "Z")
+    ):
+        try:
+            return datetime(
+                int(value[:4]),
+                int(value[5:7]),
+                int(value[8:10]),
+                int(value[11:13]),
+                int(value[14:16]),
+                int(value[17:19]),
+            )
+        except ValueError:
+            pass
+    return None
+
+
+def parse_date(value):
+    """
+    Parse a date made of a month name, a day and a 4 digit year in any order,
+    like "December 26, 2024" or "2024 March 25". Other strings are parsed by
+    dateutil.
+    """
+    result = _parse_date(value)
+    if result is None:
+        return parser.parse(value).date()
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(value):
+    """Parse the dates `parse_date` knows, None for others"""
+    month = day = year = None
+    for word in value.replace(",", " ").split():
+        word = word.rstrip(".").lower()
+        if word in MONTHS and month is None:
+            month = MONTHS[word]
+        elif word.isdecimal() and len(word) == 4 and year is None:
+            year = int(word)
+        elif word.isdecimal() and len(word) <= 2 and day is None:
+            day = int(word)
+        else:
+            break
+    else:
+        if month and day and year:
+            try:
+                return date(year, month, day)
+            except ValueError:
+                pass
+    return None
+
+
+def cache_clear():
+    """Clear the memoized results, as in a new process"""
+    _parse_iso_datetime.cache_clear()
+    _parse_date.cache_clear()
@@ -0,0 +1,238 @@
+import json
+import logging
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+from city_scrapers.utils import wrap_pipelines, write_file
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def quantiles(values, qs=QUANTILES):
+    """Return the nearest-rank quantiles of `values`, empty if there are none"""
+    ordered = sorted(values)
+    return {q: ordered[max(0, math.ceil(q * len(ordered)) - 1)] for q in qs if ordered}
+
+
+class PerformanceStatsExtension:
+    """
+    Extension that measures where a spider's run time goes: download latency
+    and bytes received, time in parse callbacks (recorded by
+    ParseTimingMiddleware), items per second, time between items and time
+    running each item pipeline, without the time a Deferred it returns waits
+    before firing. When the spider closes, the measurements are written
+    to PERFORMANCE_STATS_DIR as `<spider>.json` and as `<spider>.prom` in the
+    format of the Prometheus node exporter's textfile collector.
+
+    Enabled with PERFORMANCE_STATS_ENABLED.
+    """
+
+    def __init__(self, crawler, path):
+        self.crawler = crawler
+        self.path = path
+        self.opened_at = None
+        self.latencies = []
+        self.received_bytes = 0
+        self.item_times = []
+        self.pipeline_seconds = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("PERFORMANCE_STATS_ENABLED"):
+            raise NotConfigured
+        path = data_path(crawler.settings["PERFORMANCE_STATS_DIR"], createdir=True)
+        extension = cls(crawler, path)
+        crawler.signals.connect(extension.spider_opened, signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signals.spider_closed)
+        crawler.signals.connect(extension.response_received, signals.response_received)
+        crawler.signals.connect(extension.bytes_received, signals.bytes_received)
+        crawler.signals.connect(extension.item_scraped, signals.item_scraped)
+        return extension
+
+    def spider_opened(self, spider):
+        self.opened_at = time.monotonic()
+        wrap_pipelines(self.crawler.engine.scraper.itemproc, self._timed)
+
+    def _timed(self, pipeline, process_item):
+        name = type(pipeline).__name__
+        self.pipeline_seconds[name] = 0.0
+
+        def timed_process_item(item, spider):
+            # Only the call itself, a Deferred it returns may wait on I/O
+            started = time.perf_counter()
+            try:
+                return process_item(item, spider)
+            finally:
+                self.pipeline_seconds[name] += time.perf_counter() - started
+
+        return timed_process_item
+
+    def response_received(self, response, request, spider):
+        # Responses served from memory, like shared ones, have no latency
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def bytes_received(self, data, request, spider):
+        self.received_bytes += len(data)
+
+    def item_scraped(self, item, spider):
+        self.item_times.append(time.monotonic())
+
+    def spider_closed(self, spider, reason):
+        summary = self.summary(spider, reason)
+        write_file(
+            Path(self.path, f"{spider.name}.json"), json.dumps(summary, indent=2)
+        )
+        write_file(Path(self.path, f"{spider.name}.prom"), self.prometheus(summary))
+        logger.info(
+            f"{spider.name}: {summary['items']['count']} items in "
+            f"{summary['elapsed_seconds']:.2f}s, "
+            f"{summary['download']['latency_seconds'].get('0.5', 0):.3f}s median "
+            f"latency, {summary['parse']['seconds']:.2f}s parsing, "
+            f"{sum(summary['pipelines'].values()):.2f}s in pipelines"
+        )
+
+    def summary(self, spider, reason):
+        elapsed = time.monotonic() - self.opened_at
+        stats = self.crawler.stats.get_stats(spider)
+        prefix = "performance/parse_seconds/"
+        callbacks = {
+            key[len(prefix) :]: value
+            for key, value in stats.items()
+            if key.startswith(prefix)
+        }
+        intervals = [
+            later - earlier
+            for earlier, later in zip(self.item_times, self.item_times[1:])
+        ]
+        return {
+            "spider": spider.name,
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "reason": reason,
+            "elapsed_seconds": elapsed,
+            "download": {
+                "responses": len(self.latencies),
+                "bytes": self.received_bytes,
+                "latency_seconds": {
+                    str(q): value for q, value in quantiles(self.latencies).items()
+                },
+                "latency_seconds_sum": sum(self.latencies),
+            },
+            "parse": {"seconds": sum(callbacks.values()), "callbacks": callbacks},
+            "items": {
+                "count": len(self.item_times),
+                "per_second": len(self.item_times) / elapsed if elapsed else 0,
+                "interval_seconds": {
+                    str(q): value for q, value in quantiles(intervals).items()
+                },
+                "interval_seconds_sum": sum(intervals),
+                "intervals": len(intervals),
+            },
+            "pipelines": self.pipeline_seconds,
+        }
+
+    @staticmethod
+    def prometheus(summary):
+        """Format a summary in the Prometheus text exposition format"""
+        spider = f'spider="{summary["spider"]}"'
+        download = summary["download"]
+        items = summary["items"]
+
+        def quantile_samples(values, total, count):
+            return [
+                *(
+                    ("", f'{spider},quantile="{q}"', value)
+                    for q, value in values.items()
+                ),
+                ("_sum", spider, total),
+                ("_count", spider, count),
+            ]
+
+        metrics = [
+            (
+                "download_latency_seconds",
+                "summary",
+                "Time from sending a request to receiving its response",
+                quantile_samples(
+                    download["latency_seconds"],
+                    download["latency_seconds_sum"],
+                    download["responses"],
+                ),
+            ),
+            (
+                "received_bytes_total",
+                "counter",
+                "Bytes downloaded",
+                [("", spider, download["bytes"])],
+            ),
+            (
+                "parse_seconds_total",
+                "counter",
+                "Time spent in spider callbacks",
+                [
+                    ("", f'{spider},callback="{callback}"', seconds)
+                    for callback, seconds in summary["parse"]["callbacks"].items()
+                ],
+            ),
+            ("items_total", "counter", "Items scraped", [("", spider, items["count"])]),
+            (
+                "items_per_second",
+                "gauge",
+                "Items scraped per second of run time",
+                [("", spider, items["per_second"])],
+            ),
+            (
+                "item_interval_seconds",
+                "summary",
+                "Time between consecutive items",
+                quantile_samples(
+                    items["interval_seconds"],
+                    items["interval_seconds_sum"],
+                    items["intervals"],
+                ),
+            ),
+            (
+                "pipeline_seconds_total",
+                "counter",
+                "Time spent running each item pipeline, not waiting on it",
+                [
+                    ("", f'{spider},pipeline="{pipeline}"', seconds)
+                    for pipeline, seconds in summary["pipelines"].items()
+                ],
+            ),
+            (
+                "elapsed_seconds",
+                "gauge",
+                "Run time of the spider",
+                [("", spider, summary["elapsed_seconds"])],
+            ),
+            (
+                "last_run_timestamp_seconds",
+                "gauge",
+                "When the spider closed",
+                [
+                    (
+                        "",
+                        spider,
+                        datetime.fromisoformat(summary["finished"]).timestamp(),
+                    )
+                ],
+            ),
+        ]
+        lines = []
+        for name, kind, description, samples in metrics:
+            name = f"city_scrapers_{name}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
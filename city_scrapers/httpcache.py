@@ -0,0 +1,69 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+from time import time
+
+from scrapy.extensions.httpcache import FilesystemCacheStorage, RFC2616Policy
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalGetPolicy(RFC2616Policy):
+    """
+    RFC2616 cache policy that never trusts a cached response without asking
+    the server. Every cached page is revalidated with If-None-Match and
+    If-Modified-Since, and a 304 response hands the cached body to the spider.
+    """
+
+    def is_cached_response_fresh(self, cachedresponse, request):
+        self._set_conditional_validators(request, cachedresponse)
+        return False
+
+
+class EvictingFilesystemCacheStorage(FilesystemCacheStorage):
+    """
+    Filesystem cache storage that evicts entries when a spider closes. Entries
+    not used for HTTPCACHE_EXPIRATION_SECS are removed, then the least
+    recently used ones until the whole cache directory fits HTTPCACHE_MAX_SIZE.
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.max_size = settings.getint("HTTPCACHE_MAX_SIZE")
+
+    def close_spider(self, spider):
+        super().close_spider(spider)
+        self.evict()
+
+    def retrieve_response(self, spider, request):
+        response = super().retrieve_response(spider, request)
+        if response is not None:
+            # Age is measured from the last time an entry was used
+            os.utime(Path(self._get_request_path(spider, request), "pickled_meta"))
+        return response
+
+    def evict(self):
+        entries = []
+        # Entries are stored as <cachedir>/<spider>/<key prefix>/<key>/
+        for path in Path(self.cachedir).glob("*/*/*"):
+            try:
+                used = (path / "pickled_meta").stat().st_mtime
+                size = sum(f.stat().st_size for f in path.iterdir())
+            except (FileNotFoundError, NotADirectoryError):
+                # Partially written or removed by another process
+                continue
+            entries.append((used, size, path))
+
+        now = time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for used, size, path in sorted(entries, key=lambda entry: entry[0]):
+            expired = 0 < self.expiration_secs < now - used
+            if not expired and not 0 < self.max_size < total:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.debug(f"Evicted {removed} entries from the HTTP cache")
@@ -1,7 +1,49 @@
+import cProfile
+import hashlib
+import logging
+import os
+import pickle
+import pstats
 import random
+import re
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
+from datetime import datetime
+from importlib import import_module
+from pathlib import Path
+from urllib.parse import urlparse, urlunparse
 
 from city_scrapers_core.items import Meeting
+from itemadapter import is_item
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.extensions.feedexport import FeedExporter, FileFeedStorage
+from scrapy.http import Response
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.project import data_path
+from scrapy.utils.request import fingerprint, request_from_dict
 from scrapy_wayback_middleware import WaybackMiddleware
+from twisted.internet import task
+from twisted.internet.defer import Deferred
+
+from city_scrapers.utils import (
+    code_version,
+    collapsed_stacks,
+    wrap_pipelines,
+    write_file,
+    write_pickle,
+)
+
+logger = logging.getLogger(__name__)
+
+# The city_scrapers package, to tell this project's frames from library ones
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
 
 
 class CityScrapersWaybackMiddleware(WaybackMiddleware):
@@ -22,3 +64,1279 @@ class CityScrapersWaybackMiddleware(WaybackMiddleware):
                 [doc.get("url") for doc in item.get("documents", [])], MAX_LINKS
             )
         return []
+
+
+class SharedResponseMiddleware:
+    """
+    Downloader middleware that downloads requests flagged with
+    `meta["shared_response"]` once per process and hands the response to every
+    spider asking for the same request. This lets spiders that run side by side
+    in `scrapy crawlall` share a consolidated page instead of each fetching it.
+
+    With COALESCE_REQUESTS, other requests are shared while they're in flight:
+    a request with the same fingerprint (method, URL and body) as one being
+    downloaded waits for that download and gets its response, whatever its
+    status, but responses aren't kept afterwards. Requests answered without a
+    download are counted in `shared_response/saved_count`.
+
+    Only successful responses of flagged requests are kept, and only the
+    SHARED_RESPONSE_CACHE_SIZE most recently used ones, so that a long process
+    like a backfill, where each month adds its own pages, doesn't keep every
+    page in memory. When a download fails, or without COALESCE_REQUESTS when
+    it isn't successful, any spiders waiting on it fall back to downloading
+    the request themselves. It should
+    sit before HttpCacheMiddleware so that a revalidated (304) download is
+    shared as the cached page.
+    """
+
+    # Shared by every crawler in the process, keyed by request fingerprint
+    responses = OrderedDict()
+    leaders = {}
+    waiting = defaultdict(list)
+
+    def __init__(self, stats=None, coalesce=False, max_responses=32):
+        self.stats = stats
+        self.coalesce = coalesce
+        # Each crawler trims the shared responses to its own limit when it keeps one
+        self.max_responses = max_responses
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            crawler.stats,
+            settings.getbool("COALESCE_REQUESTS"),
+            settings.getint("SHARED_RESPONSE_CACHE_SIZE", 32),
+        )
+
+    async def process_request(self, request, spider):
+        if not self._shared(request):
+            return None
+        key = fingerprint(request)
+        response = self.responses.get(key)
+        if response is not None:
+            self.responses.move_to_end(key)
+        elif key in self.leaders:
+            d = Deferred()
+            self.waiting[key].append(d)
+            response = await maybe_deferred_to_future(d)
+        if response is not None:
+            if self.stats is not None:
+                self.stats.inc_value("shared_response/saved_count", spider=spider)
+            # "cached" keeps HttpCacheMiddleware from storing the copy again
+            flags = [
+                flag for flag in ("cached", "shared") if flag not in response.flags
+            ]
+            return response.replace(request=request, flags=response.flags + flags)
+        if key not in self.leaders:
+            self.leaders[key] = request
+        return None
+
+    def process_response(self, request, response, spider):
+        key = self._leader_key(request)
+        if key is not None:
+            if response.status == 200 and request.meta.get("shared_response"):
+                self._keep(key, response)
+            self._release(key, response)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        key = self._leader_key(request)
+        if key is not None:
+            self._release(key, None)
+
+    def _shared(self, request):
+        return self.coalesce or request.meta.get("shared_response")
+
+    def _leader_key(self, request):
+        if not self._shared(request):
+            return None
+        key = fingerprint(request)
+        return key if self.leaders.get(key) is request else None
+
+    def _keep(self, key, response):
+        self.responses[key] = response
+        self.responses.move_to_end(key)
+        while len(self.responses) > self.max_responses:
+            self.responses.popitem(last=False)
+
+    def _release(self, key, response):
+        del self.leaders[key]
+        # Without coalescing, waiting requests only get responses that are kept
+        if not (self.coalesce or key in self.responses):
+            response = None
+        for d in self.waiting.pop(key, []):
+            d.callback(response)
+
+
+class UnchangedResponseMiddleware:
+    """
+    Spider middleware that skips parsing a response when its body is the same
+    as one the spider parsed in a previous run, and replays the items stored
+    from that run instead. Only `status` is recomputed, since it depends on
+    the current time, and a `source` taken from the response is updated.
+
+    Bodies are compared after removing volatile ASP.NET tokens, together with
+    the callback, the current year (for year-based cutoffs in spiders) and the
+    source of the spider's own classes, so parser changes invalidate old items.
+    Responses whose callbacks also schedule requests are always parsed.
+
+    Spiders opt in with `replay_unchanged_responses = True`. Replayed items go
+    through the spider's `_record_meeting` and are followed by its
+    `_carried_meetings`, if it has them, so IncrementalMixin stores and carries
+    meetings as if the response had been parsed. Carried meetings come from
+    the spider's own state and aren't stored with the response. It is enabled
+    with UNCHANGED_RESPONSES_ENABLED and stores items in UNCHANGED_RESPONSES_DIR.
+    """
+
+    volatile_patterns = [
+        re.compile(
+            rb'<input[^>]*name="__(?:VIEWSTATE|VIEWSTATEGENERATOR|EVENTVALIDATION|'
+            rb'EVENTTARGET|EVENTARGUMENT|RequestVerificationToken)"[^>]*>'
+        ),
+        re.compile(rb"(?<=Resource\.axd\?)[^\"']*"),
+    ]
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+        self.previous = {}
+        self.current = {}
+        self.code_version = ""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("UNCHANGED_RESPONSES_ENABLED"):
+            raise NotConfigured
+        path = data_path(crawler.settings["UNCHANGED_RESPONSES_DIR"], createdir=True)
+        middleware = cls(path, crawler.stats)
+        crawler.signals.connect(middleware.spider_opened, signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.code_version = code_version(type(spider))
+        try:
+            with open(self._state_path(spider), "rb") as f:
+                self.previous = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            logger.warning(f"Ignoring unreadable stored items for {spider.name}")
+
+    def spider_closed(self, spider, reason):
+        # Entries not seen in a complete run belong to pages that changed
+        state = (
+            self.current if reason == "finished" else {**self.previous, **self.current}
+        )
+        write_pickle(self._state_path(spider), state)
+
+    def process_spider_output(self, response, result, spider):
+        if not getattr(spider, "replay_unchanged_responses", False):
+            yield from result
+            return
+        key = self._fingerprint(response, spider)
+        source = response.meta.get("source", response.url)
+        if key in self.previous:
+            # The callback's generator is never started, so nothing is parsed
+            self.current[key] = self.previous[key]
+            self.stats.inc_value("unchanged_responses/replayed", spider=spider)
+            stored_source, items = self.previous[key]
+            record = getattr(spider, "_record_meeting", None)
+            for item in items:
+                item = self._replay(item, stored_source, source, spider)
+                yield record(item) if record else item
+            carried = getattr(spider, "_carried_meetings", None)
+            if carried:
+                yield from carried(response)
+            return
+
+        items = []
+        for output in result:
+            if isinstance(output, Request):
+                items = None
+            elif items is not None:
+                items.append(deepcopy(output))
+            yield output
+        if items is not None:
+            carried_ids = getattr(spider, "_carried_ids", ())
+            self.current[key] = (
+                source,
+                [item for item in items if item.get("id") not in carried_ids],
+            )
+
+    def _replay(self, item, stored_source, source, spider):
+        item = deepcopy(item)
+        if isinstance(item, Meeting):
+            if item.get("source") == stored_source:
+                item["source"] = source
+            item["status"] = spider._get_status(item)
+        return item
+
+    def _fingerprint(self, response, spider):
+        body = response.body
+        for pattern in self.volatile_patterns:
+            body = pattern.sub(b"", body)
+        callback = response.request.callback or spider.parse
+        key = hashlib.sha1(body)
+        key.update(getattr(callback, "__name__", "").encode())
+        key.update(str(datetime.now().year).encode())
+        key.update(self.code_version.encode())
+        return key.hexdigest()
+
+    def _state_path(self, spider):
+        return Path(self.path, f"{spider.name}.pickle")
+
+
+class MockServerMiddleware:
+    """
+    Downloader middleware that sends requests for the hosts in
+    MOCK_SERVER_HOSTS to the mock server address they map to, see
+    `benchmarks.mockserver`. Requests keep the downloader slot of their
+    original host, since mocked sites may only differ by port, and responses
+    get the original URL back, so spiders produce the same items as against
+    the live sites.
+    """
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        hosts = crawler.settings.getdict("MOCK_SERVER_HOSTS")
+        if not hosts:
+            raise NotConfigured
+        return cls(hosts)
+
+    def process_request(self, request, spider):
+        if "mock_server_url" in request.meta:
+            return None
+        url = urlparse_cached(request)
+        address = self.hosts.get(url.netloc)
+        if address is None:
+            return None
+        mock_url = urlunparse(urlparse(address)[:2] + url[2:])
+        return request.replace(
+            url=mock_url,
+            meta={
+                "download_slot": url.netloc,
+                **request.meta,
+                "mock_server_url": request.url,
+            },
+            dont_filter=True,
+        )
+
+    def process_response(self, request, response, spider):
+        if "mock_server_url" not in request.meta:
+            return response
+        return response.replace(url=request.meta["mock_server_url"])
+
+
+class ParseTimingMiddleware:
+    """
+    Spider middleware that adds the time spent in each spider callback to the
+    `performance/parse_seconds/<callback>` stats, for
+    PerformanceStatsExtension. It should sit last, closest to the spider, so
+    that only the callback is timed. Enabled with PERFORMANCE_STATS_ENABLED.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("PERFORMANCE_STATS_ENABLED"):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_spider_output(self, response, result, spider):
+        callback = response.request.callback or spider.parse
+        key = f"performance/parse_seconds/{getattr(callback, '__name__', 'parse')}"
+        elapsed = 0.0
+        result = iter(result)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    output = next(result)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield output
+        finally:
+            self.stats.inc_value(key, elapsed, spider=spider)
+
+
+class CpuProfileMiddleware:
+    """
+    Spider middleware that runs a spider's callbacks and item pipelines under
+    cProfile. When the spider closes, the profile is saved as
+    `<spider>.pstats` and as collapsed stacks for flame graph tools in
+    `<spider>.collapsed`. Files go to CPU_PROFILE_DIR, or else next to a local
+    feed file, or else to `profiles` in the project data dir.
+
+    Enabled for every spider with CPU_PROFILE_ENABLED, which spiders can also
+    set in `custom_settings`, or for the spiders listed in CPU_PROFILE_SPIDERS.
+    Otherwise the middleware isn't installed, so it adds no overhead.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not (
+            settings.getbool("CPU_PROFILE_ENABLED")
+            or getattr(crawler.spidercls, "name", None)
+            in settings.getlist("CPU_PROFILE_SPIDERS")
+        ):
+            raise NotConfigured
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        wrap_pipelines(self.crawler.engine.scraper.itemproc, self._profiled)
+
+    def _profiled(self, pipeline, process_item):
+        def profiled_process_item(item, spider):
+            return self._run(process_item, item, spider)
+
+        return profiled_process_item
+
+    def _run(self, func, *args):
+        if self.active:
+            return func(*args)
+        self.active = True
+        self.profile.enable()
+        try:
+            return func(*args)
+        finally:
+            self.profile.disable()
+            self.active = False
+
+    def process_spider_output(self, response, result, spider):
+        result = iter(result)
+        while True:
+            try:
+                output = self._run(next, result)
+            except StopIteration:
+                return
+            yield output
+
+    def spider_closed(self, spider, reason):
+        self.profile.create_stats()
+        if not self.profile.stats:
+            logger.info(f"No CPU profile saved for {spider.name}, nothing ran")
+            return
+        stats = pstats.Stats(self.profile)
+        path = self.output_dir()
+        stats.dump_stats(Path(path, f"{spider.name}.pstats"))
+        write_file(
+            Path(path, f"{spider.name}.collapsed"),
+            "\n".join(collapsed_stacks(stats)) + "\n",
+        )
+        logger.info(f"Saved CPU profile for {spider.name} to {path}")
+
+    def output_dir(self):
+        settings = self.crawler.settings
+        if settings.get("CPU_PROFILE_DIR"):
+            return data_path(settings["CPU_PROFILE_DIR"], createdir=True)
+        feeds = [*settings.getdict("FEEDS"), settings.get("FEED_URI")]
+        for uri in map(str, filter(None, feeds)):
+            parsed = urlparse(uri)
+            if parsed.scheme not in ("", "file"):
+                continue
+            directory = os.path.dirname(os.path.abspath(parsed.path))
+            # Skip directories named after feed URI parameters like %(name)s
+            if "%" not in directory:
+                os.makedirs(directory, exist_ok=True)
+                return directory
+        return data_path("profiles", createdir=True)
+
+
+class MemoryProfileMiddleware:
+    """
+    Spider middleware that traces the memory allocated while a spider's
+    callbacks and item pipelines run, with tracemalloc. When the spider
+    closes, the `memory_profile/*` stats get the peak traced memory of a
+    callback or pipeline call, the peak RSS of the process and the allocation
+    sites that grew the most up to the largest live size seen after a
+    callback step.
+
+    tracemalloc is process-wide and spiders run side by side in `crawlall`,
+    so a callback's memory only adds up what its own steps allocate, leaving
+    out what other spiders allocate in between. RSS and the allocation sites
+    can't be split that way, so they cover the whole process, which the
+    `process_peak_rss_bytes` stat is named for. libxml2 allocations for lxml
+    documents aren't traced, only RSS has them.
+
+    A spider whose traced peak goes over MEMORY_PROFILE_BUDGET_MB is closed
+    with the `memory_budget_exceeded` reason, which `crawlall` reports as a
+    failure.
+    Enabled like CpuProfileMiddleware, with MEMORY_PROFILE_ENABLED or
+    MEMORY_PROFILE_SPIDERS.
+    """
+
+    # Spiders being traced in the process, tracing stops after the last one
+    tracing = 0
+    # Traced memory growth needed before taking a new snapshot
+    snapshot_growth = 1.5
+    min_snapshot_bytes = 1024 * 1024
+
+    def __init__(self, crawler, resource):
+        self.crawler = crawler
+        self.resource = resource
+        settings = crawler.settings
+        self.frames = settings.getint("MEMORY_PROFILE_FRAMES", 25)
+        self.top = settings.getint("MEMORY_PROFILE_TOP", 10)
+        self.budget = settings.getint("MEMORY_PROFILE_BUDGET_MB") * 1024 * 1024
+        self.active = False
+        self.peak = 0
+        self.baseline = None
+        self.snapshot = None
+        self.snapshot_bytes = 0
+        self.exceeded = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not (
+            settings.getbool("MEMORY_PROFILE_ENABLED")
+            or getattr(crawler.spidercls, "name", None)
+            in settings.getlist("MEMORY_PROFILE_SPIDERS")
+        ):
+            raise NotConfigured
+        try:
+            # Not available on Windows
+            resource = import_module("resource")
+        except ImportError:
+            raise NotConfigured
+        middleware = cls(crawler, resource)
+        crawler.signals.connect(middleware.spider_opened, signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        MemoryProfileMiddleware.tracing += 1
+        self.baseline = tracemalloc.take_snapshot()
+        wrap_pipelines(self.crawler.engine.scraper.itemproc, self._traced)
+
+    def _traced(self, pipeline, process_item):
+        def traced_process_item(item, spider):
+            return self._run(spider, [0], process_item, item, spider)
+
+        return traced_process_item
+
+    def _run(self, spider, held, func, *args):
+        """
+        Call `func` as one step of a callback, recording what it allocates on
+        top of `held`, a one-item list with the bytes still held by the
+        earlier steps of the same callback, which is updated.
+        """
+        if self.active:
+            return func(*args)
+        self.active = True
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        try:
+            return func(*args)
+        finally:
+            self.active = False
+            current, peak = tracemalloc.get_traced_memory()
+            self._record(spider, held[0] + current - start, held[0] + peak - start)
+            held[0] += current - start
+
+    def _record(self, spider, current, peak):
+        self.peak = max(self.peak, peak)
+        if current > max(
+            self.snapshot_bytes * self.snapshot_growth, self.min_snapshot_bytes
+        ):
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_bytes = current
+        if self.budget and self.peak > self.budget and not self.exceeded:
+            self.exceeded = True
+            logger.error(
+                f"{spider.name} went over its memory budget of "
+                f"{self.budget // 2 ** 20} MiB, closing"
+            )
+            self.crawler.engine.close_spider(spider, "memory_budget_exceeded")
+
+    def process_spider_output(self, response, result, spider):
+        held = [0]
+        result = iter(result)
+        while True:
+            try:
+                output = self._run(spider, held, next, result)
+            except StopIteration:
+                return
+            yield output
+
+    def spider_closed(self, spider, reason):
+        stats = self.crawler.stats
+        peak_rss = self.resource.getrusage(self.resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        if sys.platform != "darwin":
+            peak_rss *= 1024
+        stats.set_value("memory_profile/peak_traced_bytes", self.peak, spider=spider)
+        stats.set_value(
+            "memory_profile/process_peak_rss_bytes", peak_rss, spider=spider
+        )
+        if self.budget:
+            stats.set_value(
+                "memory_profile/budget_exceeded", self.exceeded, spider=spider
+            )
+        if self.snapshot is not None:
+            sites = self.top_sites(self.snapshot, self.baseline)
+            stats.set_value("memory_profile/top_sites", sites, spider=spider)
+            logger.info(
+                f"Top allocation sites for {spider.name}:\n"
+                + "\n".join(f"{size:>12,d}  {site}" for site, size in sites)
+            )
+        MemoryProfileMiddleware.tracing -= 1
+        if not MemoryProfileMiddleware.tracing:
+            tracemalloc.stop()
+
+    def top_sites(self, snapshot, baseline):
+        """
+        Return the allocation sites that grew the most from `baseline` to
+        `snapshot`, as (site, bytes) pairs. A site is the line that allocated,
+        along with the innermost line of this project that led to it.
+        """
+        sizes = defaultdict(int)
+        for diff in snapshot.compare_to(baseline, "traceback"):
+            if diff.size_diff > 0:
+                sizes[_allocation_site(diff.traceback)] += diff.size_diff
+        sites = sorted(sizes.items(), key=lambda site: site[1], reverse=True)
+        return sites[: self.top]
+
+
+def _allocation_site(traceback):
+    def label(frame):
+        parent, name = os.path.split(frame.filename)
+        return f"{os.path.basename(parent)}/{name}:{frame.lineno}"
+
+    # Frames are ordered from the oldest call to the allocating line
+    site = label(traceback[-1])
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PROJECT_DIR):
+            if frame is not traceback[-1]:
+                site = f"{site} via {label(frame)}"
+            break
+    return site
+
+
+class ReactorStallMiddleware:
+    """
+    Spider middleware that watches for spider callbacks holding the Twisted
+    reactor. Each step of a callback, the work done before its next output,
+    runs in the reactor thread and blocks downloads and every other spider in
+    the process until it's done. Steps taking longer than
+    REACTOR_STALL_THRESHOLD seconds are logged with the spider, callback and
+    response URL.
+
+    The lag of the reactor itself is sampled every REACTOR_LAG_INTERVAL
+    seconds by how late a timer fires. Histograms of step durations and of
+    the lag go in the `reactor/*` stats. Enabled with REACTOR_STALL_ENABLED.
+    """
+
+    # Upper bounds in seconds of the histogram buckets
+    buckets = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, stats, threshold, interval):
+        self.stats = stats
+        self.threshold = threshold
+        self.interval = interval
+        self.spider = None
+        self.loop = None
+        self.last_sample = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("REACTOR_STALL_ENABLED"):
+            raise NotConfigured
+        middleware = cls(
+            crawler.stats,
+            settings.getfloat("REACTOR_STALL_THRESHOLD", 0.5),
+            settings.getfloat("REACTOR_LAG_INTERVAL", 0.1),
+        )
+        crawler.signals.connect(middleware.spider_opened, signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.last_sample = time.monotonic()
+        self.loop = task.LoopingCall(self.sample_lag)
+        self.loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+
+    def sample_lag(self):
+        now = time.monotonic()
+        lag = max(0.0, now - self.last_sample - self.interval)
+        self.last_sample = now
+        self._observe("reactor/lag_seconds", lag, self.spider)
+
+    def _observe(self, name, seconds, spider):
+        bucket = next((bound for bound in self.buckets if seconds <= bound), None)
+        key = f"le_{bucket}" if bucket is not None else f"gt_{self.buckets[-1]}"
+        self.stats.inc_value(f"{name}/{key}", spider=spider)
+        self.stats.max_value(f"{name}/max", seconds, spider=spider)
+
+    def process_spider_output(self, response, result, spider):
+        callback = response.request.callback or spider.parse
+        name = getattr(callback, "__name__", "parse")
+        result = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                output = next(result)
+            except StopIteration:
+                return
+            finally:
+                elapsed = time.perf_counter() - started
+                self._observe("reactor/callback_step_seconds", elapsed, spider)
+                if elapsed > self.threshold:
+                    self.stats.inc_value("reactor/stalls", spider=spider)
+                    logger.warning(
+                        f"{spider.name} callback {name} held the reactor for "
+                        f"{elapsed:.2f}s on {response.url}"
+                    )
+            yield output
+
+
+class RobotsTxtCacheMiddleware:
+    """
+    Downloader middleware that keeps the robots.txt files downloaded for
+    Scrapy's RobotsTxtMiddleware in ROBOTSTXT_CACHE_DIR for ROBOTSTXT_CACHE_TTL
+    seconds. Spider processes and later runs get the file from there instead
+    of each downloading it again, and requests for a host's robots.txt that
+    another crawler in the process is already downloading wait for that
+    download.
+
+    It only sees the robots.txt requests RobotsTxtMiddleware sends through the
+    downloader, which it tells apart by their `dont_obey_robotstxt` meta key,
+    so it doesn't depend on how RobotsTxtMiddleware parses them. It should sit
+    before RobotsTxtMiddleware. Files are written atomically, so processes can
+    share the directory. Server errors aren't cached, so the next spider tries
+    again, and when a download fails, waiting requests download on their own.
+    """
+
+    # Shared by every crawler in the process, keyed by host
+    leaders = {}
+    waiting = defaultdict(list)
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.path = data_path(settings["ROBOTSTXT_CACHE_DIR"], createdir=True)
+        self.ttl = settings.getint("ROBOTSTXT_CACHE_TTL")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("ROBOTSTXT_OBEY"):
+            raise NotConfigured
+        return cls(crawler)
+
+    async def process_request(self, request, spider):
+        if not self._robots(request):
+            return None
+        netloc = urlparse_cached(request).netloc
+        body = self._load(netloc)
+        if body is not None:
+            self.stats.inc_value("robotstxt/cache_hit_count")
+            return Response(request.url, body=body, request=request, flags=["cached"])
+        if netloc in self.leaders:
+            d = Deferred()
+            self.waiting[netloc].append(d)
+            response = await maybe_deferred_to_future(d)
+            if response is not None:
+                self.stats.inc_value("robotstxt/shared_count")
+                flags = response.flags
+                if "cached" not in flags:
+                    flags = flags + ["cached"]
+                return response.replace(request=request, flags=flags)
+        else:
+            self.leaders[netloc] = request
+        return None
+
+    def process_response(self, request, response, spider):
+        if not self._robots(request):
+            return response
+        netloc = urlparse_cached(request).netloc
+        # Cached responses, including the ones served from here, aren't stored
+        if response.status < 500 and "cached" not in response.flags:
+            self._store(netloc, response.body)
+        if self.leaders.get(netloc) is request:
+            self._release(netloc, response)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        netloc = urlparse_cached(request).netloc
+        if self._robots(request) and self.leaders.get(netloc) is request:
+            self._release(netloc, None)
+
+    def _robots(self, request):
+        return (
+            request.meta.get("dont_obey_robotstxt")
+            and urlparse_cached(request).path == "/robots.txt"
+        )
+
+    def _release(self, netloc, response):
+        del self.leaders[netloc]
+        for d in self.waiting.pop(netloc, []):
+            d.callback(response)
+
+    def _cache_path(self, netloc):
+        return Path(self.path, f"{netloc.replace(':', '_')}.txt")
+
+    def _load(self, netloc):
+        path = self._cache_path(netloc)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, netloc, body):
+        path = self._cache_path(netloc)
+        # Processes write their own temporary file before replacing the entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+class HostUnavailable(Exception):
+    """
+    Raised for requests to a host whose circuit is open. Unlike IgnoreRequest,
+    it's logged as a download error.
+    """
+
+
+class HostState:
+    """Rate limit and circuit breaker state of a host."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.updated = time.monotonic()
+        self.failures = 0
+        self.open_until = None
+
+
+class HostLimitMiddleware:
+    """
+    Downloader middleware that limits requests to each host across every
+    spider in the process, where Scrapy's own limits and AutoThrottle only
+    apply to one spider at a time.
+
+    Each host has a token bucket refilling at HOST_RATE_LIMIT requests per
+    second and holding up to HOST_RATE_BURST tokens. Requests finding it empty
+    wait their turn. After HOST_CIRCUIT_FAILURES consecutive failures (server
+    errors, 429 responses or download exceptions) on a host, its circuit opens
+    and its requests fail right away with HostUnavailable instead of each
+    spider waiting out its own timeouts and retries. A spider with a request
+    failed that way is closed with the `host_unavailable` reason, so that an
+    outage fails the run instead of finishing it with missing meetings, which
+    DiffPipeline would mark as cancelled. After HOST_CIRCUIT_RESET seconds,
+    one request is let through to try the host again, and the circuit closes
+    as soon as a request to the host succeeds.
+
+    Either part is disabled by setting it to 0. It should sit closest to the
+    downloader, so that retries are limited and counted too, and after
+    SharedResponseMiddleware, whose shared copies aren't counted.
+    """
+
+    # Shared by every crawler in the process, keyed by host
+    hosts = {}
+
+    def __init__(self, crawler, rate, burst, max_failures, reset):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.rate = rate
+        self.burst = burst
+        self.max_failures = max_failures
+        self.reset = reset
+        self.closing = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        rate = settings.getfloat("HOST_RATE_LIMIT")
+        max_failures = settings.getint("HOST_CIRCUIT_FAILURES")
+        if not rate and not max_failures:
+            raise NotConfigured
+        return cls(
+            crawler,
+            rate,
+            max(1, settings.getint("HOST_RATE_BURST")),
+            max_failures,
+            settings.getfloat("HOST_CIRCUIT_RESET"),
+        )
+
+    async def process_request(self, request, spider):
+        host = self._host(request)
+        self._check_circuit(host, request, spider)
+        delay = self._reserve(host)
+        if delay > 0:
+            from twisted.internet import reactor
+
+            self.stats.inc_value("host_limit/delayed_count", spider=spider)
+            self.stats.inc_value("host_limit/delay_seconds", delay, spider=spider)
+            await maybe_deferred_to_future(task.deferLater(reactor, delay))
+            # The circuit may have opened while waiting
+            self._check_circuit(host, request, spider)
+        return None
+
+    def process_response(self, request, response, spider):
+        # Copies of another request's response, handed out by
+        # SharedResponseMiddleware, were only downloaded and counted once
+        if "shared" in response.flags:
+            return response
+        if response.status >= 500 or response.status == 429:
+            self._failed(request, spider)
+        else:
+            self._succeeded(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, (IgnoreRequest, HostUnavailable)):
+            self._failed(request, spider)
+
+    def _host(self, request):
+        netloc = urlparse_cached(request).netloc
+        if netloc not in self.hosts:
+            self.hosts[netloc] = HostState(self.burst)
+        return self.hosts[netloc]
+
+    def _reserve(self, host):
+        """
+        Take a token from the host's bucket and return how long to wait for
+        it. Tokens can be taken ahead of time, so waiting requests go in
+        order.
+        """
+        if not self.rate:
+            return 0
+        now = time.monotonic()
+        host.tokens = min(self.burst, host.tokens + (now - host.updated) * self.rate)
+        host.updated = now
+        host.tokens -= 1
+        return -host.tokens / self.rate if host.tokens < 0 else 0
+
+    def _check_circuit(self, host, request, spider):
+        if host.open_until is None:
+            return
+        now = time.monotonic()
+        if now >= host.open_until:
+            # Let this request try the host, and keep the others out meanwhile
+            host.open_until = now + self.reset
+            return
+        self.stats.inc_value("host_limit/rejected_count", spider=spider)
+        netloc = urlparse_cached(request).netloc
+        if not self.closing:
+            self.closing = True
+            logger.error(
+                f"{spider.name}: {netloc} is unavailable, closing",
+                extra={"spider": spider},
+            )
+            self.crawler.engine.close_spider(spider, "host_unavailable")
+        raise HostUnavailable(f"Circuit open for {netloc}")
+
+    def _failed(self, request, spider):
+        if not self.max_failures:
+            return
+        host = self._host(request)
+        host.failures += 1
+        if host.failures < self.max_failures:
+            return
+        if host.open_until is None:
+            self.stats.inc_value("host_limit/circuit_opened_count", spider=spider)
+            logger.warning(
+                f"Circuit for {urlparse_cached(request).netloc} opened after "
+                f"{host.failures} consecutive failures, failing its requests "
+                f"for {self.reset:.0f}s",
+                extra={"spider": spider},
+            )
+        host.open_until = time.monotonic() + self.reset
+
+    def _succeeded(self, request):
+        host = self._host(request)
+        if host.open_until is not None:
+            logger.info(f"Circuit for {urlparse_cached(request).netloc} closed")
+        host.failures = 0
+        host.open_until = None
+
+
+class JobCheckpointMiddleware:
+    """
+    Spider middleware that lets a crawl killed partway through resume where it
+    stopped. It keeps a journal, `<spider>.journal` in JOB_CHECKPOINT_DIR, of
+    the requests scheduled, the ones whose responses went through the spider
+    and the item pipelines, and the sizes of the spider's feed files. Changes
+    are appended every JOB_CHECKPOINT_SYNC_INTERVAL seconds and synced to
+    disk. A run finding the journal of an unfinished run truncates the feeds
+    to their recorded sizes, schedules the requests that weren't done and
+    skips the start requests and others seen before. Finished runs remove
+    their journal.
+
+    Each append is one frame, a zlib-compressed pickle of the changes behind
+    its length and CRC32, so a frame torn by a kill is ignored. Frames are
+    only appended when no response is halfway through its callback or the
+    item pipelines, so that the done requests always match the feed sizes.
+    Requests that failed are never done and are tried again on resume.
+
+    A journal is only resumed by a run of the same job, with the same
+    JOB_CHECKPOINT_ID (the date the job started by default), and while it's
+    less than JOB_CHECKPOINT_MAX_AGE hours old, so a later scheduled run
+    doesn't skip what an abandoned one had already seen. Only local jsonlines
+    feeds that are appended to can be resumed, other feeds make runs start
+    over. Enabled with JOB_CHECKPOINT_ENABLED, and the
+    cost of resuming is in the `job_checkpoint/resume_seconds` stat, next to
+    the number of requests resumed and seen.
+    """
+
+    frame_header = struct.Struct(">II")
+    line_formats = ("jsonlines", "jl")
+    # Fingerprints of a request and the requests it was redirected from
+    meta_key = "job_checkpoint_fingerprints"
+
+    def __init__(self, crawler, path, interval, job_id, max_age):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.path = path
+        self.interval = interval
+        self.job_id = job_id
+        self.max_age = max_age
+        self.spider = None
+        self.journal = None
+        self.loop = None
+        self.feeds = []
+        # Fingerprints scheduled and not done yet, in scheduling order
+        self.pending = {}
+        # Fingerprints seen by the run being resumed
+        self.seen = set()
+        # Changes since the last frame
+        self.scheduled = []
+        self.done = []
+        self.last_scheduled = None
+        # Responses being processed: [items in the pipelines, output finished]
+        self.active = {}
+        self.sync_due = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("JOB_CHECKPOINT_ENABLED"):
+            raise NotConfigured
+        path = data_path(settings["JOB_CHECKPOINT_DIR"], createdir=True)
+        middleware = cls(
+            crawler,
+            path,
+            settings.getfloat("JOB_CHECKPOINT_SYNC_INTERVAL", 5),
+            settings.get("JOB_CHECKPOINT_ID") or datetime.now().date().isoformat(),
+            settings.getfloat("JOB_CHECKPOINT_MAX_AGE", 24) * 60 * 60,
+        )
+        crawler.signals.connect(middleware.spider_opened, signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signals.spider_closed)
+        crawler.signals.connect(middleware.request_scheduled, signals.request_scheduled)
+        crawler.signals.connect(middleware.request_dropped, signals.request_dropped)
+        for signal in (signals.item_scraped, signals.item_dropped, signals.item_error):
+            crawler.signals.connect(middleware.item_finished, signal)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.spider = spider
+        self.journal_path = Path(self.path, f"{spider.name}.journal")
+        self.feeds = self._feed_slots()
+        started = time.perf_counter()
+        state = self._read_journal()
+        requests = None
+        if state:
+            problem = self._resume_problem(state)
+            if problem is None:
+                try:
+                    requests = [
+                        request_from_dict(data, spider=spider)
+                        for data in state["pending"].values()
+                    ]
+                except (ValueError, AttributeError, ImportError):
+                    problem = "its requests can't be rebuilt"
+            if problem:
+                logger.warning(
+                    f"{spider.name}: can't resume the unfinished job, {problem}, "
+                    "restarting"
+                )
+        if requests is None:
+            self._write_journal(
+                {
+                    "job": self.job_id,
+                    "created": time.time(),
+                    "feeds": self._feed_offsets(),
+                }
+            )
+        else:
+            self._resume(state, requests)
+            elapsed = time.perf_counter() - started
+            self.stats.set_value(
+                "job_checkpoint/resume_seconds", elapsed, spider=spider
+            )
+            logger.info(
+                f"{spider.name}: resumed {len(requests)} pending of "
+                f"{len(self.seen)} seen requests in {elapsed:.3f}s"
+            )
+        self.journal = open(self.journal_path, "ab")
+        self.loop = task.LoopingCall(self.sync_soon)
+        self.loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+        if self.journal is None:
+            return
+        if reason == "finished":
+            self._discard_journal()
+            return
+        # Processing is over, so the frame matches the feeds
+        self.active.clear()
+        self._sync()
+        self.journal.close()
+        self.journal = None
+
+    def process_start_requests(self, start_requests, spider):
+        for request in start_requests:
+            if self.seen and self._fingerprint(request) in self.seen:
+                self.stats.inc_value("job_checkpoint/skipped_count", spider=spider)
+                continue
+            yield request
+
+    def process_spider_output(self, response, result, spider):
+        state = self.active.setdefault(response, [0, False])
+        try:
+            for output in result:
+                if is_item(output):
+                    state[0] += 1
+                yield output
+        finally:
+            state[1] = True
+            self._processed(response, 0)
+
+    def item_finished(self, item, response, spider, **kwargs):
+        self._processed(response, 1)
+
+    def request_scheduled(self, request, spider):
+        self.last_scheduled = None
+        if self.journal is None:
+            return
+        fp = self._fingerprint(request)
+        # Retries and resumed requests are already in the journal
+        if fp in self.pending:
+            return
+        request.meta[self.meta_key] = request.meta.get(self.meta_key, ()) + (fp,)
+        try:
+            data = request.to_dict(spider=spider)
+        except ValueError as e:
+            logger.warning(f"{spider.name}: can't checkpoint {request}: {e}")
+            self._discard_journal()
+            return
+        # Downloader middlewares add to the meta before the frame is written
+        data["meta"] = dict(data["meta"])
+        self.pending[fp] = None
+        self.scheduled.append((fp, data))
+        self.last_scheduled = request
+
+    def request_dropped(self, request, spider):
+        # Duplicates are dropped right after being scheduled
+        if request is self.last_scheduled:
+            fp, _ = self.scheduled.pop()
+            del self.pending[fp]
+            self.last_scheduled = None
+
+    def sync_soon(self):
+        """Append a frame as soon as no response is being processed."""
+        self.sync_due = True
+        if not self.active:
+            self._sync()
+
+    def _processed(self, response, items):
+        state = self.active.get(response)
+        if state is None:
+            return
+        state[0] -= items
+        if state[0] > 0 or not state[1]:
+            return
+        del self.active[response]
+        for fp in response.meta.get(self.meta_key, ()):
+            if fp in self.pending:
+                del self.pending[fp]
+                self.done.append(fp)
+        if self.sync_due and not self.active:
+            self._sync()
+
+    def _sync(self):
+        self.sync_due = False
+        if self.journal is None or not (self.scheduled or self.done):
+            return
+        started = time.perf_counter()
+        frame = {
+            "scheduled": self.scheduled,
+            "done": self.done,
+            "feeds": self._feed_offsets(),
+        }
+        self.scheduled, self.done = [], []
+        try:
+            self._append_frame(self.journal, frame)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning(f"{self.spider.name}: can't checkpoint requests: {e}")
+            self._discard_journal()
+            return
+        self.stats.inc_value("job_checkpoint/sync_count", spider=self.spider)
+        self.stats.inc_value(
+            "job_checkpoint/sync_seconds",
+            time.perf_counter() - started,
+            spider=self.spider,
+        )
+        self.stats.set_value(
+            "job_checkpoint/journal_bytes", self.journal.tell(), spider=self.spider
+        )
+
+    def _fingerprint(self, request):
+        return self.crawler.request_fingerprinter.fingerprint(request)
+
+    def _feed_slots(self):
+        """Return the spider's feed slots, or None if one can't be resumed."""
+        extensions = getattr(self.crawler.extensions, "middlewares", ())
+        exporter = next((e for e in extensions if isinstance(e, FeedExporter)), None)
+        slots = exporter.slots if exporter else []
+        for slot in slots:
+            options = slot.feed_options
+            if not (
+                isinstance(slot.storage, FileFeedStorage)
+                and slot.storage.write_mode == "ab"
+                and slot.format in self.line_formats
+                and "postprocessing" not in options
+                and not options.get("batch_item_count")
+            ):
+                return None
+        return slots
+
+    def _feed_offsets(self):
+        """Flush the feed files and return their sizes by path."""
+        offsets = {}
+        for slot in self.feeds or ():
+            if slot.file is not None and not slot.file.closed:
+                slot.file.flush()
+                os.fsync(slot.file.fileno())
+            path = str(slot.storage.path)
+            offsets[path] = os.path.getsize(path) if os.path.exists(path) else 0
+        return offsets
+
+    def _read_journal(self):
+        """
+        Return the job ID and creation time of the journal, with its seen
+        fingerprints, pending requests by fingerprint and last feed offsets,
+        or None if there's none.
+        """
+        try:
+            data = self.journal_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        self.stats.set_value("job_checkpoint/journal_bytes", len(data))
+        state = {"job": None, "created": 0}
+        seen, pending, offsets = set(), {}, None
+        position = 0
+        while position + self.frame_header.size <= len(data):
+            length, crc = self.frame_header.unpack_from(data, position)
+            position += self.frame_header.size
+            payload = data[position : position + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.info(f"Ignoring a torn frame at the end of {self.journal_path}")
+                break
+            position += length
+            frame = pickle.loads(zlib.decompress(payload))
+            for key in ("job", "created"):
+                state[key] = frame.get(key, state[key])
+            seen.update(frame.get("seen", ()))
+            for fp, request in frame.get("scheduled", ()):
+                seen.add(fp)
+                pending[fp] = request
+            for fp in frame.get("done", ()):
+                pending.pop(fp, None)
+            offsets = frame["feeds"]
+        if offsets is None:
+            return None
+        return {**state, "seen": seen, "pending": pending, "feeds": offsets}
+
+    def _resume_problem(self, state):
+        """Return why a journal can't be resumed, or None if it can."""
+        if state["job"] != self.job_id:
+            return f"it belongs to job {state['job']}"
+        if time.time() - state["created"] > self.max_age:
+            return "it's too old"
+        if self.feeds is None:
+            return "a feed can't be appended to"
+        offsets = state["feeds"]
+        if set(offsets) != {str(slot.storage.path) for slot in self.feeds}:
+            return "its feeds changed"
+        for path, offset in offsets.items():
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size < offset:
+                return f"{path} is shorter than recorded"
+        return None
+
+    def _resume(self, state, requests):
+        seen, pending, offsets = state["seen"], state["pending"], state["feeds"]
+        for path, offset in offsets.items():
+            if os.path.exists(path):
+                os.truncate(path, offset)
+        # Start the journal over with only what's left
+        self._write_journal(
+            {
+                "job": state["job"],
+                "created": state["created"],
+                "seen": [fp for fp in seen if fp not in pending],
+                "scheduled": list(pending.items()),
+                "feeds": offsets,
+            }
+        )
+        self.pending = dict.fromkeys(pending)
+        self.seen = seen
+        for request in requests:
+            self.crawler.engine.crawl(request)
+        df = getattr(self.crawler.engine.slot.scheduler, "df", None)
+        if hasattr(df, "fingerprints"):
+            df.fingerprints.update(fp.hex() for fp in seen)
+        self.stats.set_value("job_checkpoint/resumed_count", len(requests))
+        self.stats.set_value("job_checkpoint/seen_count", len(seen))
+
+    def _write_journal(self, frame):
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            self._append_frame(f, frame)
+        os.replace(tmp_path, self.journal_path)
+
+    def _append_frame(self, f, frame):
+        payload = zlib.compress(pickle.dumps(frame, pickle.HIGHEST_PROTOCOL))
+        f.write(self.frame_header.pack(len(payload), zlib.crc32(payload)) + payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _discard_journal(self):
+        """Stop checkpointing this run and remove its journal."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+        self.journal_path.unlink(missing_ok=True)
@@ -1,5 +1,8 @@
+import hashlib
 import logging
+from collections import namedtuple
 from datetime import datetime
+from pathlib import Path
 
 from city_scrapers_core.constants import (
     BOARD,
@@ -10,8 +13,29 @@ from city_scrapers_core.constants import (
 )
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.relativedelta import relativedelta
+from lxml import etree
+from parsel import SelectorList
 from scrapy.http import FormRequest
+from scrapy.utils.project import data_path
+
+from city_scrapers.dates import parse_iso_datetime
+from city_scrapers.mixins.incremental import IncrementalMixin
+from city_scrapers.utils import PersistentLRUCache, code_version
+
+# Fields pulled from each entry of the calendar list view
+CalendarEntry = namedtuple(
+    "CalendarEntry", ["title", "description", "start", "location", "links"]
+)
+
+# ".calendar" in XPath, matching any element with "calendar" among its classes
+_CALENDAR = "contains(concat(' ', normalize-space(@class), ' '), ' calendar ')"
+
+
+def _element(item):
+    """Return the lxml element behind a Selector or SelectorList."""
+    if isinstance(item, SelectorList):
+        item = item[0]
+    return getattr(item, "root", item)
 
 
 class BCCMixinMeta(type):
@@ -32,7 +56,7 @@ class BCCMixinMeta(type):
         super().__init__(name, bases, dct)
 
 
-class BCCMixin(CityScrapersSpider, metaclass=BCCMixinMeta):
+class BCCMixin(IncrementalMixin, CityScrapersSpider, metaclass=BCCMixinMeta):
     """
     Spider mixin for Bismarck City Commission in Bismarck ND. This mixin
     is intended to be used as a base class for spiders that scrape meeting
@@ -49,6 +73,46 @@ class BCCMixin(CityScrapersSpider, metaclass=BCCMixinMeta):
     name = None
     agency = None
     cid = None  # calendar ID, used to target specific committee
+    # calendar IDs requested together in consolidated mode, "all" if unset
+    consolidated_cids = None
+    # see UnchangedResponseMiddleware
+    replay_unchanged_responses = True
+    # parsed rows shared by every BCC spider in the process, see _parse_row
+    row_cache = None
+
+    # XPath expressions are compiled once here rather than translating CSS
+    # selectors for every entry. They are evaluated on lxml elements directly,
+    # and text results are plain strings rather than "smart" ones that keep a
+    # reference to their element.
+    _entries_xpath = etree.XPath(f"//*[{_CALENDAR}]/ol/li")
+    _calendar_entries_xpath = etree.XPath(f"//*[@id = $id][{_CALENDAR}]/ol/li")
+    _title_xpath = etree.XPath(
+        "(descendant-or-self::span/text())[1]", smart_strings=False
+    )
+    _description_xpath = etree.XPath(
+        "(descendant-or-self::p[@itemprop = 'description']/text())[1]",
+        smart_strings=False,
+    )
+    _start_xpath = etree.XPath(
+        "(descendant-or-self::span[@itemprop = 'startDate']/text())[1]",
+        smart_strings=False,
+    )
+    _location_name_xpath = etree.XPath(
+        "descendant-or-self::span[@itemprop = 'location']" "/span[@itemprop = 'name']/p"
+    )
+    _street_address_xpath = etree.XPath(
+        "(descendant-or-self::span[@itemprop = 'address']"
+        "/span[@itemprop = 'streetAddress']/text())[1]",
+        smart_strings=False,
+    )
+    _text_xpath = etree.XPath("descendant-or-self::text()", smart_strings=False)
+    _links_xpath = etree.XPath("descendant-or-self::a")
+    _link_href_xpath = etree.XPath(
+        "(descendant-or-self::a/@href)[1]", smart_strings=False
+    )
+    _link_title_xpath = etree.XPath(
+        "(descendant-or-self::a/text())[1]", smart_strings=False
+    )
 
     def start_requests(self):
         """
@@ -58,11 +122,26 @@ class BCCMixin(CityScrapersSpider, metaclass=BCCMixinMeta):
         and "__VIEWSTATE") typical for a ASP Web Forms site. However,
         in this agency's case, it appears the server does not seem to require
         them.
+
+        With the BCC_CONSOLIDATED setting enabled, every BCC spider requests
+        the same list view covering all calendars. The request is flagged so
+        that SharedResponseMiddleware downloads it once per process, and each
+        spider picks out its own calendar in `parse`.
+
+        The window can be given with the `start_date` and `end_date` spider
+        arguments. Otherwise with INCREMENTAL_ENABLED, most runs only ask for
+        the near end of it, see IncrementalMixin.
         """
-        # Calculate dates for one month prior and one year ahead
+        # Calculate dates for one month prior and six months ahead
         today = datetime.today()
-        one_month_prior = today - relativedelta(months=1)
-        one_year_ahead = today + relativedelta(months=6)
+        one_month_prior, six_months_ahead = self._date_window(today)
+        # The near window takes in the whole day it ends on
+        one_year_ahead = self._window_end(
+            six_months_ahead,
+            self._near_window_end(today).replace(
+                hour=23, minute=59, second=59, microsecond=0
+            ),
+        )
 
         # Format dates as "MM/DD/YYYY"
         meeting_date_from = one_month_prior.strftime("%m/%d/%Y")
@@ -78,47 +157,126 @@ class BCCMixin(CityScrapersSpider, metaclass=BCCMixinMeta):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.150 Safari/537.36"  # noqa
         }
 
+        consolidated = self._consolidated()
+        if consolidated:
+            cids = ",".join(str(cid) for cid in self.consolidated_cids or ["all"])
+        else:
+            cids = self.cid
+
         # build the URL
-        url = f"{self.base_url}?Keywords=&startDate={meeting_date_from}&enddate={meeting_date_to}&CID={self.cid}&showPastEvents=false"  # noqa
+        url = f"{self.base_url}?Keywords=&startDate={meeting_date_from}&enddate={meeting_date_to}&CID={cids}&showPastEvents=false"  # noqa
         yield FormRequest(
-            url, method="POST", headers=headers, formdata=form_data, callback=self.parse
+            url,
+            method="POST",
+            headers=headers,
+            formdata=form_data,
+            callback=self.parse,
+            meta={
+                "bcc_consolidated": consolidated,
+                "shared_response": consolidated,
+                **self._carry_forward_meta(),
+            },
         )
 
     def parse(self, response):
         """
         Parse a list of meetings from the response.
         """
-        items = response.css(".calendar > ol > li")
-        for item in items:
-            title = self._parse_title(item)
-            start_date = self._parse_start(item)
-            if not start_date:
+        root = response.selector.root
+        if response.meta.get("bcc_consolidated"):
+            # The list view groups meetings under one ".calendar" per calendar ID
+            entries = self._calendar_entries_xpath(root, id=f"CID{self.cid}")
+        else:
+            entries = self._entries_xpath(root)
+        for entry in entries:
+            row = self._parse_row(entry)
+            if not row.start:
                 # Assume items with no start_date aren't valid meeting items
-                self.log(f'No start date found for "{title}"', level=logging.WARNING)
+                self.log(
+                    f'No start date found for "{row.title}"', level=logging.WARNING
+                )
                 continue
             meeting = Meeting(
-                title=title,
-                description=self._parse_description(item),
-                classification=self._parse_classification(title),
-                start=self._parse_start(item),
+                title=row.title,
+                description=row.description,
+                classification=self._parse_classification(row.title),
+                start=row.start,
                 end=None,
                 all_day=False,
                 time_notes="",
-                location=self._parse_location(item),
-                links=self._parse_links(item),
+                location=dict(row.location),
+                links=[dict(link) for link in row.links],
                 source="https://www.bismarcknd.gov/calendar.aspx",
             )
             meeting["status"] = self._get_status(meeting)
             meeting["id"] = self._get_id(meeting)
-            yield meeting
+            yield self._record_meeting(meeting)
+        yield from self._carried_meetings(response)
+
+    def closed(self, reason):
+        super().closed(reason)
+        if self.row_cache is not None and self.row_cache.path:
+            self.row_cache.save()
+
+    def _parse_row(self, entry):
+        """
+        Parse the fields of a calendar entry into a CalendarEntry, reusing the
+        result for entries whose HTML was already parsed in this process or a
+        previous run.
+        """
+        cache = self._get_row_cache()
+        html = etree.tostring(entry, encoding="unicode", with_tail=False)
+        key = hashlib.sha1(
+            "\n".join([self.host, self.agenda_link["href"], html]).encode()
+        ).hexdigest()
+        row = cache.get(key)
+        if row is None:
+            row = CalendarEntry(
+                title=self._parse_title(entry),
+                description=self._parse_description(entry),
+                start=self._parse_start(entry),
+                location=self._parse_location(entry),
+                links=self._parse_links(entry),
+            )
+            cache.set(key, row)
+        return row
+
+    def _get_row_cache(self):
+        """
+        Create the row cache shared by all BCC spiders. It is saved to
+        BCC_ROW_CACHE_PATH when a spider closes and discarded when this
+        module changes.
+        """
+        if BCCMixin.row_cache is None:
+            settings = getattr(self, "settings", None)
+            path = settings.get("BCC_ROW_CACHE_PATH") if settings else None
+            if path:
+                path = Path(data_path(path))
+                path.parent.mkdir(parents=True, exist_ok=True)
+            BCCMixin.row_cache = PersistentLRUCache(
+                settings.getint("BCC_ROW_CACHE_SIZE") if settings else 5000,
+                path,
+                code_version(BCCMixin),
+            )
+        return BCCMixin.row_cache
+
+    def _consolidated(self):
+        """Check whether this crawl fetches all calendars in one request."""
+        settings = getattr(self, "settings", None)
+        return bool(settings and settings.getbool("BCC_CONSOLIDATED"))
+
+    def _first(self, xpath, item):
+        """Return the first result of a compiled XPath as a str, or None."""
+        results = xpath(_element(item))
+        return results[0] if results else None
 
     def _parse_title(self, item):
         """Parse or generate meeting title."""
-        return item.css("span::text").get()
+        return self._first(self._title_xpath, item)
 
     def _parse_description(self, item):
         """Parse or generate meeting description."""
-        desc = item.css("p[itemprop='description']::text").get()
+        desc = self._first(self._description_xpath, item)
         return desc if desc else ""
 
     def _parse_classification(self, title):
@@ -142,45 +300,42 @@ class BCCMixin(CityScrapersSpider, metaclass=BCCMixinMeta):
 
     def _parse_start(self, item):
         """Parse start datetime as a naive datetime object."""
-        start_date_time = item.css("span[itemprop='startDate']::text").get()
+        start_date_time = self._first(self._start_xpath, item)
         if not start_date_time:
             return None
-        return datetime.strptime(start_date_time, "%Y-%m-%dT%H:%M:%S")
+        return parse_iso_datetime(start_date_time)
 
     def _parse_location(self, item):
         """Parse location. Addresses are formatted in several
         different ways in the HTML so account for different
         configurations as best we can.
         """
-        name_parts = item.css("span[itemprop='location'] > span[itemprop='name'] > p")
-        address_parts = item.css(
-            "span[itemprop='address'] > span[itemprop='streetAddress']::text"
-        )
-        if not name_parts and not address_parts:
+        name_parts = self._location_name_xpath(_element(item))
+        street_address = self._first(self._street_address_xpath, item)
+        if not name_parts and street_address is None:
             return {"name": "TBD", "address": ""}
         name = ""
         address = ""
         if name_parts:
+            name = self._first(self._text_xpath, name_parts[0])
             if len(name_parts) > 1:
-                name = name_parts[0].css("::text").get()
-                address = ", ".join(name_parts[1:].css("::text").getall())
-            else:
-                name = name_parts.css("::text").get()
-        if not address and address_parts:
-            address = address_parts.get()
-        if not name and address_parts:
-            address = address_parts.get()
+                address = ", ".join(
+                    text for part in name_parts[1:] for text in self._text_xpath(part)
+                )
+        if not address and street_address is not None:
+            address = street_address
+        if not name and street_address is not None:
+            address = street_address
         return {"name": name, "address": address}
 
     def _parse_links(self, item):
         """Parse or generate links."""
         links = [self.agenda_link]
-        details_link = item.css("a")
-        if not details_link:
+        if not self._links_xpath(_element(item)):
             return links
-        href = details_link.css("a::attr(href)").get()
+        href = self._first(self._link_href_xpath, item)
         absolute_href = f"{self.host}{href}" if href else ""
-        title = details_link.css("a::text").get()
+        title = self._first(self._link_title_xpath, item)
         meeting_details = {
             "href": absolute_href,
             "title": title if title else "Meeting details",
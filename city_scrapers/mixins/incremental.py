@@ -0,0 +1,156 @@
+import logging
+import pickle
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from city_scrapers_core.items import Meeting
+from dateutil.relativedelta import relativedelta
+from scrapy.utils.project import data_path
+
+from city_scrapers.utils import code_version, write_pickle
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalMixin:
+    """
+    Spider mixin for spiders asking for meetings in a date window, letting most
+    runs fetch only the near end of the window. The meetings a spider scraped
+    are stored in INCREMENTAL_DIR when it finishes, along with when it last
+    crawled and last fetched the whole window. Later runs fetch meetings up to
+    INCREMENTAL_NEAR_DAYS ahead and carry forward the stored ones after that,
+    until the whole window is due again after INCREMENTAL_FAR_REFRESH_HOURS.
+
+    The window can also be given with the `start_date` and `end_date` spider
+    arguments, as YYYY-MM-DD dates, to crawl past meetings. Such runs fetch
+    the whole window given and don't touch the stored state.
+
+    Spiders call `_date_window` and `_window_end` when building their
+    request, flag it with `_carry_forward_meta`, pass the meetings they parse
+    to `_record_meeting` and yield `_carried_meetings` from the callback
+    handling the flagged request. UnchangedResponseMiddleware calls both for
+    the responses it replays. Enabled with INCREMENTAL_ENABLED.
+    """
+
+    # window given as spider arguments
+    start_date = None
+    end_date = None
+    # meetings scraped in this run by ID, None unless incremental
+    _scraped = None
+    _carried = ()
+    # IDs of the meetings carried forward in this run
+    _carried_ids = ()
+
+    def _date_window(self, today):
+        """
+        Return the start and end of the window to ask for, from a month ago
+        to six months ahead unless given as spider arguments. A given end date
+        is included whole.
+        """
+        date_from = today - relativedelta(months=1)
+        date_to = today + relativedelta(months=6)
+        if self.start_date:
+            date_from = datetime.strptime(self.start_date, "%Y-%m-%d")
+        if self.end_date:
+            date_to = datetime.strptime(self.end_date, "%Y-%m-%d").replace(
+                hour=23, minute=59, second=59
+            )
+        return date_from, date_to
+
+    def _window_end(self, date_to, near_to):
+        """
+        Return where the window fetched in this run ends: `date_to` when the
+        whole window is due, otherwise `near_to`, and the stored meetings
+        between the two are carried forward.
+        """
+        settings = getattr(self, "settings", None)
+        if not (settings and settings.getbool("INCREMENTAL_ENABLED")):
+            return date_to
+        if self.start_date or self.end_date:
+            # Windows given as arguments are fetched whole
+            return date_to
+        self._scraped = {}
+        self._carried_ids = set()
+        state = self._load_incremental_state()
+        refresh = timedelta(hours=settings.getfloat("INCREMENTAL_FAR_REFRESH_HOURS"))
+        self._far_crawl = datetime.now()
+        if state is None or self._far_crawl - state["far_crawl"] >= refresh:
+            self.crawler.stats.set_value("incremental/window", "full", spider=self)
+            return date_to
+        self._far_crawl = state["far_crawl"]
+        self._carried = [
+            meeting
+            for meeting in state["meetings"].values()
+            if near_to < meeting["start"] <= date_to
+        ]
+        self.crawler.stats.set_value("incremental/window", "near", spider=self)
+        return near_to
+
+    def _near_window_end(self, today):
+        """Return when the near window ends, INCREMENTAL_NEAR_DAYS from today."""
+        settings = getattr(self, "settings", None)
+        days = settings.getint("INCREMENTAL_NEAR_DAYS") if settings else 0
+        return today + relativedelta(days=days)
+
+    def _carry_forward_meta(self):
+        """
+        Return the meta to add to the request fetching the window, so its
+        callback yields the carried meetings.
+        """
+        return {"carry_forward": True} if self._carried else {}
+
+    def _carried_meetings(self, response):
+        """Yield the carried meetings for the request flagged to carry them."""
+        if not (self._carried and response.meta.get("carry_forward")):
+            return
+        carried, self._carried = self._carried, []
+        for fields in carried:
+            if fields["id"] in self._scraped:
+                continue
+            meeting = Meeting(**fields)
+            meeting["status"] = self._get_status(meeting)
+            self._carried_ids.add(meeting["id"])
+            yield self._record_meeting(meeting)
+        self.crawler.stats.inc_value(
+            "incremental/carried_count", len(carried), spider=self
+        )
+
+    def _record_meeting(self, meeting):
+        """Keep a meeting to store at the end of the run, and return it."""
+        if self._scraped is not None:
+            self._scraped[meeting["id"]] = dict(meeting)
+        return meeting
+
+    def closed(self, reason):
+        """
+        Store the meetings scraped in a finished run. Runs that scraped
+        nothing keep the stored state, as their window most likely failed.
+        """
+        if self._scraped is None:
+            return
+        if reason != "finished" or not self._scraped:
+            logger.info(f"{self.name}: keeping the stored incremental state")
+            return
+        state = {
+            "last_crawl": datetime.now(),
+            "far_crawl": self._far_crawl,
+            "meetings": self._scraped,
+        }
+        write_pickle(self._incremental_path(), (code_version(type(self)), state))
+
+    def _incremental_path(self):
+        path = data_path(self.settings["INCREMENTAL_DIR"], createdir=True)
+        return Path(path, f"{self.name}.pickle")
+
+    def _load_incremental_state(self):
+        """Return the stored state, or None if it's missing or outdated."""
+        try:
+            with open(self._incremental_path(), "rb") as f:
+                version, state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            logger.warning(f"Ignoring unreadable incremental state for {self.name}")
+            return None
+        # Meetings parsed by other code may not match what this code would parse
+        return state if version == code_version(type(self)) else None
@@ -1,3 +1,5 @@
+import json
+import re
 from datetime import datetime
 
 from city_scrapers_core.constants import (
@@ -9,9 +11,56 @@ from city_scrapers_core.constants import (
 )
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.relativedelta import relativedelta
 from scrapy import Request
 
+from city_scrapers.dates import parse_iso_datetime
+from city_scrapers.mixins.incremental import IncrementalMixin
+
+_decoder = json.JSONDecoder()
+_skip_whitespace = re.compile(r"[ \t\n\r]*").match
+
+
+def _iter_odata(text):
+    """
+    Decode the top level of an OData JSON response one member at a time,
+    yielding (key, value) pairs. Elements of the "value" array are yielded
+    one by one as ("value", element) so callers can start working before the
+    rest of the array has been decoded. `text` is the whole decoded body, so
+    only the JSON decoding is incremental: the body's text is still held in
+    memory, but the decoded events don't have to be all at once.
+    """
+
+    def skip(pos):
+        return _skip_whitespace(text, pos).end()
+
+    def expect(pos, chars):
+        pos = skip(pos)
+        if text[pos : pos + 1] not in chars:
+            raise ValueError(f"Expected one of {chars!r} at position {pos}")
+        return text[pos], skip(pos + 1)
+
+    _, pos = expect(0, "{")
+    if text[pos : pos + 1] == "}":
+        return
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        _, pos = expect(pos, ":")
+        if key == "value" and text[pos : pos + 1] == "[":
+            pos = skip(pos + 1)
+            end = text[pos : pos + 1] == "]"
+            pos = pos + 1 if end else pos
+            while not end:
+                element, pos = _decoder.raw_decode(text, pos)
+                yield key, element
+                char, pos = expect(pos, ",]")
+                end = char == "]"
+        else:
+            value, pos = _decoder.raw_decode(text, pos)
+            yield key, value
+        char, pos = expect(pos, ",}")
+        if char == "}":
+            return
+
 
 class MCMixinMeta(type):
     """
@@ -31,7 +80,7 @@ class MCMixinMeta(type):
         super().__init__(name, bases, dct)
 
 
-class MCMixin(CityScrapersSpider, metaclass=MCMixinMeta):
+class MCMixin(IncrementalMixin, CityScrapersSpider, metaclass=MCMixinMeta):
     """
     Spider mixin for City of Mandan in Mandan, ND. This mixin
     is intended to be used as a base class for spiders that scrape meeting
@@ -43,35 +92,122 @@ class MCMixin(CityScrapersSpider, metaclass=MCMixinMeta):
     name = None
     agency = None
     category_id = None
+    # category IDs requested together in batched mode
+    batch_category_ids = None
+    # fields read from each event, the API returns everything otherwise
+    select_fields = [
+        "eventName",
+        "eventDescription",
+        "categoryId",
+        "categoryName",
+        "startDateTime",
+        "eventLocation",
+        "publishedFiles",
+    ]
+    page_size = 100
+    # see UnchangedResponseMiddleware
+    replay_unchanged_responses = True
 
     def start_requests(self):
         """
         Construct and yield a request to the API endpoint.
+
+        With the MC_BATCHED setting enabled, every Mandan spider requests the
+        same query covering all configured categories. The request is flagged
+        so that SharedResponseMiddleware downloads it once per process, and
+        each spider keeps the events of its own category in `parse`.
+
+        Results are requested page by page, see `_page_request`. The window
+        can be given with the `start_date` and `end_date` spider arguments.
+        Otherwise with INCREMENTAL_ENABLED, most runs only ask for the near
+        end of it, see IncrementalMixin.
         """
-        # Calculate dates for one month prior and one year ahead
+        # Calculate dates for one month prior and six months ahead
         today = datetime.today()
-        one_month_prior = today - relativedelta(months=1)
-        half_year_ahead = today + relativedelta(months=6)
+        one_month_prior, half_year_ahead = self._date_window(today)
+        # The query only has hour precision
+        fetched_to = self._window_end(
+            half_year_ahead,
+            self._near_window_end(today).replace(minute=0, second=0, microsecond=0),
+        )
 
         # Format dates like "2024-03-01T00:00:00.000Z"
         meeting_date_from = one_month_prior.strftime("%Y-%m-%dT%H:00:00Z")
-        meeting_date_to = half_year_ahead.strftime("%Y-%m-%dT%H:00:00Z")
+        meeting_date_to = fetched_to.strftime("%Y-%m-%dT%H:00:00Z")
 
-        # build the URL
-        url = f"{self.base_url}/v1/Events?$filter=categoryId+in+({self.category_id})+and+startDateTime+ge+{meeting_date_from}+and+startDateTime+le+{meeting_date_to}&$orderby=startDateTime"  # noqa
+        # Sources stay the single category URL for the whole window, so output
+        # matches in every mode
+        source = self._build_url(
+            [self.category_id],
+            meeting_date_from,
+            half_year_ahead.strftime("%Y-%m-%dT%H:00:00Z"),
+        )
+        batched = self._batched()
+        url = self._build_url(
+            self.batch_category_ids if batched else [self.category_id],
+            meeting_date_from,
+            meeting_date_to,
+        )
 
-        yield Request(url, callback=self.parse)
+        yield self._page_request(
+            url,
+            0,
+            {
+                "mc_batched": batched,
+                "shared_response": batched,
+                "source": source,
+                **self._carry_forward_meta(),
+            },
+        )
+
+    def _page_request(self, url, skip, meta):
+        """
+        Request one page of events from a query URL, limited to the fields
+        in `select_fields`. The base query and page offset are kept in meta
+        so `parse` can follow up with the next page.
+        """
+        select = ",".join(self.select_fields)
+        return Request(
+            f"{url}&$select={select}&$top={self.page_size}&$skip={skip}",
+            callback=self.parse,
+            meta={**meta, "query": url, "skip": skip},
+        )
+
+    def _build_url(self, category_ids, date_from, date_to):
+        """Build the Events query URL for the given categories and window."""
+        categories = ",".join(str(category_id) for category_id in category_ids)
+        return f"{self.base_url}/v1/Events?$filter=categoryId+in+({categories})+and+startDateTime+ge+{date_from}+and+startDateTime+le+{date_to}&$orderby=startDateTime"  # noqa
+
+    def _batched(self):
+        """Check whether this crawl fetches all categories in one request."""
+        settings = getattr(self, "settings", None)
+        return bool(
+            self.batch_category_ids and settings and settings.getbool("MC_BATCHED")
+        )
 
     def parse(self, response):
         """
-        Parse a list of meetings from the response.
+        Parse a list of meetings from the response. The "value" array is
+        decoded one event at a time from the response text. The next page is
+        the "@odata.nextLink" of the API when there is one, otherwise the
+        next `$skip` is requested until a page comes back empty or shorter
+        than the previous one. The server may cap `$top` below `page_size`,
+        so a short page alone doesn't mean the results are over.
         """
-        print("donkey", response)
-        items = response.json()
-        if not items or len(items) == 0 or "value" not in items:
-            self.logger.warning("No meetings found")
-            return
-        for item in items["value"]:
+        # Responses built outside a crawl (eg. in tests) may have no request
+        meta = response.request.meta if response.request is not None else {}
+        batched = meta.get("mc_batched")
+        source = meta.get("source", response.url)
+        count = 0
+        next_link = None
+        for key, item in _iter_odata(response.text):
+            if key == "@odata.nextLink":
+                next_link = item
+            if key != "value":
+                continue
+            count += 1
+            if batched and item["categoryId"] != self.category_id:
+                continue
             meeting = Meeting(
                 title=item["eventName"],
                 description=item["eventDescription"],
@@ -82,11 +218,28 @@ class MCMixin(CityScrapersSpider, metaclass=MCMixinMeta):
                 time_notes="",
                 location=self._parse_location(item["eventLocation"]),
                 links=self._parse_links(item),
-                source=response.url,
+                source=source,
             )
             meeting["status"] = self._get_status(meeting)
             meeting["id"] = self._get_id(meeting)
-            yield meeting
+            yield self._record_meeting(meeting)
+        yield from self._carried_meetings(response)
+
+        if count == 0:
+            self.logger.warning("No meetings found")
+        page_meta = {
+            key: meta[key]
+            for key in ("mc_batched", "shared_response", "source")
+            if key in meta
+        }
+        if next_link:
+            # Server-driven paging, the link already carries the page offset
+            yield Request(next_link, callback=self.parse, meta=page_meta)
+        elif "query" in meta and count and count >= meta.get("page_rows", count):
+            # The rows of this page are the server's page size for the next one
+            yield self._page_request(
+                meta["query"], meta["skip"] + count, {**page_meta, "page_rows": count}
+            )
 
     def _parse_classification(self, name):
         """
@@ -106,7 +259,7 @@ class MCMixin(CityScrapersSpider, metaclass=MCMixinMeta):
         """
         Parse the start date and time.
         """
-        return datetime.strptime(start, "%Y-%m-%dT%H:%M:%SZ")
+        return parse_iso_datetime(start)
 
     def _parse_location(self, location):
         """
@@ -0,0 +1,176 @@
+"""
+Parse responses in a pool of worker processes instead of the reactor thread.
+
+Callbacks decorated with `offload` send their response, along with the
+spider's attributes and settings, to a process pool shared by every spider
+in the process. The worker runs the undecorated callback on a copy of the
+spider and sends back its items as plain dicts and its requests as
+`Request.to_dict` output, which are rebuilt here, so pipelines get the same
+items as from parsing in process. In the meantime the reactor keeps
+downloading for other spiders.
+
+Offloading is enabled with OFFLOAD_ENABLED, and the pool has
+OFFLOAD_POOL_SIZE workers, or one per CPU when it's 0. When disabled,
+decorated callbacks run as they are.
+
+State a callback keeps outside the spider's attributes stays in the worker,
+so callbacks relying on class-level caches, like BCCMixin's row cache, don't
+benefit from entries added by workers.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+
+from scrapy import Request
+from scrapy.http import Headers
+from scrapy.item import Item
+from scrapy.settings import Settings
+from scrapy.utils.misc import load_object
+from scrapy.utils.request import request_from_dict
+from twisted.internet.defer import Deferred
+
+# Spider attributes that can't be sent to a worker, settings are sent apart
+SKIPPED_ATTRIBUTES = {"crawler", "settings"}
+
+_pool = None
+
+
+def get_pool(size=0):
+    """
+    Return the process pool shared by every spider in the process, creating
+    it with `size` workers, or one per CPU, the first time.
+    """
+    from twisted.internet import reactor
+
+    global _pool
+    if _pool is None:
+        # Workers are started fresh rather than forked from the reactor process
+        _pool = ProcessPoolExecutor(
+            max_workers=size or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        reactor.addSystemEventTrigger("before", "shutdown", shutdown_pool)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _class_path(obj):
+    cls = type(obj)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def pack_job(spider, callback_name, response, kwargs):
+    """Describe a callback call with picklable values, for `run_job`."""
+    request = response.request
+    return {
+        "spider": _class_path(spider),
+        "attributes": {
+            key: value
+            for key, value in vars(spider).items()
+            if key not in SKIPPED_ATTRIBUTES
+        },
+        "settings": spider.settings.copy_to_dict(),
+        "callback": callback_name,
+        "kwargs": kwargs,
+        "response": {
+            "class": _class_path(response),
+            "url": response.url,
+            "status": response.status,
+            "headers": dict(response.headers),
+            "body": response.body,
+            "flags": response.flags,
+            "encoding": getattr(response, "encoding", None),
+            "request": request.to_dict(spider=spider) if request else None,
+        },
+    }
+
+
+def pack_output(output, spider):
+    """Turn an item or request into plain values that can be pickled."""
+    if isinstance(output, Request):
+        return "request", output.to_dict(spider=spider)
+    if isinstance(output, Item):
+        return "item", (_class_path(output), dict(output))
+    return "object", output
+
+
+def unpack_output(packed, spider):
+    kind, value = packed
+    if kind == "request":
+        return request_from_dict(value, spider=spider)
+    if kind == "item":
+        item_path, fields = value
+        return load_object(item_path)(**fields)
+    return value
+
+
+def run_job(job):
+    """Run an offloaded callback in a worker and return its packed output."""
+    spidercls = load_object(job["spider"])
+    spider = spidercls.__new__(spidercls)
+    spider.__dict__.update(job["attributes"])
+    spider.settings = Settings(job["settings"])
+    spec = job["response"]
+    request = spec["request"]
+    response = load_object(spec["class"])(
+        url=spec["url"],
+        status=spec["status"],
+        headers=Headers(spec["headers"]),
+        body=spec["body"],
+        flags=spec["flags"],
+        request=request_from_dict(request, spider=spider) if request else None,
+        **({"encoding": spec["encoding"]} if spec["encoding"] else {}),
+    )
+    callback = getattr(spidercls, job["callback"]).__wrapped__
+    return [
+        pack_output(output, spider)
+        for output in callback(spider, response, **job["kwargs"]) or ()
+    ]
+
+
+def _future_to_deferred(future):
+    """Fire a Deferred in the reactor thread when a Future is done."""
+    from twisted.internet import reactor
+
+    d = Deferred()
+
+    def done(future):
+        error = future.exception()
+        if error is not None:
+            reactor.callFromThread(d.errback, error)
+        else:
+            reactor.callFromThread(d.callback, future.result())
+
+    future.add_done_callback(done)
+    return d
+
+
+def offload(callback):
+    """
+    Decorate a spider callback so it runs in the worker process pool when
+    OFFLOAD_ENABLED is set. The callback then returns a Deferred firing with
+    its output, which Scrapy waits for before passing it on.
+    """
+
+    @wraps(callback)
+    def offloaded(spider, response, **kwargs):
+        settings = getattr(spider, "settings", None)
+        if not (settings and settings.getbool("OFFLOAD_ENABLED")):
+            return callback(spider, response, **kwargs)
+        pool = get_pool(settings.getint("OFFLOAD_POOL_SIZE"))
+        job = pack_job(spider, callback.__name__, response, kwargs)
+        d = _future_to_deferred(pool.submit(run_job, job))
+        d.addCallback(
+            lambda outputs: [unpack_output(output, spider) for output in outputs]
+        )
+        return d
+
+    return offloaded
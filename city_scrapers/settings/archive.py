@@ -9,10 +9,21 @@ ITEM_PIPELINES = {
     "city_scrapers_core.pipelines.MeetingPipeline": 300,
 }
 
+HTTPCACHE_ENABLED = True
+UNCHANGED_RESPONSES_ENABLED = True
+JOB_CHECKPOINT_ENABLED = True
+
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.PerformanceStatsExtension": 500,
 }
 
 SPIDER_MIDDLEWARES = {
+    "city_scrapers.middleware.JobCheckpointMiddleware": 10,
     "city_scrapers.middleware.CityScrapersWaybackMiddleware": 500,
+    "city_scrapers.middleware.UnchangedResponseMiddleware": 950,
+    "city_scrapers.middleware.MemoryProfileMiddleware": 970,
+    "city_scrapers.middleware.CpuProfileMiddleware": 980,
+    "city_scrapers.middleware.ParseTimingMiddleware": 990,
+    "city_scrapers.middleware.ReactorStallMiddleware": 995,
 }
@@ -17,8 +17,11 @@ NEWSPIDER_MODULE = "city_scrapers.spiders"
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
 USER_AGENT = "City Scrapers [development mode]. Learn more and say hello at https://www.citybureau.org/city-scrapers/"  # noqa
 
-# Obey robots.txt rules
+# Obey robots.txt rules, which are kept in ROBOTSTXT_CACHE_DIR for a day and shared
+# by every spider, see RobotsTxtCacheMiddleware
 ROBOTSTXT_OBEY = True
+ROBOTSTXT_CACHE_DIR = os.getenv("ROBOTSTXT_CACHE_DIR", "robotstxt")
+ROBOTSTXT_CACHE_TTL = 60 * 60 * 24
 
 # Disable cookies (enabled by default)
 COOKIES_ENABLED = False
@@ -39,17 +42,133 @@ ITEM_PIPELINES = {
 # Enable or disable downloader middlewares
 # See http://scrapy.readthedocs.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
-    "scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware": 543,
+    "city_scrapers.middleware.RobotsTxtCacheMiddleware": 90,
+    "city_scrapers.middleware.SharedResponseMiddleware": 890,
+    "city_scrapers.middleware.HostLimitMiddleware": 950,
 }
 
-SPIDER_MIDDLEWARES = {}
+SPIDER_MIDDLEWARES = {
+    "city_scrapers.middleware.JobCheckpointMiddleware": 10,
+    "city_scrapers.middleware.UnchangedResponseMiddleware": 950,
+    "city_scrapers.middleware.MemoryProfileMiddleware": 970,
+    "city_scrapers.middleware.CpuProfileMiddleware": 980,
+    "city_scrapers.middleware.ParseTimingMiddleware": 990,
+    "city_scrapers.middleware.ReactorStallMiddleware": 995,
+}
+
+# Requests identical to one being downloaded for any spider in the process wait
+# for its response instead of being downloaded again, see SharedResponseMiddleware
+COALESCE_REQUESTS = True
+# Successful shared responses kept for spiders that ask for them later
+SHARED_RESPONSE_CACHE_SIZE = int(os.getenv("SHARED_RESPONSE_CACHE_SIZE", 32))
+
+# Limits shared by every spider in the process for each host, see
+# HostLimitMiddleware: at most HOST_RATE_LIMIT requests a second, 0 for no limit,
+# in bursts of up to HOST_RATE_BURST, and after HOST_CIRCUIT_FAILURES consecutive
+# failures, the host's requests fail right away for HOST_CIRCUIT_RESET seconds
+# and the spiders making them close with the `host_unavailable` reason
+HOST_RATE_LIMIT = float(os.getenv("HOST_RATE_LIMIT", 0))
+HOST_RATE_BURST = int(os.getenv("HOST_RATE_BURST", 4))
+HOST_CIRCUIT_FAILURES = int(os.getenv("HOST_CIRCUIT_FAILURES", 5))
+HOST_CIRCUIT_RESET = float(os.getenv("HOST_CIRCUIT_RESET", 60))
+
+# Parsed BCC calendar entries kept between runs, see BCCMixin._parse_row
+BCC_ROW_CACHE_PATH = os.getenv("BCC_ROW_CACHE_PATH", "bcc_rows.pickle")
+BCC_ROW_CACHE_SIZE = 5000
+
+# Incremental crawling for the BCC and Mandan spiders, see IncrementalMixin. Runs
+# fetch meetings up to INCREMENTAL_NEAR_DAYS ahead and carry forward the later ones
+# stored by the last finished run, and fetch the whole window when the last full
+# fetch is INCREMENTAL_FAR_REFRESH_HOURS old. Enabled in the prod settings
+INCREMENTAL_ENABLED = False
+INCREMENTAL_DIR = os.getenv("INCREMENTAL_DIR", "incremental")
+INCREMENTAL_NEAR_DAYS = int(os.getenv("INCREMENTAL_NEAR_DAYS", 30))
+INCREMENTAL_FAR_REFRESH_HOURS = float(
+    os.getenv("INCREMENTAL_FAR_REFRESH_HOURS", 24 * 7)
+)
+
+# Replay stored items for responses that haven't changed since the last run,
+# enabled in the prod and archive settings
+UNCHANGED_RESPONSES_ENABLED = False
+UNCHANGED_RESPONSES_DIR = os.getenv("UNCHANGED_RESPONSES_DIR", "unchanged")
+
+# Resumable jobs, enabled in the archive settings, see JobCheckpointMiddleware. A
+# journal of each spider's pending and seen requests and feed sizes is kept in
+# JOB_CHECKPOINT_DIR and synced every JOB_CHECKPOINT_SYNC_INTERVAL seconds, so a
+# killed run picks up where it stopped. Journals are only resumed by runs with the
+# same JOB_CHECKPOINT_ID, the current date if unset, within JOB_CHECKPOINT_MAX_AGE
+# hours
+JOB_CHECKPOINT_ENABLED = False
+JOB_CHECKPOINT_DIR = os.getenv("JOB_CHECKPOINT_DIR", "jobs")
+JOB_CHECKPOINT_SYNC_INTERVAL = float(os.getenv("JOB_CHECKPOINT_SYNC_INTERVAL", 5))
+JOB_CHECKPOINT_ID = os.getenv("JOB_CHECKPOINT_ID")
+JOB_CHECKPOINT_MAX_AGE = float(os.getenv("JOB_CHECKPOINT_MAX_AGE", 24))
+
+# HTTP cache, enabled in the prod and archive settings. Cached pages are always
+# revalidated with If-None-Match/If-Modified-Since, so unchanged pages aren't
+# downloaded again. Entries unused for HTTPCACHE_EXPIRATION_SECS are evicted, as
+# are the least recently used ones once the cache grows past HTTPCACHE_MAX_SIZE
+HTTPCACHE_ENABLED = False
+HTTPCACHE_DIR = os.getenv("HTTPCACHE_DIR", "httpcache")
+HTTPCACHE_POLICY = "city_scrapers.httpcache.ConditionalGetPolicy"
+HTTPCACHE_STORAGE = "city_scrapers.httpcache.EvictingFilesystemCacheStorage"
+HTTPCACHE_EXPIRATION_SECS = 60 * 60 * 24 * 14
+HTTPCACHE_MAX_SIZE = 256 * 1024 * 1024
+HTTPCACHE_GZIP = True
+
+# Per-spider download latency, bytes, parse, item and pipeline timings, written
+# as JSON and Prometheus textfiles to PERFORMANCE_STATS_DIR when each spider
+# closes. Enabled in the prod settings
+PERFORMANCE_STATS_ENABLED = False
+PERFORMANCE_STATS_DIR = os.getenv("PERFORMANCE_STATS_DIR", "performance")
+
+# Profile the callbacks and item pipelines of every spider, or of the ones listed
+# in CPU_PROFILE_SPIDERS, and save the profiles to CPU_PROFILE_DIR. Without a
+# directory, profiles are saved next to a local feed file or in `profiles`
+CPU_PROFILE_ENABLED = False
+CPU_PROFILE_SPIDERS = []
+CPU_PROFILE_DIR = os.getenv("CPU_PROFILE_DIR")
+
+# Trace memory allocated by the callbacks and item pipelines of every spider, or
+# of the ones listed in MEMORY_PROFILE_SPIDERS, and record the peak and the top
+# MEMORY_PROFILE_TOP allocation sites in the stats. Spiders going over
+# MEMORY_PROFILE_BUDGET_MB are closed and fail the run, 0 means no budget
+MEMORY_PROFILE_ENABLED = False
+MEMORY_PROFILE_SPIDERS = []
+MEMORY_PROFILE_BUDGET_MB = int(os.getenv("MEMORY_PROFILE_BUDGET_MB", 0))
+MEMORY_PROFILE_FRAMES = 25
+MEMORY_PROFILE_TOP = 10
+
+# Log spider callbacks holding the reactor for longer than REACTOR_STALL_THRESHOLD
+# seconds, and sample the reactor's lag every REACTOR_LAG_INTERVAL seconds into
+# histograms in the stats. Enabled in the prod settings
+REACTOR_STALL_ENABLED = False
+REACTOR_STALL_THRESHOLD = float(os.getenv("REACTOR_STALL_THRESHOLD", 0.5))
+REACTOR_LAG_INTERVAL = 0.1
+
+# Run callbacks decorated with city_scrapers.offload.offload in a pool of
+# OFFLOAD_POOL_SIZE worker processes, one per CPU if 0, instead of the reactor
+OFFLOAD_ENABLED = False
+OFFLOAD_POOL_SIZE = int(os.getenv("OFFLOAD_POOL_SIZE", 0))
+
+# Use project commands, which include the ones from city_scrapers_core package.
+# Scrapy only looks for commands in COMMANDS_MODULE and only picks up classes
+# defined there, so the core commands are kept available through subclasses
+COMMANDS_MODULE = "city_scrapers.commands"
 
-# Use commands from city_scrapers_core package
+# Limits for running spiders side by side with `scrapy crawlall`. Both count
+# spiders, not requests: at most CRAWLALL_CONCURRENCY_PER_HOST spiders crawling
+# the same host run at once, while HOST_RATE_LIMIT limits their requests
+CRAWLALL_CONCURRENCY = int(os.getenv("CRAWLALL_CONCURRENCY", 8))
+CRAWLALL_CONCURRENCY_PER_HOST = int(os.getenv("CRAWLALL_CONCURRENCY_PER_HOST", 4))
 
-COMMANDS_MODULE = "city_scrapers_core.commands"
+# Output of `scrapy backfill`: month chunks, the checkpoint of finished ones and
+# the merged feeds
+BACKFILL_DIR = os.getenv("BACKFILL_DIR", "backfill")
 
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.PerformanceStatsExtension": 500,
 }
 
 CLOSESPIDER_ERRORCOUNT = 5
@@ -0,0 +1,28 @@
+import os
+
+from .base import *  # noqa
+
+# Run spiders against the local mock server in benchmarks/mockserver.py instead
+# of the live sites. Each site has its own port on 127.0.0.1, which is the only
+# loopback address macOS answers on by default, from MOCK_SERVER_PORT up. Its
+# requests keep the live host's downloader slot, see MockServerMiddleware.
+MOCK_SERVER_PORT = int(os.getenv("MOCK_SERVER_PORT", 8999))
+MOCK_SERVER_HOSTS = {
+    host: f"http://127.0.0.1:{MOCK_SERVER_PORT + i}"
+    for i, host in enumerate(
+        [
+            "www.bismarcknd.gov",
+            "mandannd.api.civicclerk.com",
+            "www.bismarckschools.org",
+            "www.mortonnd.org",
+        ]
+    )
+}
+
+DOWNLOADER_MIDDLEWARES = {
+    **DOWNLOADER_MIDDLEWARES,  # noqa
+    "city_scrapers.middleware.MockServerMiddleware": 50,
+}
+
+PERFORMANCE_STATS_ENABLED = True
+REACTOR_STALL_ENABLED = True
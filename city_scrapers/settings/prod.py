@@ -12,10 +12,17 @@ ITEM_PIPELINES = {
 
 SENTRY_DSN = os.getenv("SENTRY_DSN")
 
+HTTPCACHE_ENABLED = True
+UNCHANGED_RESPONSES_ENABLED = True
+INCREMENTAL_ENABLED = True
+PERFORMANCE_STATS_ENABLED = True
+REACTOR_STALL_ENABLED = True
+
 EXTENSIONS = {
     "city_scrapers_core.extensions.AzureBlobStatusExtension": 100,
     "scrapy_sentry_errors.extensions.Errors": 10,
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.PerformanceStatsExtension": 500,
 }
 
 FEED_EXPORTERS = {
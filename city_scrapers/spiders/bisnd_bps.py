@@ -1,13 +1,19 @@
-from datetime import datetime, time
-from lxml import html as lhtml
-import html
-import json
 import re
+from collections import namedtuple
+from datetime import datetime, time
 
-from city_scrapers_core.constants import COMMITTEE, BOARD, CANCELLED, PASSED, TENTATIVE
+from city_scrapers_core.constants import BOARD, CANCELLED, COMMITTEE, PASSED, TENTATIVE
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from scrapy import Selector
+from lxml import etree
+from lxml import html as lhtml
+
+from city_scrapers.dates import parse_date
+from city_scrapers.offload import offload
+from city_scrapers.utils import iter_json_array
+
+# A row of the meetings table, with each cell's HTML parsed once
+BpsRow = namedtuple("BpsRow", ["year", "month", "day", "title", "links"])
 
 
 class BisndBpsSpider(CityScrapersSpider):
@@ -15,6 +21,8 @@ class BisndBpsSpider(CityScrapersSpider):
     agency = "Bismarck Public Schools"
     timezone = "America/Chicago"
     start_urls = ["https://www.bismarckschools.org/Page/401"]
+    # see UnchangedResponseMiddleware
+    replay_unchanged_responses = True
 
     """
     Meetings' time and location is taken from organization's following webpage:
@@ -26,18 +34,28 @@ class BisndBpsSpider(CityScrapersSpider):
         "address": "221 N Fifth Street, Bismarck, ND",
     }
 
+    # Plain strings, so links don't keep their row's document alive
+    _link_href_xpath = etree.XPath(".//a/@href", smart_strings=False)
+    _link_text_xpath = etree.XPath(".//a/text()", smart_strings=False)
+    _year_re = re.compile(r"\d{4}")
+    # Numbers that aren't inside parentheses, like times
+    _dates_re = re.compile(r"\b\d+(?![^(]*\))\b")
+    # Consecutive rows older than the cutoff after which the table is assumed
+    # to hold only older rows, see _parsed_data
+    old_rows_to_stop = 10
+
+    @offload
     def parse(self, response):
         """
-        `parse` should always `yield` Meeting items.
+        `parse` should always `yield` Meeting items. It can run in a worker
+        process, see `city_scrapers.offload`.
         """
 
         extracted_input = response.css(
             '.ui-widget-detail input[type="hidden"]::attr(value)'
         ).extract_first()
 
-        parsable_data = self._parsed_data(extracted_input)
-
-        for item in parsable_data:
+        for item in self._parsed_data(extracted_input):
             meeting = Meeting(
                 title=self._parse_title(item),
                 description="",
@@ -56,28 +74,69 @@ class BisndBpsSpider(CityScrapersSpider):
 
             yield meeting
 
+    def _parse_rows(self, cells):
+        """
+        Parse the HTML fragments of a row's cells into BpsRow records. All
+        cells go into a single lxml document, one <div> each, rather than one
+        document per cell.
+
+        Some rows list several dates, like "8, 9, 15, and 16". These are split
+        into one record per date, each with the minutes link that mentions
+        its date.
+        """
+        root = lhtml.fragment_fromstring(
+            "".join(f"<div>{cell or ''}</div>" for cell in cells),
+            create_parent="div",
+        )
+        year, month, day, title = [cell.text_content().strip() for cell in root[:4]]
+        links = [self._parse_cell_link(cell) for cell in root[3:]]
+        dates = self._dates_re.findall(day)
+        if len(dates) < 2:
+            yield BpsRow(year, month, day, title, [link for link in links if link])
+            return
+
+        minutes = self._minutes_index(root[5])
+        for date in dates:
+            links[5 - 3] = minutes.get(date)
+            yield BpsRow(year, month, date, title, [link for link in links if link])
+
+    def _parse_cell_link(self, cell):
+        """Return the first link in a cell, or None if it has none."""
+        hrefs = self._link_href_xpath(cell)
+        texts = self._link_text_xpath(cell)
+        if not hrefs or not texts:
+            return None
+        # Remove extra spaces from title
+        return {"href": hrefs[0], "title": " ".join(texts[0].split())}
+
+    def _minutes_index(self, cell):
+        """
+        Map each number in the titles of a cell's links, like the 15 in
+        "2/15/23 Minutes", to the first link mentioning it.
+        """
+        index = {}
+        for link in cell.iter("a"):
+            href, text = link.get("href"), link.text
+            if href is None or text is None:
+                continue
+            for number in re.findall(r"\d+", text):
+                index.setdefault(
+                    number, {"href": href, "title": " ".join(text.split())}
+                )
+        return index
+
     def _parse_title(self, item):
         """Parse or generate meeting title."""
-        selected_title = item[3]
-        html_title_str = lhtml.fromstring(selected_title)
-        title = html_title_str.text_content().strip()
-        return title if title is not None else ""
+        return item.title
 
     def _parse_classification(self, item):
         """Parse or generate classification from allowed options."""
-        title = "".join(item[3].split(">")[1].split("<")[:-1])
-        return COMMITTEE if "committee" in title.lower() else BOARD
+        return COMMITTEE if "committee" in item.title.lower() else BOARD
 
     def _parse_start(self, item):
         """Parse start datetime as a naive datetime object."""
-        extracted_date = [
-            html.unescape("".join(element.split(">")[1].split("<")[:-1]))
-            for element in item[:3]
-        ]
-        result = " ".join(extracted_date)
-        parsed_date = result if "(" not in result else result.split(" (")[0]
-        date_obj = datetime.strptime(parsed_date, "%Y %B %d")
-
+        day = item.day.split(" (")[0]
+        date_obj = parse_date(f"{item.year} {item.month} {day}")
         return datetime.combine(date_obj, self.meeting_time)
 
     def _parse_time_notes(self, item):
@@ -90,19 +149,7 @@ class BisndBpsSpider(CityScrapersSpider):
 
     def _parse_links(self, item):
         """Parse or generate links."""
-        extracted_links = [link for link in item[3:]]
-        parsed_links = []
-        for link in extracted_links:
-            sel = Selector(text=link if link is not None else "")
-            href = sel.css("a::attr(href)").get()
-            title = sel.css("a::text").get()
-            if href is not None and title is not None:
-                # Remove extra spaces from title
-                title = " ".join(title.split())
-                parsed_links.append({"href": href, "title": title})
-            else:
-                continue
-        return parsed_links
+        return item.links
 
     def _get_status(self, item):
         """Parse or generate status from item."""
@@ -114,45 +161,24 @@ class BisndBpsSpider(CityScrapersSpider):
 
     def _parsed_data(self, data):
         """
-        Some of the extracted meeting data coming from the webpage comes
-        in a format that is not easily parsable. As some of the meeting are
-        added with multiple dates into single entries. This function filters
-        out the meetings that are older than 2 years from the current date and then
-        splits the entries with multiple dates into multiple entries with single dates.
+        Yield BpsRow records for the meetings from the last 2 years. Rows of
+        the hidden-input JSON are decoded one at a time. They are listed
+        newest first, but not strictly, so older rows are skipped and decoding
+        only stops after `old_rows_to_stop` of them in a row.
         """
-        data = json.loads(data)
-
-        # Filter out meetings that are older than a year
-        filtered_meetings = [
-            item
-            for item in data[1:]
-            if int("".join(item[0].split(">")[1].split("<")[:-1]))
-            >= datetime.now().year - 2
-        ]
-
-        new_parsable_data = []
-
-        for item in filtered_meetings:
-            dates = re.findall(r"\b\d+(?![^(]*\))\b", item[2])
-            if len(dates) < 2:
-                new_parsable_data.append(item)
+        cutoff = datetime.now().year - 2
+        old_rows = 0
+        rows = iter_json_array(data)
+        # Skip the header row
+        next(rows, None)
+        for cells in rows:
+            year = self._year_re.search(cells[0] or "")
+            if year is None:
                 continue
-
-            sel = Selector(text=item[5] if item[5] is not None else "")
-            links = sel.css("p a::attr(href)").getall()
-            link_texts = sel.css("p a::text").getall()
-
-            for date in dates:
-                new_item = item.copy()
-                new_item[2] = f"<p>{date}</p>"
-                link_found = False
-                for link, link_text in zip(links, link_texts):
-                    if date in link_text:
-                        new_item[5] = f'<p><a href="{link}">{link_text}</a></p>'
-                        link_found = True
-                        break
-                if not link_found:
-                    new_item[5] = None
-                new_parsable_data.append(new_item)
-
-        return new_parsable_data
+            if int(year.group()) < cutoff:
+                old_rows += 1
+                if old_rows >= self.old_rows_to_stop:
+                    return
+                continue
+            old_rows = 0
+            yield from self._parse_rows(cells)
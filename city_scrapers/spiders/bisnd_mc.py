@@ -121,6 +121,7 @@ def create_spiders():
     is the equivalent of declaring each spider class in the same
     file but it is a little more concise.
     """
+    batch_category_ids = sorted(config["category_id"] for config in spider_configs)
     for config in spider_configs:
         class_name = config.pop("class_name")
         # We make sure that the class_name is not already in the global namespace
@@ -130,7 +131,8 @@ def create_spiders():
             spider_class = type(
                 class_name,
                 (MCMixin, CityScrapersSpider),  # Base classes
-                {**config},  # Attributes including name, agency, committee_id
+                # Attributes including name, agency, committee_id
+                {**config, "batch_category_ids": batch_category_ids},
             )
             # Register the class in the global namespace using its class_name
             globals()[class_name] = spider_class
@@ -3,7 +3,8 @@ from datetime import datetime, time
 from city_scrapers_core.constants import COMMISSION
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parse
+
+from city_scrapers.dates import parse_date
 
 
 class BisndMccSpider(CityScrapersSpider):
@@ -80,9 +81,9 @@ class BisndMccSpider(CityScrapersSpider):
 
         # parse date
         try:
-            parsed_date = parse(date_str)
+            parsed_date = parse_date(date_str)
             # combine date and time
-            parsed_date = datetime.combine(parsed_date.date(), self.meeting_time)
+            parsed_date = datetime.combine(parsed_date, self.meeting_time)
             return parsed_date, description
         except ValueError:
             self.logger.info(f"Invalid date format: {date_str}")
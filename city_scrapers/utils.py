@@ -0,0 +1,196 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import re
+import sys
+from collections import OrderedDict, defaultdict, deque
+from os.path import basename
+
+from city_scrapers import dates
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_skip_whitespace = re.compile(r"[ \t\n\r]*").match
+
+
+def code_version(cls):
+    """
+    Hash the source of every city_scrapers module a class is built from, and
+    of the date parsing they share, so data derived by the class can be
+    discarded when its code changes.
+    """
+    version = hashlib.sha1()
+    modules = [sys.modules.get(base.__module__) for base in cls.__mro__]
+    for module in [*modules, dates]:
+        if module and module.__name__.startswith("city_scrapers."):
+            version.update(inspect.getsource(module).encode())
+    return version.hexdigest()
+
+
+def iter_json_array(text):
+    """
+    Decode a JSON array one element at a time, so callers can stop before
+    the rest of the array has been decoded.
+    """
+    pos = _skip_whitespace(text, 0).end()
+    if text[pos : pos + 1] != "[":
+        raise ValueError(f"Expected '[' at position {pos}")
+    pos = _skip_whitespace(text, pos + 1).end()
+    if text[pos : pos + 1] == "]":
+        return
+    while True:
+        element, pos = _decoder.raw_decode(text, pos)
+        yield element
+        pos = _skip_whitespace(text, pos).end()
+        char = text[pos : pos + 1]
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"Expected ',' or ']' at position {pos}")
+        pos = _skip_whitespace(text, pos + 1).end()
+
+
+def wrap_pipelines(itemproc, wrap):
+    """
+    Replace each step of an item pipeline manager's process_item chain with
+    `wrap(pipeline, process_item)`, which returns a callable taking the same
+    arguments. Steps wrapped before are wrapped again, not replaced.
+
+    `methods` and `middlewares` are internals of Scrapy's MiddlewareManager,
+    so a manager that doesn't have one step per pipeline there is refused.
+    """
+    pipelines = [
+        pipeline
+        for pipeline in itemproc.middlewares
+        if hasattr(pipeline, "process_item")
+    ]
+    steps = itemproc.methods["process_item"]
+    if not isinstance(steps, deque) or len(steps) != len(pipelines):
+        raise RuntimeError("Item pipeline steps aren't where Scrapy used to keep them")
+    itemproc.methods["process_item"] = deque(
+        wrap(pipeline, process_item) for pipeline, process_item in zip(pipelines, steps)
+    )
+
+
+def _frame_label(func):
+    filename, lineno, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{name} ({basename(filename)}:{lineno})"
+    return label.replace(";", ",")
+
+
+def collapsed_stacks(stats, min_seconds=1e-6, max_depth=100):
+    """
+    Build collapsed stacks ("outer;inner <microseconds>" lines, as read by
+    flame graph tools) from the call graph of a `pstats.Stats`. cProfile only
+    records callers and callees, not whole stacks, so a function's own time
+    is split between the paths into it in proportion to the time spent in it
+    from each caller.
+    """
+    callees = defaultdict(list)
+    for func, (_, _, _, cumtime, callers) in stats.stats.items():
+        for caller, (_, _, _, caller_cumtime) in callers.items():
+            if caller in stats.stats and cumtime:
+                callees[caller].append((func, caller_cumtime / cumtime))
+    # Time not accounted for by recorded callers was spent in calls made
+    # from outside the profile, which start a stack of their own
+    roots = []
+    for func, (_, _, _, cumtime, callers) in stats.stats.items():
+        called = sum(
+            ct for caller, (*_, ct) in callers.items() if caller in stats.stats
+        )
+        if cumtime and called < cumtime:
+            roots.append((func, 1 - called / cumtime))
+    totals = defaultdict(float)
+    # Walk every path from the roots, carrying the share of each function's
+    # time that belongs to the path
+    pending = [((func,), share) for func, share in roots]
+    while pending:
+        path, share = pending.pop()
+        _, _, own_time, cumtime, _ = stats.stats[path[-1]]
+        totals[path] += own_time * share
+        if len(path) >= max_depth:
+            continue
+        for callee, callee_share in callees[path[-1]]:
+            callee_cumtime = stats.stats[callee][3]
+            if callee in path or callee_cumtime * share * callee_share < min_seconds:
+                continue
+            pending.append((path + (callee,), share * callee_share))
+    lines = []
+    for path, seconds in sorted(totals.items()):
+        microseconds = round(seconds * 1e6)
+        if microseconds:
+            lines.append(f"{';'.join(map(_frame_label, path))} {microseconds}")
+    return lines
+
+
+def write_file(path, text):
+    """Write a text file without leaving a partial file behind."""
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(f"{path}.tmp", path)
+
+
+def write_pickle(path, obj):
+    """Pickle an object to a file without leaving a partial file behind."""
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(f"{path}.tmp", path)
+
+
+class PersistentLRUCache:
+    """
+    Mapping that keeps at most `maxsize` entries, evicting the least recently
+    used ones, and can be saved to and loaded from `path`. Entries saved with
+    a different `version` are discarded on load.
+    """
+
+    def __init__(self, maxsize, path=None, version=""):
+        self.maxsize = maxsize
+        self.path = path
+        self.version = version
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                version, items = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except (pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+            logger.warning(f"Ignoring unreadable cache file {self.path}")
+            return
+        if version == self.version:
+            self.data = OrderedDict(items)
+
+    def save(self):
+        write_pickle(self.path, (self.version, list(self.data.items())))
@@ -0,0 +1,147 @@
+import json
+from argparse import Namespace
+from datetime import date
+from pathlib import Path
+
+import pytest
+from scrapy.exceptions import UsageError
+from scrapy.settings import Settings
+from scrapy.statscollectors import StatsCollector
+from twisted.internet.defer import Deferred
+
+from city_scrapers.commands.backfill import Command, month_chunks, parse_date
+from city_scrapers.spiders.bisnd_bcc import BisndBCCASpider
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+from city_scrapers.spiders.bisnd_mc import BisndMCCCSpider
+
+
+class FakeSpiderLoader:
+    spiders = {
+        "bcc_a": BisndBCCASpider,
+        "mc_cc": BisndMCCCSpider,
+        "bps": BisndBpsSpider,
+    }
+
+    def list(self):
+        return list(self.spiders)
+
+    def load(self, name):
+        return self.spiders[name]
+
+
+class FakeCrawlerProcess:
+    def __init__(self, on_start=None):
+        self.spider_loader = FakeSpiderLoader()
+        self.crawls = {}
+        self.on_start = on_start
+
+    def crawl(self, crawler, **kwargs):
+        crawler.stats = StatsCollector(crawler)
+        self.crawls[crawler.spidercls.name, kwargs["start_date"]] = (
+            crawler,
+            kwargs,
+            Deferred(),
+        )
+        return self.crawls[crawler.spidercls.name, kwargs["start_date"]][2]
+
+    def start(self):
+        # Crawls finish while the reactor would be running
+        if self.on_start:
+            self.on_start(self.crawls)
+
+
+@pytest.fixture
+def command():
+    cmd = Command()
+    cmd.settings = Settings(
+        {"CRAWLALL_CONCURRENCY": 8, "CRAWLALL_CONCURRENCY_PER_HOST": 8}
+    )
+    cmd.crawler_process = FakeCrawlerProcess()
+    return cmd
+
+
+def options(tmp_path, **kwargs):
+    return Namespace(
+        **{"date_from": "2015-01", "date_to": "2015-02", "output": str(tmp_path)},
+        **kwargs,
+    )
+
+
+def finish(crawler, d, items=()):
+    path = Path(next(iter(crawler.settings.getdict("FEEDS"))))
+    # Scrapy's feed storage creates the directories
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        f.writelines(f"{json.dumps(item)}\n" for item in items)
+    crawler.stats.set_value("finish_reason", "finished")
+    d.callback(None)
+
+
+def test_parse_date():
+    assert parse_date("2015") == date(2015, 1, 1)
+    assert parse_date("2015", end=True) == date(2015, 12, 31)
+    assert parse_date("2016-02", end=True) == date(2016, 2, 29)
+    assert parse_date("2016-02-10") == date(2016, 2, 10)
+    with pytest.raises(UsageError):
+        parse_date("02/10/2016")
+
+
+def test_month_chunks():
+    assert month_chunks(date(2015, 1, 15), date(2015, 3, 10)) == [
+        (date(2015, 1, 15), date(2015, 1, 31)),
+        (date(2015, 2, 1), date(2015, 2, 28)),
+        (date(2015, 3, 1), date(2015, 3, 10)),
+    ]
+
+
+def test_only_window_spiders(command, tmp_path):
+    with pytest.raises(UsageError):
+        command.run(["bps"], options(tmp_path))
+
+
+def test_backfill_chunks_checkpointed_and_merged(command, tmp_path, capsys):
+    earlier = {"id": "a", "start": "2015-01-05T09:00:00", "title": "Earlier"}
+    later = {"id": "b", "start": "2015-02-03T09:00:00", "title": "Later"}
+
+    def run_crawls(crawls):
+        # Window spiders get a crawl per month, oldest first
+        assert list(crawls) == [
+            ("bisnd_bcc_a", "2015-01-01"),
+            ("bisnd_mc_cc", "2015-01-01"),
+            ("bisnd_bcc_a", "2015-02-01"),
+            ("bisnd_mc_cc", "2015-02-01"),
+        ]
+        crawler, kwargs, d = crawls["bisnd_bcc_a", "2015-02-01"]
+        assert kwargs["end_date"] == "2015-02-28"
+        assert not crawler.settings.getbool("UNCHANGED_RESPONSES_ENABLED")
+        assert crawler.settings["JOB_CHECKPOINT_DIR"] == str(
+            tmp_path.resolve() / "jobs" / "2015-02"
+        )
+        assert crawler.settings["JOB_CHECKPOINT_ID"] == "backfill/bcc_a/2015-02"
+        finish(crawler, d, [later])
+        crawler, _, d = crawls["bisnd_bcc_a", "2015-01-01"]
+        finish(crawler, d, [later, earlier])
+        crawler, _, d = crawls["bisnd_mc_cc", "2015-01-01"]
+        finish(crawler, d)
+        # Closed early, so not checkpointed
+        crawler, _, d = crawls["bisnd_mc_cc", "2015-02-01"]
+        crawler.stats.set_value("finish_reason", "closespider_errorcount")
+        d.callback(None)
+
+    command.crawler_process = FakeCrawlerProcess(run_crawls)
+    command.run([], options(tmp_path))
+    assert (tmp_path / "checkpoint").read_text().split() == [
+        "bcc_a/2015-02",
+        "bcc_a/2015-01",
+        "mc_cc/2015-01",
+    ]
+    feed = (tmp_path / "bcc_a.jl").read_text().splitlines()
+    assert [json.loads(line)["id"] for line in feed] == ["a", "b"]
+    assert (tmp_path / "mc_cc.jl").read_text() == ""
+    assert "3 chunks finished, 0 already done" in capsys.readouterr().out
+
+    # Running again only crawls the unfinished chunk
+    command.crawler_process = FakeCrawlerProcess()
+    command.run([], options(tmp_path))
+    assert list(command.crawler_process.crawls) == [("bisnd_mc_cc", "2015-02-01")]
+    assert command.skipped == 3
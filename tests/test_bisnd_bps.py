@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from os.path import dirname, join
 
@@ -90,3 +91,81 @@ def test_classification():
 @pytest.mark.parametrize("item", parsed_items)
 def test_all_day(item):
     assert item["all_day"] is False
+
+
+def test_parse_row():
+    (row,) = spider._parse_rows(
+        [
+            "<p>2023</p>",
+            '<p class="">August</p>',
+            "<p>8 (7:30 a.m.)</p>",
+            "<p>Special - <b>CANCELLED</b></p>",
+            '<p><a href="https://example.com/agenda">Agenda</a></p>',
+            '<p class="medium-insert-active"><br></p>',
+            None,
+            '<p><a href="https://example.com/notice">Media\xa0 Notice</a></p>',
+        ]
+    )
+    assert row.title == "Special - CANCELLED"
+    assert spider._parse_start(row) == datetime(2023, 8, 8, 17, 15)
+    assert spider._parse_links(row) == [
+        {"href": "https://example.com/agenda", "title": "Agenda"},
+        {"href": "https://example.com/notice", "title": "Media Notice"},
+    ]
+
+
+def test_multiple_dates_split():
+    rows = list(
+        spider._parse_rows(
+            [
+                "<p>2023</p>",
+                "<p>February</p>",
+                "<p>8, 9, 15, and 16 (5:15 p.m.)</p>",
+                "<p>School Board Supt. Interviews</p>",
+                None,
+                '<p><a href="/8">2/8/23 Minutes</a><br>'
+                '<a href="/9">2/9/23 Minutes</a></p>',
+                None,
+                '<p><a href="/notice">Media Notice</a></p>',
+            ]
+        )
+    )
+    assert [row.day for row in rows] == ["8", "9", "15", "16"]
+    assert [row.links for row in rows] == [
+        [
+            {"href": "/8", "title": "2/8/23 Minutes"},
+            {"href": "/notice", "title": "Media Notice"},
+        ],
+        [
+            {"href": "/9", "title": "2/9/23 Minutes"},
+            {"href": "/notice", "title": "Media Notice"},
+        ],
+        [{"href": "/notice", "title": "Media Notice"}],
+        [{"href": "/notice", "title": "Media Notice"}],
+    ]
+
+
+def bps_row(year):
+    return [f"<p>{year}</p>", "<p>May</p>", "<p>1</p>", "<p>Regular</p>"]
+
+
+def test_parsed_data_stops_after_old_rows():
+    data = json.dumps(
+        [["<p>Year</p>"], bps_row(2023)]
+        + [bps_row(2021)] * spider.old_rows_to_stop
+        + [bps_row(2024)]
+    )
+    # Anything after enough rows past the cutoff isn't decoded
+    data = data[:-1] + ", not json]"
+    with freeze_time("2024-04-02"):
+        rows = list(spider._parsed_data(data))
+    assert [row.year for row in rows] == ["2023"]
+
+
+def test_parsed_data_keeps_rows_out_of_order():
+    data = json.dumps(
+        [["<p>Year</p>"], bps_row(2023), bps_row(2021), bps_row(2024), bps_row(2022)]
+    )
+    with freeze_time("2024-04-02"):
+        rows = list(spider._parsed_data(data))
+    assert [row.year for row in rows] == ["2023", "2024", "2022"]
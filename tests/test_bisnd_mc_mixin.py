@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 
 import pytest
@@ -8,8 +9,10 @@ from city_scrapers_core.constants import (
     COMMITTEE,
     NOT_CLASSIFIED,
 )
+from scrapy.http import Request, TextResponse
+from scrapy.settings import Settings
 
-from city_scrapers.mixins.mc import MCMixin
+from city_scrapers.mixins.mc import MCMixin, _iter_odata
 
 
 class TestMCMixin:
@@ -47,6 +50,151 @@ class TestMCMixin:
         ), "The category_id should be part of the request URL"
         assert "Events?$filter=categoryId+in+(" in url, "URL filter format is incorrect"
 
+    def test_start_requests_batched(self, mixin):
+        mixin.settings = Settings({"MC_BATCHED": True})
+        mixin.batch_category_ids = [24, 100]
+        request = next(mixin.start_requests())
+        assert "categoryId+in+(24,100)" in request.url
+        assert "categoryId+in+(100)" in request.meta["source"]
+        assert request.meta["shared_response"] is True
+
+    def test_parse_batched(self, mixin):
+        event = {
+            "eventName": "Meeting",
+            "eventDescription": "",
+            "categoryName": "Board",
+            "startDateTime": "2024-03-12T09:00:00Z",
+            "eventLocation": None,
+            "publishedFiles": [],
+        }
+        body = json.dumps(
+            {
+                "value": [
+                    {**event, "categoryId": 24},
+                    {**event, "categoryId": 100},
+                ]
+            }
+        )
+        source = f"{mixin.base_url}/v1/Events?single"
+        request = Request(
+            f"{mixin.base_url}/v1/Events?batched",
+            meta={"mc_batched": True, "source": source},
+        )
+        response = TextResponse(
+            request.url, body=body, encoding="utf-8", request=request
+        )
+        items = list(mixin.parse(response))
+        assert len(items) == 1
+        assert items[0]["source"] == source
+        assert items[0]["id"] == "test_spider_mc/202403120900/x/meeting"
+
+    def test_start_requests_select_and_paging(self, mixin):
+        request = next(mixin.start_requests())
+        assert "$select=eventName,eventDescription,categoryId," in request.url
+        assert request.url.endswith(f"$top={mixin.page_size}&$skip=0")
+        assert request.meta["query"] == request.meta["source"]
+
+    def test_parse_follows_pages(self, mixin):
+        mixin.page_size = 2
+        event = {
+            "eventName": "Meeting",
+            "eventDescription": "",
+            "categoryName": "Board",
+            "startDateTime": "2024-03-12T09:00:00Z",
+            "eventLocation": None,
+            "publishedFiles": [],
+        }
+        request = next(mixin.start_requests())
+        full_page = TextResponse(
+            request.url,
+            body=json.dumps({"value": [event, event]}),
+            encoding="utf-8",
+            request=request,
+        )
+        results = list(mixin.parse(full_page))
+        next_page = results[-1]
+        assert len(results) == 3
+        assert isinstance(next_page, Request)
+        assert next_page.url.endswith("$top=2&$skip=2")
+        assert next_page.meta["source"] == request.meta["source"]
+
+        next_link = f"{mixin.base_url}/v1/Events?$skiptoken=abc"
+        linked_page = TextResponse(
+            next_page.url,
+            body=json.dumps({"value": [event], "@odata.nextLink": next_link}),
+            encoding="utf-8",
+            request=next_page,
+        )
+        results = list(mixin.parse(linked_page))
+        assert results[-1].url == next_link
+
+    def test_parse_pages_past_server_cap(self, mixin):
+        # The server returns at most 3 rows whatever $top asks for
+        events = [
+            {
+                "eventName": f"Meeting {index}",
+                "eventDescription": "",
+                "categoryName": "Board",
+                "startDateTime": f"2024-03-{index + 10}T09:00:00Z",
+                "eventLocation": None,
+                "publishedFiles": [],
+            }
+            for index in range(7)
+        ]
+        request = next(mixin.start_requests())
+        meetings = []
+        skips = []
+        while request is not None:
+            skip = request.meta["skip"]
+            skips.append(skip)
+            response = TextResponse(
+                request.url,
+                body=json.dumps({"value": events[skip : skip + 3]}),
+                encoding="utf-8",
+                request=request,
+            )
+            request = None
+            for result in mixin.parse(response):
+                if isinstance(result, Request):
+                    request = result
+                else:
+                    meetings.append(result)
+        assert len(meetings) == 7
+        # The last page is shorter than the server's page size
+        assert skips == [0, 3, 6]
+
+        # A short first page may be all there is, an empty page ends it
+        request = next(mixin.start_requests())
+        first_page = TextResponse(
+            request.url,
+            body=json.dumps({"value": events[:2]}),
+            encoding="utf-8",
+            request=request,
+        )
+        next_page = list(mixin.parse(first_page))[-1]
+        assert next_page.url.endswith(f"$top={mixin.page_size}&$skip=2")
+        empty_page = TextResponse(
+            next_page.url,
+            body=json.dumps({"value": []}),
+            encoding="utf-8",
+            request=next_page,
+        )
+        assert not any(
+            isinstance(result, Request) for result in mixin.parse(empty_page)
+        )
+
+    def test_iter_odata(self):
+        text = '{"@odata.context": "x", "value": [ {"a": [1, 2]}, {"b": "]"} ] }'
+        assert list(_iter_odata(text)) == [
+            ("@odata.context", "x"),
+            ("value", {"a": [1, 2]}),
+            ("value", {"b": "]"}),
+        ]
+        assert list(_iter_odata('{"value": []}')) == []
+        assert list(_iter_odata("{}")) == []
+        with pytest.raises(ValueError):
+            list(_iter_odata('{"value": [1 2]}'))
+
     def test_parse_classification(self, mixin):
         # Test various classifications based on category name
         assert mixin._parse_classification("City Council Meeting") == CITY_COUNCIL
@@ -0,0 +1,139 @@
+from argparse import ArgumentParser, Namespace
+
+import pytest
+from scrapy.exceptions import UsageError
+from scrapy.settings import Settings
+from scrapy.statscollectors import StatsCollector
+from twisted.internet.defer import Deferred
+
+from city_scrapers.commands.crawlall import Command, spider_host
+from city_scrapers.spiders.bisnd_bcc import BisndBCCASpider
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+from city_scrapers.spiders.bisnd_mc import BisndMCCCSpider
+
+
+class FakeSpiderLoader:
+    spiders = {
+        "bcc_a": BisndBCCASpider,
+        "bcc_b": BisndBCCASpider,
+        "bcc_c": BisndBCCASpider,
+        "mc_cc": BisndMCCCSpider,
+        "bps": BisndBpsSpider,
+    }
+
+    def list(self):
+        return list(self.spiders)
+
+    def load(self, name):
+        return self.spiders[name]
+
+
+class FakeCrawler:
+    def __init__(self, name):
+        self.name = name
+        self.settings = Settings()
+        self.stats = StatsCollector(self)
+
+
+class FakeCrawlerProcess:
+    def __init__(self):
+        self.spider_loader = FakeSpiderLoader()
+        self.crawlers = {}
+        self.crawls = {}
+
+    def create_crawler(self, name):
+        self.crawlers[name] = FakeCrawler(name)
+        return self.crawlers[name]
+
+    def crawl(self, crawler, **kwargs):
+        crawler.kwargs = kwargs
+        self.crawls[crawler.name] = Deferred()
+        return self.crawls[crawler.name]
+
+    def start(self):
+        pass
+
+
+@pytest.fixture
+def command():
+    cmd = Command()
+    cmd.settings = Settings(
+        {"CRAWLALL_CONCURRENCY": 3, "CRAWLALL_CONCURRENCY_PER_HOST": 2}
+    )
+    cmd.crawler_process = FakeCrawlerProcess()
+    cmd.spargs = {}
+    return cmd
+
+
+def test_spider_host():
+    assert spider_host(BisndBCCASpider) == "www.bismarcknd.gov"
+    assert spider_host(BisndMCCCSpider) == "mandannd.api.civicclerk.com"
+    assert spider_host(BisndBpsSpider) == "www.bismarckschools.org"
+
+
+def test_concurrency_limits(command, capsys):
+    command.run([], Namespace())
+    crawls = command.crawler_process.crawls
+    # Two BCC spiders fill the host limit, the third slot goes to another host
+    assert list(crawls) == ["bcc_a", "bcc_b", "mc_cc"]
+
+    crawls["bcc_a"].callback(None)
+    assert list(crawls) == ["bcc_a", "bcc_b", "mc_cc", "bcc_c"]
+
+    crawls["mc_cc"].callback(None)
+    assert "bps" in crawls
+    for d in crawls.values():
+        if not d.called:
+            d.callback(None)
+    assert set(command.timings) == set(FakeSpiderLoader.spiders)
+    assert sum(command.running.values()) == 0
+
+
+def test_failed_spider_reported(command, capsys):
+    command.run(["bps"], Namespace())
+    command.crawler_process.crawls["bps"].errback(Exception("boom"))
+    assert command.failed == ["bps"]
+    command._report(1.0)
+    assert "failed: bps" in capsys.readouterr().out
+
+
+def test_spider_closed_early_reported(command, capsys):
+    command.run(["bps", "mc_cc"], Namespace())
+    stats = command.crawler_process.crawlers["bps"].stats
+    stats.set_value("finish_reason", "memory_budget_exceeded")
+    command.crawler_process.crawls["bps"].callback(None)
+    command.crawler_process.crawlers["mc_cc"].stats.set_value(
+        "finish_reason", "finished"
+    )
+    command.crawler_process.crawls["mc_cc"].callback(None)
+    assert command.failed == ["bps"]
+
+
+def parse_options(command, argv):
+    parser = ArgumentParser()
+    command.add_options(parser)
+    parser.add_argument("spiders", nargs="*")
+    opts = parser.parse_args(argv)
+    command.process_options(opts.spiders, opts)
+    return opts
+
+
+def test_feed_and_spider_options(command, capsys):
+    opts = parse_options(
+        command, ["-O", "output/%(name)s.json", "-a", "foo=bar", "bps", "mc_cc"]
+    )
+    assert command.settings.getdict("FEEDS") == {
+        "output/%(name)s.json": {"format": "json", "overwrite": True}
+    }
+    command.run(opts.spiders, opts)
+    crawlers = command.crawler_process.crawlers
+    assert crawlers["bps"].kwargs == {"foo": "bar"}
+    assert crawlers["mc_cc"].kwargs == {"foo": "bar"}
+
+
+def test_shared_output_needs_spider_name(command):
+    parse_options(command, ["-o", "output.jl", "bps"])
+    with pytest.raises(UsageError):
+        parse_options(command, ["-o", "output.jl", "bps", "mc_cc"])
+    with pytest.raises(UsageError):
+        parse_options(command, ["-o", "output.jl"])
@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import pytest
+from freezegun import freeze_time
+
+from city_scrapers import dates
+from city_scrapers.dates import cache_clear, parse_date, parse_iso_datetime
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2024-03-05T16:00:00", datetime(2024, 3, 5, 16)),
+        ("2024-03-05T16:00:00Z", datetime(2024, 3, 5, 16)),
+        ("2024-03-05 16:30:15", datetime(2024, 3, 5, 16, 30, 15)),
+        # Handled by dateutil
+        ("2024-03-05T16:00:00-05:00", datetime(2024, 3, 5, 16)),
+        ("2024-03-05", datetime(2024, 3, 5)),
+    ],
+)
+def test_parse_iso_datetime(value, expected):
+    assert parse_iso_datetime(value) == expected
+
+
+def test_parse_iso_datetime_invalid():
+    with pytest.raises(ValueError):
+        parse_iso_datetime("2024-02-30T16:00:00")
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("December 26, 2024", date(2024, 12, 26)),
+        ("June\xa0 27, 2023", date(2023, 6, 27)),
+        ("February 27 2024", date(2024, 2, 27)),
+        ("2024 March 25", date(2024, 3, 25)),
+        ("Sept. 3, 2024", date(2024, 9, 3)),
+        # Handled by dateutil
+        ("12/26/2024", date(2024, 12, 26)),
+    ],
+)
+def test_parse_date(value, expected):
+    assert parse_date(value) == expected
+
+
+def test_parse_date_invalid():
+    with pytest.raises(ValueError):
+        parse_date("Board meeting")
+    with pytest.raises(ValueError):
+        parse_date("February 30, 2024")
+
+
+def test_dateutil_fallback_not_memoized():
+    # dateutil fills the year missing from a partial date with today's
+    with freeze_time("2024-04-02"):
+        assert parse_date("March 5") == date(2024, 3, 5)
+        assert parse_iso_datetime("March 5 4pm") == datetime(2024, 3, 5, 16)
+    with freeze_time("2025-04-02"):
+        assert parse_date("March 5") == date(2025, 3, 5)
+        assert parse_iso_datetime("March 5 4pm") == datetime(2025, 3, 5, 16)
+
+
+def test_cache_clear():
+    parse_date("December 26, 2024")
+    parse_iso_datetime("2024-03-05T16:00:00")
+    cache_clear()
+    assert dates._parse_date.cache_info().currsize == 0
+    assert dates._parse_iso_datetime.cache_info().currsize == 0
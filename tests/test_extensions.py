@@ -0,0 +1,138 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse
+from scrapy.pipelines import ItemPipelineManager
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred
+
+from city_scrapers.extensions import PerformanceStatsExtension, quantiles
+from city_scrapers.middleware import ParseTimingMiddleware
+from city_scrapers.utils import wrap_pipelines
+
+
+class FirstPipeline:
+    def process_item(self, item, spider):
+        item["first"] = True
+        return item
+
+
+class SecondPipeline:
+    async def process_item(self, item, spider):
+        item["second"] = True
+        return item
+
+
+def test_quantiles():
+    assert quantiles(range(1, 101)) == {0.5: 50, 0.9: 90, 0.99: 99}
+    assert quantiles([3]) == {0.5: 3, 0.9: 3, 0.99: 3}
+    assert quantiles([]) == {}
+
+
+def test_not_configured():
+    with pytest.raises(NotConfigured):
+        PerformanceStatsExtension.from_crawler(get_crawler(Spider))
+    with pytest.raises(NotConfigured):
+        ParseTimingMiddleware.from_crawler(get_crawler(Spider))
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    return get_crawler(
+        Spider,
+        {"PERFORMANCE_STATS_ENABLED": True, "PERFORMANCE_STATS_DIR": str(tmp_path)},
+    )
+
+
+def test_parse_timing(crawler):
+    spider = Spider("test")
+    crawler.stats.open_spider(spider)
+    mw = ParseTimingMiddleware.from_crawler(crawler)
+    url = "https://www.bismarckschools.org/Page/401"
+    response = HtmlResponse(url, body=b"", request=Request(url, callback=spider.parse))
+    output = mw.process_spider_output(response, iter([{"a": 1}, {"a": 2}]), spider)
+    assert list(output) == [{"a": 1}, {"a": 2}]
+    assert crawler.stats.get_value("performance/parse_seconds/parse", spider=spider)
+
+
+def test_pipelines_timed(crawler):
+    extension = PerformanceStatsExtension.from_crawler(crawler)
+    itemproc = ItemPipelineManager(FirstPipeline(), SecondPipeline())
+    wrap_pipelines(itemproc, extension._timed)
+    results = []
+    itemproc.process_item({}, Spider("test")).addCallback(results.append)
+    assert results == [{"first": True, "second": True}]
+    assert list(extension.pipeline_seconds) == ["FirstPipeline", "SecondPipeline"]
+    assert all(seconds > 0 for seconds in extension.pipeline_seconds.values())
+
+
+def test_pipeline_waits_not_timed(crawler):
+    waiting = Deferred()
+
+    class WaitingPipeline:
+        def process_item(self, item, spider):
+            return waiting
+
+    extension = PerformanceStatsExtension.from_crawler(crawler)
+    itemproc = ItemPipelineManager(WaitingPipeline())
+    wrap_pipelines(itemproc, extension._timed)
+    results = []
+    itemproc.process_item({}, Spider("test")).addCallback(results.append)
+    time.sleep(0.05)
+    waiting.callback({"waited": True})
+    assert results == [{"waited": True}]
+    assert extension.pipeline_seconds["WaitingPipeline"] < 0.05
+
+
+def test_spider_closed_writes_files(crawler, tmp_path):
+    spider = Spider("test")
+    crawler.stats.open_spider(spider)
+    crawler.stats.set_value("performance/parse_seconds/parse", 0.5, spider=spider)
+    extension = PerformanceStatsExtension.from_crawler(crawler)
+    extension.opened_at = 0
+    extension.pipeline_seconds = {"MeetingPipeline": 0.25}
+    url = "https://www.bismarckschools.org/Page/401"
+    for latency in (0.1, 0.2, 0.3):
+        request = Request(url, meta={"download_latency": latency})
+        extension.bytes_received(b"x" * 100, request, spider)
+        extension.response_received(HtmlResponse(url), request, spider)
+    # Shared responses aren't downloaded
+    extension.response_received(HtmlResponse(url), Request(url), spider)
+    extension.item_times = [10.0, 10.5, 12.0]
+
+    extension.spider_closed(spider, "finished")
+
+    summary = json.loads(Path(tmp_path, "test.json").read_text())
+    assert summary["download"]["responses"] == 3
+    assert summary["download"]["bytes"] == 300
+    assert summary["download"]["latency_seconds"] == {
+        "0.5": 0.2,
+        "0.9": 0.3,
+        "0.99": 0.3,
+    }
+    assert summary["parse"] == {"seconds": 0.5, "callbacks": {"parse": 0.5}}
+    assert summary["items"]["count"] == 3
+    assert summary["items"]["interval_seconds"]["0.99"] == 1.5
+    assert summary["pipelines"] == {"MeetingPipeline": 0.25}
+
+    metrics = Path(tmp_path, "test.prom").read_text().splitlines()
+    assert "# TYPE city_scrapers_download_latency_seconds summary" in metrics
+    assert (
+        'city_scrapers_download_latency_seconds{spider="test",quantile="0.5"} 0.2'
+        in metrics
+    )
+    assert 'city_scrapers_download_latency_seconds_count{spider="test"} 3' in metrics
+    assert 'city_scrapers_received_bytes_total{spider="test"} 300' in metrics
+    assert (
+        'city_scrapers_parse_seconds_total{spider="test",callback="parse"} 0.5'
+        in metrics
+    )
+    assert 'city_scrapers_items_total{spider="test"} 3' in metrics
+    assert (
+        'city_scrapers_pipeline_seconds_total{spider="test",pipeline="MeetingPipeline"}'
+        " 0.25" in metrics
+    )
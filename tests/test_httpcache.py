@@ -0,0 +1,88 @@
+import os
+from time import time
+
+import pytest
+from scrapy import Request, Spider
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.httpcache import ConditionalGetPolicy, EvictingFilesystemCacheStorage
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    return get_crawler(
+        Spider,
+        {
+            "HTTPCACHE_DIR": str(tmp_path),
+            "HTTPCACHE_EXPIRATION_SECS": 3600,
+            "HTTPCACHE_MAX_SIZE": 0,
+        },
+    )
+
+
+@pytest.fixture
+def spider(crawler):
+    return Spider.from_crawler(crawler, name="test_spider")
+
+
+def store(storage, spider, url, body=b"<html></html>"):
+    request = Request(url)
+    response = HtmlResponse(url, body=body, headers={"ETag": '"abc"'})
+    storage.store_response(spider, request, response)
+    return request
+
+
+def test_policy_always_revalidates(crawler):
+    policy = ConditionalGetPolicy(crawler.settings)
+    request = Request("https://www.bismarckschools.org/Page/401")
+    cached = HtmlResponse(
+        request.url,
+        headers={
+            "ETag": '"abc"',
+            "Last-Modified": "Mon, 01 Apr 2024 00:00:00 GMT",
+            "Cache-Control": "max-age=86400",
+        },
+    )
+    assert not policy.is_cached_response_fresh(cached, request)
+    assert request.headers["If-None-Match"] == b'"abc"'
+    assert request.headers["If-Modified-Since"] == b"Mon, 01 Apr 2024 00:00:00 GMT"
+    not_modified = HtmlResponse(request.url, status=304)
+    assert policy.is_cached_response_valid(cached, not_modified, request)
+
+
+def test_evicts_unused_entries(crawler, spider):
+    storage = EvictingFilesystemCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    old = store(storage, spider, "https://example.com/old")
+    new = store(storage, spider, "https://example.com/new")
+    old_meta = os.path.join(storage._get_request_path(spider, old), "pickled_meta")
+    os.utime(old_meta, (time() - 7200, time() - 7200))
+
+    storage.close_spider(spider)
+    assert storage.retrieve_response(spider, old) is None
+    assert not os.path.exists(storage._get_request_path(spider, old))
+    assert storage.retrieve_response(spider, new) is not None
+
+
+def test_evicts_least_recently_used_over_max_size(crawler, spider):
+    storage = EvictingFilesystemCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    requests = [
+        store(storage, spider, f"https://example.com/{i}", body=os.urandom(1000))
+        for i in range(3)
+    ]
+    # Room for two of the three entries
+    path = storage._get_request_path(spider, requests[0])
+    entry_size = sum(f.stat().st_size for f in os.scandir(path))
+    storage.max_size = int(entry_size * 2.5)
+    for age, request in zip([30, 20, 10], requests):
+        meta = os.path.join(storage._get_request_path(spider, request), "pickled_meta")
+        os.utime(meta, (time() - age, time() - age))
+    # Using the oldest entry makes it the most recently used one
+    assert storage.retrieve_response(spider, requests[0]) is not None
+
+    storage.close_spider(spider)
+    assert storage.retrieve_response(spider, requests[0]) is not None
+    assert storage.retrieve_response(spider, requests[1]) is None
+    assert storage.retrieve_response(spider, requests[2]) is not None
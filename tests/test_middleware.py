@@ -0,0 +1,770 @@
+import os
+import pstats
+import time
+import tracemalloc
+from os.path import dirname, join
+from unittest.mock import Mock
+
+import pytest
+from city_scrapers_core.constants import PASSED, TENTATIVE
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy import Request
+from scrapy.downloadermiddlewares.robotstxt import RobotsTxtMiddleware
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.exceptions import NotConfigured
+from scrapy.extensions.feedexport import FeedExporter
+from scrapy.http import HtmlResponse, TextResponse
+from scrapy.pipelines import ItemPipelineManager
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred
+
+from city_scrapers.middleware import (
+    CpuProfileMiddleware,
+    HostLimitMiddleware,
+    HostUnavailable,
+    JobCheckpointMiddleware,
+    MemoryProfileMiddleware,
+    MockServerMiddleware,
+    ReactorStallMiddleware,
+    RobotsTxtCacheMiddleware,
+    SharedResponseMiddleware,
+    UnchangedResponseMiddleware,
+)
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+
+test_bps_response = file_response(
+    join(dirname(__file__), "files", "bisnd_bps.html"),
+    url="https://www.bismarckschools.org/Page/401",
+)
+
+
+@pytest.fixture
+def shared_mw():
+    yield SharedResponseMiddleware()
+    SharedResponseMiddleware.responses.clear()
+    SharedResponseMiddleware.leaders.clear()
+    SharedResponseMiddleware.waiting.clear()
+
+
+def process_request(mw, request):
+    results = []
+    deferred_from_coro(mw.process_request(request, None)).addCallback(results.append)
+    return results
+
+
+def test_shared_response_downloaded_once(shared_mw):
+    url = "https://www.bismarcknd.gov/calendar.aspx?CID=all"
+    leader = Request(url, meta={"shared_response": True})
+    follower = Request(url, meta={"shared_response": True})
+
+    assert process_request(shared_mw, leader) == [None]
+    waiting = process_request(shared_mw, follower)
+    assert waiting == []
+
+    response = HtmlResponse(url, body=b"<html></html>", request=leader)
+    assert shared_mw.process_response(leader, response, None) is response
+    assert waiting[0].body == response.body
+    assert waiting[0].request is follower
+    assert "shared" in waiting[0].flags
+
+    late = Request(url, meta={"shared_response": True})
+    assert process_request(shared_mw, late)[0].request is late
+
+
+def test_shared_responses_bounded(shared_mw):
+    shared_mw.max_responses = 2
+    url = "https://www.bismarcknd.gov/calendar.aspx?CID="
+
+    def download(cid):
+        request = Request(f"{url}{cid}", meta={"shared_response": True})
+        process_request(shared_mw, request)
+        shared_mw.process_response(request, HtmlResponse(request.url), None)
+
+    download(1)
+    download(2)
+    # Using a page keeps it over pages used less recently
+    process_request(shared_mw, Request(f"{url}1", meta={"shared_response": True}))
+    download(3)
+    assert [response.url for response in shared_mw.responses.values()] == [
+        f"{url}1",
+        f"{url}3",
+    ]
+
+
+def test_shared_response_limit_per_crawler(shared_mw):
+    small = SharedResponseMiddleware.from_crawler(
+        get_crawler(BisndBpsSpider, {"SHARED_RESPONSE_CACHE_SIZE": 2})
+    )
+    large = SharedResponseMiddleware.from_crawler(
+        get_crawler(BisndBpsSpider, {"SHARED_RESPONSE_CACHE_SIZE": 64})
+    )
+    # A crawler started later doesn't change the limit of the others
+    assert (small.max_responses, large.max_responses) == (2, 64)
+    assert shared_mw.max_responses == 32
+
+
+def test_shared_response_failure_releases_waiting(shared_mw):
+    url = "https://www.bismarcknd.gov/calendar.aspx?CID=all"
+    leader = Request(url, meta={"shared_response": True})
+    follower = Request(url, meta={"shared_response": True})
+
+    process_request(shared_mw, leader)
+    waiting = process_request(shared_mw, follower)
+    shared_mw.process_exception(leader, Exception(), None)
+    # The waiting request falls back to downloading on its own
+    assert waiting == [None]
+    assert list(shared_mw.leaders.values()) == [follower]
+
+
+def test_unflagged_request_ignored(shared_mw):
+    request = Request("https://www.bismarcknd.gov/calendar.aspx")
+    assert process_request(shared_mw, request) == [None]
+    assert not shared_mw.leaders
+
+
+def test_in_flight_requests_coalesced(shared_mw):
+    crawler = get_crawler(BisndBpsSpider, {"COALESCE_REQUESTS": True})
+    crawler.stats.open_spider(None)
+    mw = SharedResponseMiddleware.from_crawler(crawler)
+    url = "https://mandannd.api.civicclerk.com/v1/Meetings/GetMeetingFileStream"
+    leader = Request(url)
+    follower = Request(url)
+    other = Request(url, method="POST", body=b"{}")
+
+    assert process_request(mw, leader) == [None]
+    waiting = process_request(mw, follower)
+    assert process_request(mw, other) == [None]
+    assert waiting == []
+
+    response = HtmlResponse(url, status=404, request=leader)
+    mw.process_response(leader, response, None)
+    assert waiting[0].status == 404
+    assert waiting[0].request is follower
+    assert crawler.stats.get_value("shared_response/saved_count") == 1
+    # Responses aren't kept once the download is done
+    assert process_request(mw, Request(url)) == [None]
+    assert not mw.responses
+
+
+@pytest.fixture
+def unchanged_mw(tmp_path):
+    crawler = get_crawler(
+        BisndBpsSpider,
+        {"UNCHANGED_RESPONSES_ENABLED": True, "UNCHANGED_RESPONSES_DIR": str(tmp_path)},
+    )
+    spider = BisndBpsSpider.from_crawler(crawler)
+    mw = UnchangedResponseMiddleware.from_crawler(crawler)
+    mw.spider_opened(spider)
+    return mw, spider
+
+
+def bps_response(body):
+    url = "https://www.bismarckschools.org/Page/401"
+    return HtmlResponse(url, body=body, request=Request(url))
+
+
+def test_unchanged_response_replays_items(unchanged_mw):
+    mw, spider = unchanged_mw
+    body = test_bps_response.body
+    with freeze_time("2024-04-02"):
+        response = bps_response(body)
+        items = list(mw.process_spider_output(response, spider.parse(response), spider))
+    mw.spider_closed(spider, "finished")
+
+    mw = UnchangedResponseMiddleware.from_crawler(spider.crawler)
+    mw.spider_opened(spider)
+    # Volatile ASP.NET tokens don't count as a change
+    changed_token = body.replace(
+        b"</form>",
+        b'<input type="hidden" name="__VIEWSTATE" value="abc" /></form>',
+    )
+
+    def not_parsed():
+        raise AssertionError("parse should not run")
+        yield
+
+    with freeze_time("2024-03-20"):
+        response = bps_response(changed_token)
+        replayed = list(mw.process_spider_output(response, not_parsed(), spider))
+    assert len(replayed) == len(items)
+    assert replayed[0]["id"] == items[0]["id"]
+    # Status is recomputed for the current time
+    assert items[0]["status"] == PASSED
+    assert replayed[0]["status"] == TENTATIVE
+    assert spider.crawler.stats.get_value("unchanged_responses/replayed") == 1
+
+
+def test_changed_response_parsed(unchanged_mw):
+    mw, spider = unchanged_mw
+    mw.previous = {"other": ("", [])}
+    response = bps_response(test_bps_response.body)
+    with freeze_time("2024-04-02"):
+        items = list(mw.process_spider_output(response, spider.parse(response), spider))
+    assert len(items) == 90
+    assert len(mw.current) == 1
+
+
+def test_mock_server_rewrites_hosts():
+    crawler = get_crawler(
+        settings_dict={
+            "MOCK_SERVER_HOSTS": {"www.bismarcknd.gov": "http://127.0.0.1:8999"}
+        }
+    )
+    mw = MockServerMiddleware.from_crawler(crawler)
+    url = "https://www.bismarcknd.gov/calendar.aspx?CID=52"
+    request = Request(url, meta={"bcc_consolidated": True})
+
+    mock_request = mw.process_request(request, None)
+    assert mock_request.url == "http://127.0.0.1:8999/calendar.aspx?CID=52"
+    assert mock_request.meta["bcc_consolidated"] is True
+    # Sites on other ports of the same address keep their own downloader slots
+    assert mock_request.meta["download_slot"] == "www.bismarcknd.gov"
+    assert mw.process_request(mock_request, None) is None
+    assert mw.process_request(Request("https://www.mortonnd.org/"), None) is None
+
+    response = HtmlResponse(mock_request.url, body=b"", request=mock_request)
+    assert mw.process_response(mock_request, response, None).url == url
+
+
+def test_mock_server_not_configured():
+    with pytest.raises(NotConfigured):
+        MockServerMiddleware.from_crawler(get_crawler())
+
+
+def test_cpu_profile_not_configured():
+    with pytest.raises(NotConfigured):
+        CpuProfileMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+    crawler = get_crawler(
+        BisndBpsSpider, {"CPU_PROFILE_SPIDERS": ["bisnd_bps", "bisnd_mcc"]}
+    )
+    assert CpuProfileMiddleware.from_crawler(crawler)
+
+
+def test_cpu_profile_saved(tmp_path):
+    spider = BisndBpsSpider()
+    crawler = get_crawler(
+        BisndBpsSpider,
+        {"CPU_PROFILE_ENABLED": True, "CPU_PROFILE_DIR": str(tmp_path)},
+    )
+    mw = CpuProfileMiddleware.from_crawler(crawler)
+    with freeze_time("2024-04-02"):
+        items = list(
+            mw.process_spider_output(
+                test_bps_response, spider.parse(test_bps_response), spider
+            )
+        )
+    assert len(items) == 90
+    mw.spider_closed(spider, "finished")
+
+    stats = pstats.Stats(str(tmp_path / "bisnd_bps.pstats"))
+    assert any(name == "_parse_rows" for _, _, name in stats.stats)
+    stacks = (tmp_path / "bisnd_bps.collapsed").read_text().splitlines()
+    assert any("parse (bisnd_bps.py" in line for line in stacks)
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in stacks)
+
+
+def test_cpu_profile_next_to_feed(tmp_path):
+    feed = tmp_path / "output" / "%(name)s.json"
+    crawler = get_crawler(
+        BisndBpsSpider,
+        {"CPU_PROFILE_ENABLED": True, "FEEDS": {str(feed): {"format": "json"}}},
+    )
+    mw = CpuProfileMiddleware.from_crawler(crawler)
+    assert mw.output_dir() == str(tmp_path / "output")
+
+
+def test_memory_profile_not_configured():
+    with pytest.raises(NotConfigured):
+        MemoryProfileMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+
+
+@pytest.fixture
+def memory_mw():
+    crawler = get_crawler(BisndBpsSpider, {"MEMORY_PROFILE_ENABLED": True})
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    mw = MemoryProfileMiddleware.from_crawler(crawler)
+    # Snapshot whatever the parse keeps alive
+    mw.min_snapshot_bytes = 0
+    crawler.engine.scraper.itemproc = ItemPipelineManager()
+    mw.spider_opened(None)
+    yield mw
+    if tracemalloc.is_tracing():
+        MemoryProfileMiddleware.tracing = 0
+        tracemalloc.stop()
+
+
+def test_memory_profile_stats(memory_mw):
+    spider = BisndBpsSpider()
+    with freeze_time("2024-04-02"):
+        items = list(
+            memory_mw.process_spider_output(
+                test_bps_response, spider.parse(test_bps_response), spider
+            )
+        )
+    assert len(items) == 90
+    memory_mw.spider_closed(spider, "finished")
+    stats = memory_mw.crawler.stats
+    assert stats.get_value("memory_profile/peak_traced_bytes") > 0
+    assert stats.get_value("memory_profile/process_peak_rss_bytes") > 0
+    sites = stats.get_value("memory_profile/top_sites")
+    assert 0 < len(sites) <= 10
+    assert all(size > 0 for _, size in sites)
+    assert not tracemalloc.is_tracing()
+    memory_mw.crawler.engine.close_spider.assert_not_called()
+
+
+def test_memory_profile_budget(memory_mw):
+    spider = BisndBpsSpider()
+    memory_mw.budget = 1024
+    with freeze_time("2024-04-02"):
+        list(
+            memory_mw.process_spider_output(
+                test_bps_response, spider.parse(test_bps_response), spider
+            )
+        )
+    memory_mw.crawler.engine.close_spider.assert_called_once_with(
+        spider, "memory_budget_exceeded"
+    )
+    memory_mw.spider_closed(spider, "memory_budget_exceeded")
+    assert memory_mw.crawler.stats.get_value("memory_profile/budget_exceeded")
+
+
+def test_memory_profile_budget_own_allocations(memory_mw):
+    spider = BisndBpsSpider()
+    memory_mw.budget = 1024 * 1024
+
+    def parse():
+        yield {"step": 1}
+        yield {"step": 2}
+
+    # What other spiders allocate between the steps of a callback isn't counted
+    others = []
+    for _ in memory_mw.process_spider_output(None, parse(), spider):
+        others.append(bytearray(2 * memory_mw.budget))
+    memory_mw.crawler.engine.close_spider.assert_not_called()
+    assert memory_mw.peak < memory_mw.budget
+
+
+@pytest.fixture
+def stall_mw():
+    crawler = get_crawler(
+        BisndBpsSpider,
+        {"REACTOR_STALL_ENABLED": True, "REACTOR_STALL_THRESHOLD": 0.05},
+    )
+    crawler.stats.open_spider(None)
+    return ReactorStallMiddleware.from_crawler(crawler)
+
+
+def test_reactor_stall_not_configured():
+    with pytest.raises(NotConfigured):
+        ReactorStallMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+
+
+def test_reactor_stall_logged(stall_mw, caplog):
+    spider = BisndBpsSpider()
+
+    def slow_parse():
+        yield {"fast": True}
+        time.sleep(0.06)
+        yield {"slow": True}
+
+    output = stall_mw.process_spider_output(test_bps_response, slow_parse(), spider)
+    assert list(output) == [{"fast": True}, {"slow": True}]
+    stats = stall_mw.stats
+    assert stats.get_value("reactor/stalls") == 1
+    assert stats.get_value("reactor/callback_step_seconds/le_0.01") == 2
+    assert stats.get_value("reactor/callback_step_seconds/le_0.1") == 1
+    assert stats.get_value("reactor/callback_step_seconds/max") > 0.05
+    assert "bisnd_bps callback parse held the reactor for 0.0" in caplog.text
+    assert "s on https://www.bismarckschools.org/Page/401" in caplog.text
+
+
+def test_reactor_lag_sampled(stall_mw):
+    stall_mw.last_sample = time.monotonic() - 0.1
+    stall_mw.sample_lag()
+    stall_mw.last_sample = time.monotonic() - 20
+    stall_mw.sample_lag()
+    stats = stall_mw.stats
+    assert stats.get_value("reactor/lag_seconds/le_0.01") == 1
+    assert stats.get_value("reactor/lag_seconds/gt_10") == 1
+    assert stats.get_value("reactor/lag_seconds/max") > 19
+
+
+@pytest.fixture
+def robots_mw(tmp_path):
+    def make_middleware():
+        crawler = get_crawler(
+            BisndBpsSpider,
+            {
+                "ROBOTSTXT_OBEY": True,
+                "ROBOTSTXT_CACHE_DIR": str(tmp_path),
+                "ROBOTSTXT_CACHE_TTL": 60 * 60 * 24,
+            },
+        )
+        crawler.stats.open_spider(None)
+        return RobotsTxtCacheMiddleware.from_crawler(crawler)
+
+    yield make_middleware
+    RobotsTxtCacheMiddleware.leaders.clear()
+    RobotsTxtCacheMiddleware.waiting.clear()
+
+
+def robots_request():
+    """Return the robots.txt request RobotsTxtMiddleware downloads for a page."""
+    crawler = get_crawler(BisndBpsSpider, {"ROBOTSTXT_OBEY": True})
+    crawler.engine = Mock()
+    crawler.engine.download.return_value = Deferred()
+    RobotsTxtMiddleware.from_crawler(crawler).robot_parser(
+        Request("https://www.bismarckschools.org/Page/401"), BisndBpsSpider()
+    )
+    return crawler.engine.download.call_args[0][0]
+
+
+def robots_response(request, status=200, body=b"User-agent: *\nDisallow: /private\n"):
+    return TextResponse(
+        request.url, status=status, body=body, encoding="utf-8", request=request
+    )
+
+
+def test_robots_cache_not_configured():
+    with pytest.raises(NotConfigured):
+        RobotsTxtCacheMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+
+
+def test_robots_cached_across_runs(robots_mw, tmp_path):
+    mw = robots_mw()
+    request = robots_request()
+    assert process_request(mw, request) == [None]
+    mw.process_response(request, robots_response(request), None)
+    assert list(tmp_path.iterdir()) == [tmp_path / "www.bismarckschools.org.txt"]
+
+    mw = robots_mw()
+    request = robots_request()
+    (response,) = process_request(mw, request)
+    assert response.body == b"User-agent: *\nDisallow: /private\n"
+    assert response.request is request
+    assert mw.stats.get_value("robotstxt/cache_hit_count") == 1
+    # Serving the file doesn't refresh its age
+    mtime = (tmp_path / "www.bismarckschools.org.txt").stat().st_mtime
+    mw.process_response(request, response, None)
+    assert (tmp_path / "www.bismarckschools.org.txt").stat().st_mtime == mtime
+
+
+def test_robots_only_robots_requests(robots_mw, tmp_path):
+    mw = robots_mw()
+    request = Request("https://www.bismarckschools.org/robots.txt")
+    assert process_request(mw, request) == [None]
+    mw.process_response(request, robots_response(request), None)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_robots_stale_entry_fetched(robots_mw, tmp_path):
+    path = tmp_path / "www.bismarckschools.org.txt"
+    path.write_bytes(b"User-agent: *\nDisallow: /\n")
+    stale = time.time() - 60 * 60 * 25
+    os.utime(path, (stale, stale))
+    assert process_request(robots_mw(), robots_request()) == [None]
+
+
+def test_robots_server_error_not_cached(robots_mw, tmp_path):
+    mw = robots_mw()
+    request = robots_request()
+    process_request(mw, request)
+    mw.process_response(request, robots_response(request, 503, b"Error"), None)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_robots_download_shared_in_process(robots_mw):
+    leader, follower = robots_mw(), robots_mw()
+    leader_request, follower_request = robots_request(), robots_request()
+    assert process_request(leader, leader_request) == [None]
+    shared = process_request(follower, follower_request)
+    assert shared == []
+
+    leader.process_response(leader_request, robots_response(leader_request), None)
+    assert shared[0].request is follower_request
+    assert "cached" in shared[0].flags
+    assert follower.stats.get_value("robotstxt/shared_count") == 1
+    assert not RobotsTxtCacheMiddleware.leaders
+    assert not RobotsTxtCacheMiddleware.waiting
+
+
+def test_robots_download_failure_releases_waiting(robots_mw):
+    leader, follower = robots_mw(), robots_mw()
+    leader_request, follower_request = robots_request(), robots_request()
+    process_request(leader, leader_request)
+    waiting = process_request(follower, follower_request)
+    leader.process_exception(leader_request, TimeoutError(), None)
+    # The waiting request falls back to downloading on its own
+    assert waiting == [None]
+
+
+@pytest.fixture
+def host_limit_mw():
+    crawler = get_crawler(
+        BisndBpsSpider,
+        {
+            "HOST_RATE_LIMIT": 2,
+            "HOST_RATE_BURST": 2,
+            "HOST_CIRCUIT_FAILURES": 3,
+            "HOST_CIRCUIT_RESET": 60,
+        },
+    )
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    yield HostLimitMiddleware.from_crawler(crawler)
+    HostLimitMiddleware.hosts.clear()
+
+
+def test_host_limit_not_configured():
+    with pytest.raises(NotConfigured):
+        HostLimitMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+
+
+def test_host_rate_limit_shared(host_limit_mw):
+    request = Request("https://www.bismarcknd.gov/calendar.aspx")
+    host = host_limit_mw._host(request)
+    # Another spider's middleware draws from the same bucket
+    other = HostLimitMiddleware(host_limit_mw.crawler, 2, 2, 3, 60)
+    assert host_limit_mw._reserve(host) == 0
+    assert other._reserve(other._host(request)) == 0
+    assert host_limit_mw._reserve(host) == pytest.approx(0.5, abs=0.01)
+    assert other._reserve(host) == pytest.approx(1, abs=0.01)
+    other_host = host_limit_mw._host(Request("https://www.bismarckschools.org/"))
+    assert host_limit_mw._reserve(other_host) == 0
+
+
+def test_host_circuit_opens(host_limit_mw):
+    spider = BisndBpsSpider()
+    url = "https://www.bismarcknd.gov/calendar.aspx"
+    for _ in range(2):
+        host_limit_mw.process_response(
+            Request(url), HtmlResponse(url, status=503), spider
+        )
+    host_limit_mw.process_exception(Request(url), TimeoutError(), spider)
+    assert process_request(
+        host_limit_mw, Request("https://www.bismarckschools.org/")
+    ) == [None]
+    failures = []
+    deferred_from_coro(host_limit_mw.process_request(Request(url), spider)).addErrback(
+        failures.append
+    )
+    assert failures[0].check(HostUnavailable)
+    # The outage fails the spider instead of letting it finish with no meetings
+    host_limit_mw.crawler.engine.close_spider.assert_called_once_with(
+        spider, "host_unavailable"
+    )
+    host_limit_mw.process_exception(Request(url), failures[0].value, spider)
+    assert host_limit_mw._host(Request(url)).failures == 3
+    stats = host_limit_mw.stats
+    assert stats.get_value("host_limit/circuit_opened_count") == 1
+    assert stats.get_value("host_limit/rejected_count") == 1
+
+    # After the reset time, one request tries the host again
+    host = host_limit_mw._host(Request(url))
+    host.open_until = time.monotonic()
+    host.tokens = 2
+    assert process_request(host_limit_mw, Request(url)) == [None]
+    host_limit_mw.process_response(Request(url), HtmlResponse(url), spider)
+    assert host.failures == 0
+    assert host.open_until is None
+
+
+def test_host_circuit_reset_by_success(host_limit_mw):
+    spider = BisndBpsSpider()
+    url = "https://www.bismarcknd.gov/calendar.aspx"
+    for status in (503, 503, 200, 503, 429):
+        host_limit_mw.process_response(
+            Request(url), HtmlResponse(url, status=status), spider
+        )
+    assert host_limit_mw._host(Request(url)).open_until is None
+
+
+@pytest.fixture
+def checkpoint_crawlers(tmp_path):
+    """Start runs of a spider with a jsonlines feed and a job journal."""
+    runs = []
+
+    def start_run(feeds=True, settings=None, **feed_options):
+        feed_path = str(tmp_path / "items.jl")
+        crawler = get_crawler(
+            BisndBpsSpider,
+            {
+                "JOB_CHECKPOINT_ENABLED": True,
+                "JOB_CHECKPOINT_DIR": str(tmp_path / "jobs"),
+                "JOB_CHECKPOINT_ID": "job-1",
+                "FEEDS": (
+                    {feed_path: {"format": "jsonlines", **feed_options}}
+                    if feeds
+                    else {}
+                ),
+                **(settings or {}),
+            },
+        )
+        crawler.stats.open_spider(None)
+        crawler.engine = Mock()
+        crawler.engine.slot.scheduler.df = RFPDupeFilter.from_crawler(crawler)
+        spider = BisndBpsSpider.from_crawler(crawler)
+        exporter = next(
+            (
+                ext
+                for ext in crawler.extensions.middlewares
+                if isinstance(ext, FeedExporter)
+            ),
+            None,
+        )
+        if exporter:
+            exporter.open_spider(spider)
+        middleware = JobCheckpointMiddleware.from_crawler(crawler)
+        middleware.spider_opened(spider)
+        runs.append(middleware)
+        return middleware, exporter, spider
+
+    yield start_run
+    for middleware in runs:
+        if middleware.loop.running:
+            middleware.loop.stop()
+
+
+def crawl_page(middleware, exporter, spider, request, outputs, after_output=None):
+    """Send a response's outputs through the middleware like the scraper does."""
+    response = HtmlResponse(request.url, request=request)
+    for output in middleware.process_spider_output(response, outputs, spider):
+        if isinstance(output, Request):
+            middleware.request_scheduled(output, spider)
+        else:
+            exporter.item_scraped(output, spider)
+            middleware.item_finished(output, response, spider)
+        if after_output:
+            after_output()
+
+
+def test_job_checkpoint_not_configured():
+    with pytest.raises(NotConfigured):
+        JobCheckpointMiddleware.from_crawler(get_crawler(BisndBpsSpider))
+
+
+def test_job_checkpoint_resumes_remaining_work(checkpoint_crawlers, tmp_path):
+    url = "https://www.bismarckschools.org/Page/"
+    start, first, second = Request(url + "1"), Request(url + "2"), Request(url + "3")
+    middleware, exporter, spider = checkpoint_crawlers()
+    middleware.request_scheduled(start, spider)
+
+    # Frames wait for the response being processed
+    crawl_page(
+        middleware,
+        exporter,
+        spider,
+        start,
+        [{"id": "a"}, first, {"id": "b"}, second],
+        after_output=middleware.sync_soon,
+    )
+    assert middleware.stats.get_value("job_checkpoint/sync_count") == 1
+    # Killed after part of a page went to the feed
+    crawl_page(middleware, exporter, spider, first, iter([{"id": "c"}]))
+    exporter.slots[0].file.flush()
+    middleware.loop.stop()
+    with open(tmp_path / "jobs" / "bisnd_bps.journal", "ab") as f:
+        f.write(b"\x00\x00\x01\x00torn")
+
+    middleware, exporter, spider = checkpoint_crawlers()
+    crawled = [call.args[0] for call in middleware.crawler.engine.crawl.call_args_list]
+    assert [request.url for request in crawled] == [first.url, second.url]
+    assert (tmp_path / "items.jl").read_text().splitlines() == [
+        '{"id": "a"}',
+        '{"id": "b"}',
+    ]
+    df = middleware.crawler.engine.slot.scheduler.df
+    assert df.request_seen(Request(url + "1"))
+    assert list(middleware.process_start_requests([Request(url + "1")], spider)) == []
+    stats = middleware.stats
+    assert stats.get_value("job_checkpoint/resumed_count") == 2
+    assert stats.get_value("job_checkpoint/seen_count") == 3
+    assert stats.get_value("job_checkpoint/resume_seconds") >= 0
+
+    for request in crawled:
+        crawl_page(middleware, exporter, spider, request, iter([{"id": request.url}]))
+    assert middleware.pending == {}
+    middleware.spider_closed(spider, "finished")
+    assert list((tmp_path / "jobs").iterdir()) == []
+
+
+def test_job_checkpoint_skips_duplicates(checkpoint_crawlers):
+    middleware, exporter, spider = checkpoint_crawlers()
+    request = Request("https://www.bismarckschools.org/Page/1")
+    middleware.request_scheduled(request, spider)
+    # Retries are already in the journal
+    middleware.request_scheduled(request.copy(), spider)
+    assert len(middleware.scheduled) == 1
+    crawl_page(middleware, exporter, spider, request, iter([]))
+    # Requests filtered as duplicates are taken out again
+    duplicate = request.copy()
+    middleware.request_scheduled(duplicate, spider)
+    middleware.request_dropped(duplicate, spider)
+    assert middleware.pending == {}
+    assert len(middleware.scheduled) == 1
+    assert len(middleware.done) == 1
+
+
+def test_job_checkpoint_restarts_overwritten_feeds(checkpoint_crawlers, caplog):
+    middleware, exporter, spider = checkpoint_crawlers()
+    request = Request("https://www.bismarckschools.org/Page/1")
+    middleware.request_scheduled(request, spider)
+    middleware.spider_closed(spider, "shutdown")
+
+    middleware, _, spider = checkpoint_crawlers(overwrite=True)
+    assert middleware.crawler.engine.crawl.call_count == 0
+    assert "can't resume the unfinished job, a feed can't be appended" in caplog.text
+
+
+def test_job_checkpoint_resumes_same_job_only(checkpoint_crawlers, caplog):
+    # Without feeds, only the job ID and age tell an abandoned job apart
+    middleware, _, spider = checkpoint_crawlers(feeds=False)
+    middleware.request_scheduled(Request("https://www.bismarckschools.org/"), spider)
+    middleware.spider_closed(spider, "shutdown")
+
+    middleware, _, spider = checkpoint_crawlers(
+        feeds=False, settings={"JOB_CHECKPOINT_ID": "job-2"}
+    )
+    assert middleware.crawler.engine.crawl.call_count == 0
+    assert "it belongs to job job-1" in caplog.text
+    middleware.request_scheduled(Request("https://www.bismarckschools.org/"), spider)
+    middleware.spider_closed(spider, "shutdown")
+
+    middleware, _, spider = checkpoint_crawlers(
+        feeds=False, settings={"JOB_CHECKPOINT_ID": "job-2"}
+    )
+    assert middleware.crawler.engine.crawl.call_count == 1
+    middleware.spider_closed(spider, "shutdown")
+
+    middleware, _, spider = checkpoint_crawlers(
+        feeds=False,
+        settings={"JOB_CHECKPOINT_ID": "job-2", "JOB_CHECKPOINT_MAX_AGE": 0},
+    )
+    assert middleware.crawler.engine.crawl.call_count == 0
+    assert "it's too old" in caplog.text
+
+
+def test_host_circuit_counts_shared_responses_once(host_limit_mw, shared_mw):
+    spider = BisndBpsSpider()
+    shared_mw.coalesce = True
+    url = "https://www.bismarcknd.gov/calendar.aspx"
+    leader = Request(url)
+    assert process_request(shared_mw, leader) == [None]
+    assert process_request(host_limit_mw, leader) == [None]
+    waiting = [process_request(shared_mw, Request(url)) for _ in range(4)]
+
+    # Responses go back out from HostLimitMiddleware to SharedResponseMiddleware
+    response = host_limit_mw.process_response(
+        leader, HtmlResponse(url, status=503), spider
+    )
+    shared_mw.process_response(leader, response, spider)
+    for [copy] in waiting:
+        assert copy.status == 503
+        host_limit_mw.process_response(copy.request, copy, spider)
+    host = host_limit_mw._host(leader)
+    assert host.failures == 1
+    assert host.open_until is None
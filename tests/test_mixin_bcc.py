@@ -9,8 +9,9 @@ from city_scrapers_core.constants import (
     NOT_CLASSIFIED,
 )
 from dateutil.relativedelta import relativedelta
-from scrapy.http import FormRequest, HtmlResponse
+from scrapy.http import FormRequest, HtmlResponse, Request
 from scrapy.selector import Selector
+from scrapy.settings import Settings
 from scrapy.spiders import Spider
 
 from city_scrapers.mixins.bcc import BCCMixin
@@ -144,3 +145,53 @@ def test_parse_links(test_spider):
             "title": "Meeting details",
         },
     ]
+
+
+def test_start_requests_consolidated(test_spider):
+    test_spider.settings = Settings({"BCC_CONSOLIDATED": True})
+    test_spider.consolidated_cids = [52, 123]
+    request = next(test_spider.start_requests())
+    assert "&CID=52,123&" in request.url
+    assert request.meta["shared_response"] is True
+    assert request.meta["bcc_consolidated"] is True
+
+
+def test_parse_consolidated(test_spider):
+    html = """
+    <div id="CID123" class="calendar"><ol>
+        <li><span>Own Meeting</span>
+        <span itemprop="startDate">2023-01-01T09:00:00</span></li>
+    </ol></div>
+    <div id="CID52" class="calendar"><ol>
+        <li><span>Other Meeting</span>
+        <span itemprop="startDate">2023-01-02T09:00:00</span></li>
+    </ol></div>
+    """
+    request = Request("http://example.com", meta={"bcc_consolidated": True})
+    response = HtmlResponse(
+        url="http://example.com", body=html.encode("utf-8"), request=request
+    )
+    items = list(test_spider.parse(response))
+    assert [item["title"] for item in items] == ["Own Meeting"]
+    assert items[0]["id"].startswith("test_spider/202301010900/")
+
+
+def test_parse_reuses_cached_rows(test_spider):
+    html = """
+    <div class="calendar"><ol>
+        <li><span>Meeting</span>
+        <span itemprop="startDate">2023-01-01T09:00:00</span></li>
+    </ol></div>
+    """
+    response = HtmlResponse(
+        url="http://example.com",
+        body=html.encode("utf-8"),
+        request=Request("http://example.com"),
+    )
+    first = list(test_spider.parse(response))
+    hits = test_spider.row_cache.hits
+    second = list(test_spider.parse(response))
+    assert test_spider.row_cache.hits == hits + 1
+    assert first == second
+    # Cached rows are copied into each meeting
+    assert first[0]["links"] is not second[0]["links"]
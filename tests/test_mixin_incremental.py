@@ -0,0 +1,190 @@
+import pickle
+from datetime import datetime, timedelta
+
+import pytest
+from city_scrapers_core.constants import TENTATIVE
+from dateutil.relativedelta import relativedelta
+from scrapy.http import HtmlResponse
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.middleware import UnchangedResponseMiddleware
+from city_scrapers.mixins.bcc import BCCMixin
+from city_scrapers.mixins.mc import MCMixin
+
+
+class IncrementalBCCSpider(BCCMixin, Spider):
+    name = "test_incremental_bcc"
+    agency = "Test Agency"
+    cid = "123"
+
+
+class IncrementalMCSpider(MCMixin):
+    name = "test_incremental_mc"
+    agency = "Test Agency"
+    category_id = 100
+
+
+@pytest.fixture
+def start_spider(tmp_path):
+    def start_spider(spidercls=IncrementalBCCSpider, **settings):
+        crawler = get_crawler(
+            spidercls,
+            {
+                "INCREMENTAL_ENABLED": True,
+                "INCREMENTAL_DIR": str(tmp_path),
+                "INCREMENTAL_NEAR_DAYS": 30,
+                "INCREMENTAL_FAR_REFRESH_HOURS": 24 * 7,
+                **settings,
+            },
+        )
+        crawler.stats.open_spider(None)
+        spider = spidercls.from_crawler(crawler)
+        return spider, next(spider.start_requests())
+
+    return start_spider
+
+
+def calendar_response(request, *meetings):
+    entries = "".join(
+        f'<li><span>{title}</span><span itemprop="startDate">'
+        f"{start:%Y-%m-%dT%H:%M:%S}</span></li>"
+        for title, start in meetings
+    )
+    body = f'<div class="calendar"><ol>{entries}</ol></div>'
+    return HtmlResponse(request.url, body=body.encode(), request=request)
+
+
+def end_date(request):
+    return request.url.split("enddate=")[1].split("&")[0]
+
+
+def test_first_run_fetches_whole_window(start_spider):
+    spider, request = start_spider()
+    six_months_ahead = datetime.today() + relativedelta(months=6)
+    assert end_date(request) == f"{six_months_ahead:%m/%d/%Y}"
+    assert "carry_forward" not in request.meta
+    assert spider.crawler.stats.get_value("incremental/window") == "full"
+    # Unchanged responses are still replayed
+    assert spider.replay_unchanged_responses is True
+
+
+def test_later_run_carries_far_meetings(start_spider, tmp_path):
+    soon = datetime.now().replace(microsecond=0) + timedelta(days=2)
+    later = soon + timedelta(days=90)
+    spider, request = start_spider()
+    items = list(
+        spider.parse(calendar_response(request, ("Soon", soon), ("Later", later)))
+    )
+    assert len(items) == 2
+    spider.closed("finished")
+    with open(tmp_path / f"{spider.name}.pickle", "rb") as f:
+        _, state = pickle.load(f)
+    assert len(state["meetings"]) == 2
+
+    spider, request = start_spider()
+    assert end_date(request) == f"{datetime.today() + timedelta(days=30):%m/%d/%Y}"
+    assert request.meta["carry_forward"] is True
+    assert spider.crawler.stats.get_value("incremental/window") == "near"
+    items = list(spider.parse(calendar_response(request, ("Soon - Updated", soon))))
+    assert [item["title"] for item in items] == ["Soon - Updated", "Later"]
+    assert items[1]["start"] == later
+    assert items[1]["status"] == TENTATIVE
+    assert spider.crawler.stats.get_value("incremental/carried_count") == 1
+    spider.closed("finished")
+
+    # The state now holds the meetings of the second run
+    spider, request = start_spider()
+    assert [meeting["title"] for meeting in spider._carried] == ["Later"]
+
+
+def test_unchanged_responses_replayed(start_spider, tmp_path):
+    soon = datetime.now().replace(microsecond=0) + timedelta(days=2)
+    later = soon + timedelta(days=90)
+    settings = {
+        "UNCHANGED_RESPONSES_ENABLED": True,
+        "UNCHANGED_RESPONSES_DIR": str(tmp_path / "unchanged"),
+    }
+
+    def run(*meetings):
+        spider, request = start_spider(**settings)
+        middleware = UnchangedResponseMiddleware.from_crawler(spider.crawler)
+        middleware.spider_opened(spider)
+        response = calendar_response(request, *meetings)
+        items = list(
+            middleware.process_spider_output(response, spider.parse(response), spider)
+        )
+        middleware.spider_closed(spider, "finished")
+        spider.closed("finished")
+        return spider, items, middleware
+
+    run(("Soon", soon), ("Later", later))
+    spider, items, middleware = run(("Soon", soon))
+    assert [item["title"] for item in items] == ["Soon", "Later"]
+    # Carried meetings aren't stored with the response
+    [(_, stored)] = middleware.current.values()
+    assert [item["title"] for item in stored] == ["Soon"]
+
+    # The same near window again is replayed, still carrying the later meeting
+    spider, items, _ = run(("Soon", soon))
+    stats = spider.crawler.stats
+    assert stats.get_value("unchanged_responses/replayed") == 1
+    assert stats.get_value("incremental/carried_count") == 1
+    assert [item["title"] for item in items] == ["Soon", "Later"]
+    with open(tmp_path / f"{spider.name}.pickle", "rb") as f:
+        _, state = pickle.load(f)
+    assert sorted(m["title"] for m in state["meetings"].values()) == ["Later", "Soon"]
+
+
+def test_far_window_refreshed(start_spider):
+    spider, request = start_spider()
+    soon = datetime.now() + timedelta(days=2)
+    list(spider.parse(calendar_response(request, ("Soon", soon))))
+    spider.closed("finished")
+    spider, request = start_spider(INCREMENTAL_FAR_REFRESH_HOURS=0)
+    assert spider.crawler.stats.get_value("incremental/window") == "full"
+
+
+def test_failed_run_keeps_state(start_spider):
+    spider, request = start_spider()
+    later = datetime.now() + timedelta(days=90)
+    list(spider.parse(calendar_response(request, ("Later", later))))
+    spider.closed("finished")
+
+    spider, request = start_spider()
+    spider.closed("closespider_errorcount")
+    spider, request = start_spider()
+    spider.closed("finished")
+    spider, request = start_spider()
+    assert [meeting["title"] for meeting in spider._carried] == ["Later"]
+
+
+def test_mc_near_window(start_spider):
+    spider, request = start_spider(IncrementalMCSpider)
+    spider.closed("finished")
+    assert "startDateTime+le+" in request.url
+    spider._record_meeting({"id": "x", "start": datetime.now() + timedelta(days=90)})
+    spider.closed("finished")
+
+    spider, near_request = start_spider(IncrementalMCSpider)
+    assert near_request.url != request.url
+    # Sources cover the whole window either way
+    assert near_request.meta["source"] == request.meta["source"]
+    near_to = datetime.today() + timedelta(days=30)
+    assert f"startDateTime+le+{near_to:%Y-%m-%dT%H}:00:00Z" in near_request.url
+
+
+def test_window_from_arguments(tmp_path):
+    crawler = get_crawler(
+        IncrementalBCCSpider,
+        {"INCREMENTAL_ENABLED": True, "INCREMENTAL_DIR": str(tmp_path)},
+    )
+    spider = IncrementalBCCSpider.from_crawler(
+        crawler, start_date="2015-01-01", end_date="2015-01-31"
+    )
+    request = next(spider.start_requests())
+    assert "startDate=01/01/2015&enddate=01/31/2015&" in request.url
+    # The stored state is left alone
+    assert "carry_forward" not in request.meta
+    spider.closed("finished")
+    assert list(tmp_path.iterdir()) == []
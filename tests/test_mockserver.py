@@ -0,0 +1,72 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.mockserver import (
+    BismarckSite,
+    calendar_ids,
+    parse_odata_filter,
+    query_events,
+)
+
+events = [
+    {
+        "id": i,
+        "categoryId": 26 + i % 2,
+        "startDateTime": f"2024-03-{i + 1:02}T17:00:00Z",
+    }
+    for i in range(10)
+]
+url = "http://127.0.0.1:9000/v1/Events"
+
+
+def test_parse_odata_filter():
+    assert parse_odata_filter(
+        "categoryId in (26,27) and startDateTime ge 2024-03-01T00:00:00Z "
+        "and startDateTime le 2024-09-01T00:00:00Z"
+    ) == ({26, 27}, "2024-03-01T00:00:00", "2024-09-01T00:00:00")
+    assert parse_odata_filter("categoryId eq 26") == ({26}, None, None)
+    assert parse_odata_filter("") == (None, None, None)
+
+
+def test_query_events_filters_and_selects():
+    body = query_events(
+        events,
+        {
+            "$filter": "categoryId in (27) and startDateTime le 2024-03-06T00:00:00Z",
+            "$select": "id,startDateTime",
+        },
+        url,
+    )
+    assert body["value"] == [
+        {"id": 1, "startDateTime": "2024-03-02T17:00:00Z"},
+        {"id": 3, "startDateTime": "2024-03-04T17:00:00Z"},
+    ]
+    assert "@odata.nextLink" not in body
+
+
+def test_query_events_paging(monkeypatch):
+    monkeypatch.setattr("benchmarks.mockserver.ODATA_PAGE_SIZE", 4)
+    body = query_events(events, {"$filter": "categoryId in (26,27)"}, url)
+    assert [event["id"] for event in body["value"]] == [0, 1, 2, 3]
+    assert body["@odata.nextLink"].startswith(f"{url}?")
+    assert "%24skip=4" in body["@odata.nextLink"]
+
+    # Client-driven paging doesn't get a next link
+    body = query_events(events, {"$top": "4", "$skip": "8"}, url)
+    assert [event["id"] for event in body["value"]] == [8, 9]
+    assert "@odata.nextLink" not in body
+
+
+def test_calendar_filters_cids_and_dates():
+    options = SimpleNamespace(scale=8, seed=0, edge_cases=0.0)
+    site = BismarckSite(options, datetime(2024, 3, 1))
+    assert calendar_ids("all", site.calendars) == list(site.calendars)
+    assert calendar_ids("52,54,1", site.calendars) == [52, 54]
+
+    status, _, body = site.calendar(
+        {"CID": "52,54", "startDate": "03/01/2024", "enddate": "03/01/2024"}, url
+    )
+    assert status == 200
+    assert body.count(b'class="calendar"') == 2
+    # Four entries a day in each calendar
+    assert body.count(b'itemprop="startDate"') == 8
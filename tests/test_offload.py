@@ -0,0 +1,70 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from city_scrapers_core.items import Meeting
+from freezegun import freeze_time
+from scrapy import Request
+from scrapy.http import HtmlResponse
+from scrapy.utils.test import get_crawler
+
+from benchmarks.synthetic import bps_meetings_page
+from city_scrapers.offload import pack_job, pack_output, run_job, unpack_output
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+
+
+def bps_response():
+    url = BisndBpsSpider.start_urls[0]
+    body = bps_meetings_page(2, datetime.now().year - 2024, edge_cases=0.3)
+    return HtmlResponse(url, body=body.encode(), request=Request(url))
+
+
+def offloaded_spider(**settings):
+    crawler = get_crawler(BisndBpsSpider, {"OFFLOAD_ENABLED": True, **settings})
+    return BisndBpsSpider.from_crawler(crawler)
+
+
+def test_disabled_runs_in_process():
+    spider = BisndBpsSpider()
+    response = bps_response()
+    items = list(spider.parse(response))
+    assert items and all(isinstance(item, Meeting) for item in items)
+
+
+def test_job_output_matches_in_process():
+    spider = offloaded_spider()
+    response = bps_response()
+    with freeze_time("2024-04-02"):
+        expected = list(BisndBpsSpider().parse(response))
+        job = pack_job(spider, "parse", response, {})
+        items = [unpack_output(output, spider) for output in run_job(job)]
+    assert all(isinstance(item, Meeting) for item in items)
+    assert [dict(item) for item in items] == [dict(item) for item in expected]
+
+
+def test_worker_output_matches_in_process():
+    spider = offloaded_spider()
+    response = bps_response()
+    expected = list(BisndBpsSpider().parse(response))
+    job = pack_job(spider, "parse", response, {})
+    with ProcessPoolExecutor(1, multiprocessing.get_context("spawn")) as pool:
+        outputs = pool.submit(run_job, job).result()
+    items = [unpack_output(output, spider) for output in outputs]
+    assert len(items) > 90
+    assert [(item["id"], item["status"]) for item in items] == [
+        (item["id"], item["status"]) for item in expected
+    ]
+    assert [dict(item) for item in items] == [dict(item) for item in expected]
+
+
+def test_requests_round_trip():
+    spider = offloaded_spider()
+    request = Request(
+        "https://www.bismarckschools.org/Page/401",
+        callback=spider.parse,
+        meta={"page": 2},
+    )
+    unpacked = unpack_output(pack_output(request, spider), spider)
+    assert unpacked.url == request.url
+    assert unpacked.callback == spider.parse
+    assert unpacked.meta == {"page": 2}
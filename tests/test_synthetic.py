@@ -0,0 +1,136 @@
+from datetime import datetime
+
+from city_scrapers_core.constants import CANCELLED
+from city_scrapers_core.items import Meeting
+from freezegun import freeze_time
+from scrapy.http import HtmlResponse, Request, TextResponse
+
+from benchmarks.synthetic import (
+    bps_meetings_page,
+    civicclerk_events,
+    civicplus_calendar,
+    mortonnd_minutes_page,
+)
+from city_scrapers.spiders.bisnd_bcc import BisndBCCASpider
+from city_scrapers.spiders.bisnd_bps import BisndBpsSpider
+from city_scrapers.spiders.bisnd_mc import BisndMCCCSpider
+from city_scrapers.spiders.bisnd_mcc import BisndMccSpider
+
+
+def html_response(url, body):
+    return HtmlResponse(url, body=body.encode(), request=Request(url))
+
+
+def meetings(spider, response):
+    return [item for item in spider.parse(response) if isinstance(item, Meeting)]
+
+
+def test_generators_are_seeded():
+    assert civicplus_calendar(50, seed=1, edge_cases=0.5) == civicplus_calendar(
+        50, seed=1, edge_cases=0.5
+    )
+    assert civicplus_calendar(50, seed=1) != civicplus_calendar(50, seed=2)
+    assert civicclerk_events(50, seed=1, edge_cases=0.5) == civicclerk_events(
+        50, seed=1, edge_cases=0.5
+    )
+    assert bps_meetings_page(2, seed=1, edge_cases=0.5) == bps_meetings_page(
+        2, seed=1, edge_cases=0.5
+    )
+    start = datetime(2024, 6, 1)
+    assert mortonnd_minutes_page(
+        50, start, seed=1, edge_cases=0.5
+    ) == mortonnd_minutes_page(50, start, seed=1, edge_cases=0.5)
+
+
+def test_civicplus_calendar_edge_cases():
+    spider = BisndBCCASpider()
+    body = civicplus_calendar(400, edge_cases=0.5)
+    items = meetings(spider, html_response(f"{spider.host}/calendar.aspx", body))
+    # Entries without a start date are skipped
+    assert len(items) == body.count('itemprop="startDate"') < 400
+    assert any(item["location"]["name"] == "TBD" for item in items)
+    assert any(
+        item["location"]
+        == {
+            "name": "Tom Baker Meeting Room",
+            "address": "City/County Building, 221 N 5th St, Bismarck, ND 58501",
+        }
+        for item in items
+    )
+    assert any(item["status"] == CANCELLED for item in items)
+
+
+def test_civicclerk_events_edge_cases():
+    spider = BisndMCCCSpider()
+    url = f"{spider.base_url}/v1/Events"
+    body = civicclerk_events(400, edge_cases=0.5)
+    response = TextResponse(url, body=body.encode(), encoding="utf-8")
+    items = meetings(spider, response)
+    assert len(items) == 400
+    assert any(
+        item["location"]["address"]
+        == "205 2nd Ave NW, City Commission Room, Mandan, ND, 58554"
+        for item in items
+    )
+    assert any(item["location"] == {"name": "", "address": ""} for item in items)
+    assert any(item["links"] == [] for item in items)
+    assert any(item["status"] == CANCELLED for item in items)
+
+
+def test_bps_meetings_page_edge_cases():
+    spider = BisndBpsSpider()
+    with freeze_time("2024-04-02"):
+        plain = meetings(
+            spider, html_response(spider.start_urls[0], bps_meetings_page(2))
+        )
+        items = meetings(
+            spider,
+            html_response(spider.start_urls[0], bps_meetings_page(2, edge_cases=0.5)),
+        )
+    assert len(plain) == 180
+    # Rows with several dates are split into one meeting per date
+    assert len(items) > len(plain)
+    assert any(
+        link["href"].startswith("https://example.com/minutes/")
+        for item in items
+        for link in item["links"]
+    )
+    assert sum(item["status"] == CANCELLED for item in items) > sum(
+        item["status"] == CANCELLED for item in plain
+    )
+
+
+def test_mortonnd_minutes_page_edge_cases():
+    spider = BisndMccSpider()
+    with freeze_time("2024-06-01"):
+        body = mortonnd_minutes_page(400, edge_cases=0.5)
+        items = meetings(spider, html_response(spider.start_urls[0], body))
+    # Rows without a date are skipped
+    assert 0 < len(items) < 400
+    assert any(
+        item["description"] == "LEC Advisory Bd w/ Burleigh Co" for item in items
+    )
+    assert any(item["status"] == CANCELLED for item in items)
+
+
+def test_mortonnd_minutes_page_fixture_dates():
+    spider = BisndMccSpider()
+    start = datetime(2024, 6, 1)
+    with freeze_time(start):
+        fixture = meetings(
+            spider,
+            html_response(
+                spider.start_urls[0],
+                mortonnd_minutes_page(160, start, fixture_dates=True),
+            ),
+        )
+        scaled = meetings(
+            spider,
+            html_response(
+                spider.start_urls[0],
+                mortonnd_minutes_page(1600, start, fixture_dates=True),
+            ),
+        )
+    # Scaled pages keep the share of rows recent enough to keep
+    assert 0 < len(fixture) < 160
+    assert len(scaled) == 10 * len(fixture)
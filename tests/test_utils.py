@@ -0,0 +1,140 @@
+import cProfile
+import inspect
+import pstats
+from collections import deque
+
+import pytest
+from scrapy import Spider
+from scrapy.pipelines import ItemPipelineManager
+
+from city_scrapers import dates
+from city_scrapers.mixins.bcc import BCCMixin
+from city_scrapers.mixins.mc import MCMixin
+from city_scrapers.utils import (
+    PersistentLRUCache,
+    code_version,
+    collapsed_stacks,
+    iter_json_array,
+    wrap_pipelines,
+)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = PersistentLRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_cache_persists(tmp_path):
+    path = tmp_path / "cache.pickle"
+    cache = PersistentLRUCache(10, path, version="1")
+    cache.set("a", {"title": "Meeting"})
+    cache.save()
+    assert PersistentLRUCache(10, path, version="1").get("a") == {"title": "Meeting"}
+    # Entries from another version of the code are dropped
+    assert len(PersistentLRUCache(10, path, version="2")) == 0
+
+
+def test_code_version():
+    assert code_version(BCCMixin) == code_version(BCCMixin)
+    assert code_version(BCCMixin) != code_version(MCMixin)
+
+
+def test_code_version_includes_dates(monkeypatch):
+    version = code_version(BCCMixin)
+    getsource = inspect.getsource
+
+    def changed_dates(module):
+        source = getsource(module)
+        return source + "# changed" if module is dates else source
+
+    monkeypatch.setattr(inspect, "getsource", changed_dates)
+    assert code_version(BCCMixin) != version
+
+
+def test_iter_json_array():
+    assert list(iter_json_array(' [ [1, "a"], {"b": null} ,3 ] ')) == [
+        [1, "a"],
+        {"b": None},
+        3,
+    ]
+    assert list(iter_json_array("[]")) == []
+    rows = iter_json_array("[1, 2, oops")
+    assert next(rows) == 1
+    assert next(rows) == 2
+    with pytest.raises(ValueError):
+        next(rows)
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def outer():
+    return busy(20000) + inner()
+
+
+def inner():
+    return busy(60000)
+
+
+def test_collapsed_stacks():
+    profile = cProfile.Profile()
+    profile.enable()
+    outer()
+    profile.disable()
+    stacks = {}
+    for line in collapsed_stacks(pstats.Stats(profile)):
+        path, microseconds = line.rsplit(" ", 1)
+        stacks[tuple(frame.split(" (")[0] for frame in path.split(";"))] = int(
+            microseconds
+        )
+    # busy's time is split between its two callers by how long each call took
+    direct = sum(t for path, t in stacks.items() if path[-2:] == ("outer", "busy"))
+    nested = sum(
+        t for path, t in stacks.items() if path[-3:] == ("outer", "inner", "busy")
+    )
+    assert 0 < direct < nested
+    assert all(path[0] == "outer" for path in stacks if "busy" in path)
+
+
+class ItemPipeline:
+    def process_item(self, item, spider):
+        return item
+
+
+class OtherPipeline:
+    def open_spider(self, spider):
+        pass
+
+    def process_item(self, item, spider):
+        return item
+
+
+def test_wrap_pipelines():
+    # wrap_pipelines rewrites MiddlewareManager internals, which a Scrapy
+    # upgrade could change
+    itemproc = ItemPipelineManager(ItemPipeline(), Spider("test"), OtherPipeline())
+    assert isinstance(itemproc.methods["process_item"], deque)
+    calls = []
+
+    def wrap(pipeline, process_item):
+        def wrapped(item, spider):
+            calls.append(type(pipeline).__name__)
+            return process_item(item, spider)
+
+        return wrapped
+
+    wrap_pipelines(itemproc, wrap)
+    itemproc.process_item({}, Spider("test"))
+    assert calls == ["ItemPipeline", "OtherPipeline"]
+
+    itemproc.methods["process_item"] = deque()
+    with pytest.raises(RuntimeError):
+        wrap_pipelines(itemproc, wrap)